@@ -1,5 +1,6 @@
 import streamlit as st
-from cricket_parser_v2 import get_db_conn
+from cricket_parser_v2 import get_data_version
+from dataset import load_dataset, select_players, select_stats, select_player, search_players, compare_players, distribution
 import pandas as pd
 
 st.set_page_config(
@@ -10,166 +11,59 @@ st.set_page_config(
 
 dbname = 'CRICKET_PERF'
 
-# Cache database queries for better performance
-@st.cache_data
-def get_countries():
-    """Get all countries from database"""
-    try:
-        with get_db_conn(dbname) as sqlite_conn:
-            cur = sqlite_conn.cursor()
-            cur.execute('SELECT * FROM Countries ORDER BY country')
-            col_names = [field[0] for field in cur.description]
-            rows = cur.fetchall()
-            df = pd.DataFrame(rows, columns=col_names)
-            return df
-    except Exception as e:
-        st.error(f"Error loading countries: {str(e)}")
-        return pd.DataFrame()
+# The whole dataset is loaded once per process and shared by every session; it is keyed
+# on the data version (the `version` argument), so a new crawl replaces it on the next rerun.
+# It replaces the per-query st.cache_data caches and the UNION ALL player details query:
+# every page now filters these frames instead of querying. ttl and max_entries still bound
+# it, so a database changed without a version bump is picked up within CACHE_TTL seconds
+CACHE_TTL = 3600
 
-@st.cache_data
-def get_players(country_name=None, match_type=None):
-    """Get players by country and match type"""
-    try:
-        query = """SELECT a.country_id, b.country, a.player_id, a.player, 
-                   a.odi_cap, a.t20_cap 
-                   FROM Players a 
-                   JOIN Countries b ON a.country_id=b.country_id 
-                   WHERE"""
-        to_filter = []
-        conditions = []
+@st.cache_resource(ttl=CACHE_TTL, max_entries=1, show_spinner="Loading statistics...")
+def get_dataset(version=None):
+    """Typed in-memory copy of the database, see dataset.py"""
+    return load_dataset(dbname)
 
-        if country_name:
-            conditions.append('b.country=?')
-            to_filter.append(country_name)
-        if match_type:
-            conditions.append('a.{}_cap=?'.format(match_type))
-            to_filter.append('Y')
-        
-        if not conditions:
-            return pd.DataFrame()
-        
-        query += ' ' + ' AND '.join(conditions) + ' ORDER BY a.player'
-        
-        with get_db_conn(dbname) as sqlite_conn:
-            cur = sqlite_conn.cursor()
-            cur.execute(query, to_filter)
-            col_names = [field[0] for field in cur.description]
-            rows = cur.fetchall()
-            df = pd.DataFrame(rows, columns=col_names)
-            return df
-    except Exception as e:
-        st.error(f"Error loading players: {str(e)}")
-        return pd.DataFrame()
+# Number of player names the Player Details picker sends to the browser at a time
+PICKER_WINDOW = 50
 
-@st.cache_data
-def get_stats(country_name, play_type, match_type):
-    """Get player statistics"""
-    try:
-        # Normalize match_type
-        match_type_upper = match_type.upper()
-        if match_type_upper == 'ODI':
-            match_type_table = 'Odi'
-        elif match_type_upper == 'T20':
-            match_type_table = 'T20'
-        else:
-            return pd.DataFrame()
-        
-        # Normalize play_type
-        play_type_capitalized = play_type.capitalize()
-        if play_type_capitalized not in ['Batting', 'Bowling']:
-            return pd.DataFrame()
-        
-        query = """SELECT * FROM {}_Stats_{} 
-                   WHERE player IN (
-                       SELECT a.player FROM Players a 
-                       JOIN Countries b ON a.country_id=b.country_id 
-                       WHERE""".format(play_type_capitalized, match_type_table)
-        to_filter = []
-        conditions = []
+def set_picker_offset(offset):
+    st.session_state['player_offset'] = offset
 
-        if country_name:
-            conditions.append('b.country=?')
-            to_filter.append(country_name)
-        
-        if match_type_upper == 'ODI':
-            conditions.append('a.odi_cap=?')
-        elif match_type_upper == 'T20':
-            conditions.append('a.t20_cap=?')
-        to_filter.append('Y')
-        
-        query += ' ' + ' AND '.join(conditions) + ') ORDER BY player'
-        
-        with get_db_conn(dbname) as sqlite_conn:
-            cur = sqlite_conn.cursor()
-            cur.execute(query, to_filter)
-            col_names = [field[0] for field in cur.description]
-            rows = cur.fetchall()
-            df = pd.DataFrame(rows, columns=col_names)
-            return df
-    except Exception as e:
-        st.error(f"Error loading statistics: {str(e)}")
-        return pd.DataFrame()
+# Largest squad the Compare Players page takes at once
+MAX_COMPARE_PLAYERS = 30
 
-@st.cache_data
-def get_player_details(player_name):
-    """Get all statistics for a specific player"""
-    try:
-        player_stats = {}
-        
-        # Get batting stats for ODI
-        with get_db_conn(dbname) as sqlite_conn:
-            cur = sqlite_conn.cursor()
-            cur.execute("SELECT * FROM Batting_Stats_Odi WHERE player=?", (player_name,))
-            col_names = [field[0] for field in cur.description] if cur.description else []
-            rows = cur.fetchall()
-            if rows:
-                player_stats['batting_odi'] = pd.DataFrame(rows, columns=col_names)
-            else:
-                player_stats['batting_odi'] = pd.DataFrame()
-            
-            # Get batting stats for T20
-            cur.execute("SELECT * FROM Batting_Stats_T20 WHERE player=?", (player_name,))
-            col_names = [field[0] for field in cur.description] if cur.description else []
-            rows = cur.fetchall()
-            if rows:
-                player_stats['batting_t20'] = pd.DataFrame(rows, columns=col_names)
-            else:
-                player_stats['batting_t20'] = pd.DataFrame()
-            
-            # Get bowling stats for ODI
-            cur.execute("SELECT * FROM Bowling_Stats_Odi WHERE player=?", (player_name,))
-            col_names = [field[0] for field in cur.description] if cur.description else []
-            rows = cur.fetchall()
-            if rows:
-                player_stats['bowling_odi'] = pd.DataFrame(rows, columns=col_names)
-            else:
-                player_stats['bowling_odi'] = pd.DataFrame()
-            
-            # Get bowling stats for T20
-            cur.execute("SELECT * FROM Bowling_Stats_T20 WHERE player=?", (player_name,))
-            col_names = [field[0] for field in cur.description] if cur.description else []
-            rows = cur.fetchall()
-            if rows:
-                player_stats['bowling_t20'] = pd.DataFrame(rows, columns=col_names)
-            else:
-                player_stats['bowling_t20'] = pd.DataFrame()
-        
-        return player_stats
-    except Exception as e:
-        st.error(f"Error loading player details: {str(e)}")
-        return {}
+COMPARISON_LABELS = {
+    'matches': 'Matches', 'runs': 'Runs', 'batting_average': 'Batting Avg', 'batting_strike_rate': 'Strike Rate',
+    'runs_per_innings': 'Runs/Innings', 'boundary_pct': 'Boundary %', 'non_boundary_strike_rate': 'Non-boundary SR',
+    'wickets': 'Wickets', 'bowling_average': 'Bowling Avg', 'economy_rate': 'Economy', 'wickets_per_match': 'Wickets/Match'
+}
+
+# Stats offered on the Distributions page: label -> (play type, column)
+DISTRIBUTION_STATS = {
+    'Batting strike rate': ('batting', 'batting_strike_rate'),
+    'Batting average': ('batting', 'batting_average'),
+    'Runs scored': ('batting', 'runs_scored'),
+    'Bowling economy': ('bowling', 'economy_rate'),
+    'Bowling average': ('bowling', 'bowling_average'),
+    'Bowling strike rate': ('bowling', 'bowling_strike_rate'),
+}
+
+def add_to_comparison(player_ids):
+    selection = st.session_state.get('compare_selection', [])
+    st.session_state['compare_selection'] = list(dict.fromkeys(selection + player_ids))[:MAX_COMPARE_PLAYERS]
+
+def metric_value(df, column):
+    """A single stats value for st.metric, "N/A" when absent or missing"""
+    if column not in df.columns or pd.isna(df[column].iloc[0]):
+        return "N/A"
+    value = df[column].iloc[0]
+    return value.item() if hasattr(value, 'item') else value
 
-@st.cache_data
-def get_all_players_list():
-    """Get list of all players"""
-    try:
-        with get_db_conn(dbname) as sqlite_conn:
-            cur = sqlite_conn.cursor()
-            cur.execute("SELECT DISTINCT player FROM Players ORDER BY player")
-            rows = cur.fetchall()
-            return [row[0] for row in rows] if rows else []
-    except Exception as e:
-        return []
+try:
+    data = get_dataset(get_data_version(dbname))
+except Exception as e:
+    st.error(f"Error loading database: {str(e)}")
+    st.stop()
 
 # Main app
 st.title("🏏 Cricket Stats Tracker")
@@ -179,7 +73,7 @@ st.markdown("Explore cricket player statistics from around the world")
 st.sidebar.title("Navigation")
 page = st.sidebar.radio(
     "Choose a page",
-    ["Countries", "Players", "Statistics", "Player Details"]
+    ["Countries", "Players", "Statistics", "Player Details", "Compare Players", "Distributions"]
 )
 
 if page == "Countries":
@@ -188,7 +82,7 @@ if page == "Countries":
     
     if st.button("Load Countries", type="primary"):
         with st.spinner("Loading countries..."):
-            df = get_countries()
+            df = data['countries']
             if not df.empty:
                 st.dataframe(df, use_container_width=True)
                 st.success(f"Found {len(df)} countries")
@@ -200,7 +94,7 @@ elif page == "Players":
     st.markdown("Search for players by country and match type")
     
     # Get countries for dropdown
-    countries_df = get_countries()
+    countries_df = data['countries']
     if not countries_df.empty:
         country_list = [''] + sorted(countries_df['country'].tolist())
         selected_country = st.selectbox(
@@ -218,8 +112,9 @@ elif page == "Players":
         if st.button("Search Players", type="primary"):
             if selected_country:
                 with st.spinner("Searching players..."):
-                    df = get_players(
-                        country_name=selected_country if selected_country else None,
+                    df = select_players(
+                        data,
+                        country=selected_country if selected_country else None,
                         match_type=match_type if match_type else None
                     )
                     if not df.empty:
@@ -229,14 +124,14 @@ elif page == "Players":
                         # Allow selecting a player to view details
                         st.markdown("---")
                         st.markdown("### View Player Details")
-                        player_names = df['player'].tolist()
                         selected_player_for_details = st.selectbox(
                             "Select a player to view full statistics",
-                            player_names,
+                            df['player_id'].tolist(),
+                            format_func=data['player_labels'].get,
                             key="player_details_select"
                         )
                         if st.button("View Full Statistics", type="primary", key="view_player_stats"):
-                            st.session_state['selected_player'] = selected_player_for_details
+                            st.session_state['selected_player'] = data['player_names'][selected_player_for_details]
                             st.session_state['page'] = 'Player Details'
                             st.rerun()
                     else:
@@ -251,7 +146,7 @@ elif page == "Statistics":
     st.markdown("View detailed batting or bowling statistics")
     
     # Get countries for dropdown
-    countries_df = get_countries()
+    countries_df = data['countries']
     if not countries_df.empty:
         country_list = sorted(countries_df['country'].tolist())
         selected_country = st.selectbox(
@@ -276,7 +171,7 @@ elif page == "Statistics":
         
         if st.button("Load Statistics", type="primary"):
             with st.spinner("Loading statistics..."):
-                df = get_stats(selected_country, play_type, match_type)
+                df = select_stats(data, selected_country, play_type, match_type).drop(columns='format')
                 if not df.empty:
                     st.dataframe(df, use_container_width=True)
                     st.success(f"Found {len(df)} record(s)")
@@ -287,12 +182,12 @@ elif page == "Statistics":
                         if 'runs_scored' in df.columns:
                             st.metric("Total Runs", df['runs_scored'].sum() if df['runs_scored'].dtype != 'object' else "N/A")
                         if 'batting_average' in df.columns:
-                            st.metric("Average", df['batting_average'].mean() if df['batting_average'].dtype != 'object' else "N/A")
+                            st.metric("Average", round(df['batting_average'].mean(), 2) if df['batting_average'].dtype != 'object' else "N/A")
                     elif play_type == "bowling":
                         if 'wickets_taken' in df.columns:
                             st.metric("Total Wickets", df['wickets_taken'].sum() if df['wickets_taken'].dtype != 'object' else "N/A")
                         if 'bowling_average' in df.columns:
-                            st.metric("Average", df['bowling_average'].mean() if df['bowling_average'].dtype != 'object' else "N/A")
+                            st.metric("Average", round(df['bowling_average'].mean(), 2) if df['bowling_average'].dtype != 'object' else "N/A")
                 else:
                     st.info("No statistics found")
     else:
@@ -302,30 +197,61 @@ elif page == "Player Details":
     st.header("👤 Player Statistics")
     st.markdown("Select a player to view their complete statistics")
     
-    # Get all players
-    players_list = get_all_players_list()
-    
-    if players_list:
-        # Check if player was selected from Players page
-        default_index = 0
-        if 'selected_player' in st.session_state and st.session_state['selected_player'] in players_list:
-            default_index = players_list.index(st.session_state['selected_player'])
-            # Clear the session state after using it
-            del st.session_state['selected_player']
+    if not data['players'].empty:
+        # A player picked on the Players page becomes the search, which lists it first
+        if 'selected_player' in st.session_state:
+            st.session_state['player_search'] = st.session_state.pop('selected_player')
         
-        selected_player = st.selectbox(
-            "Select Player",
-            players_list,
-            index=default_index
-        )
+        col1, col2, col3 = st.columns([2, 1, 1])
+        with col1:
+            search = st.text_input("Search Player", key="player_search",
+                                   placeholder="Start of the name or surname, e.g. Tendulkar")
+        with col2:
+            country_filter = st.selectbox(
+                "Country",
+                [''] + data['countries']['country'].tolist(),
+                format_func=lambda x: x.replace('-', ' ').title() if x else "All Countries",
+                key="player_country"
+            )
+        with col3:
+            format_filter = st.selectbox(
+                "Match Type",
+                ["", "odi", "t20"],
+                format_func=lambda x: {"": "All", "odi": "ODI", "t20": "T20"}.get(x, x),
+                key="player_format"
+            )
+        
+        # Only one window of matches goes to the browser; a new search starts from the top
+        query = (search, country_filter, format_filter)
+        if st.session_state.get('player_query') != query:
+            st.session_state['player_query'] = query
+            st.session_state['player_offset'] = 0
+        offset = st.session_state.get('player_offset', 0)
+        window, matches = search_players(data, search, country_filter, format_filter, offset, PICKER_WINDOW)
+        
+        # Options are player_ids: namesakes are different players
+        selected_player = st.selectbox("Select Player", window, format_func=data['player_labels'].get) if window else None
+        
+        col1, col2, col3 = st.columns([1, 4, 1])
+        with col1:
+            st.button("Previous", disabled=offset == 0, on_click=set_picker_offset,
+                      args=(max(0, offset - PICKER_WINDOW),))
+        with col2:
+            if window:
+                st.caption(f"Showing {offset + 1}-{offset + len(window)} of {matches} matches")
+            else:
+                st.info("No players match the search")
+        with col3:
+            st.button("Next", disabled=offset + PICKER_WINDOW >= matches, on_click=set_picker_offset,
+                      args=(offset + PICKER_WINDOW,))
         
         if selected_player:
             with st.spinner("Loading player statistics..."):
-                player_stats = get_player_details(selected_player)
+                player_stats = select_player(data, selected_player)
                 
                 # Player header
                 st.markdown("---")
-                st.markdown(f"## 🏏 {selected_player}")
+                st.markdown(f"## 🏏 {data['player_labels'][selected_player]}")
                 st.markdown("---")
                 
                 # Create tabs for different views
@@ -341,43 +267,43 @@ elif page == "Player Details":
                         col1, col2, col3, col4 = st.columns(4)
                         
                         with col1:
-                            runs = df['runs_scored'].iloc[0] if 'runs_scored' in df.columns else "N/A"
+                            runs = metric_value(df, 'runs_scored')
                             st.metric("Total Runs", runs)
                         
                         with col2:
-                            avg = df['batting_average'].iloc[0] if 'batting_average' in df.columns else "N/A"
+                            avg = metric_value(df, 'batting_average')
                             st.metric("Batting Average", avg)
                         
                         with col3:
-                            matches = df['matches_played'].iloc[0] if 'matches_played' in df.columns else "N/A"
+                            matches = metric_value(df, 'matches_played')
                             st.metric("Matches", matches)
                         
                         with col4:
-                            sr = df['batting_strike_rate'].iloc[0] if 'batting_strike_rate' in df.columns else "N/A"
+                            sr = metric_value(df, 'batting_strike_rate')
                             st.metric("Strike Rate", sr)
                         
                         # More metrics
                         col5, col6, col7, col8 = st.columns(4)
                         
                         with col5:
-                            hundreds = df['hundreds_scored'].iloc[0] if 'hundreds_scored' in df.columns else "N/A"
+                            hundreds = metric_value(df, 'hundreds_scored')
                             st.metric("Hundreds", hundreds)
                         
                         with col6:
-                            fifties = df['scores_between_50_and_99'].iloc[0] if 'scores_between_50_and_99' in df.columns else "N/A"
+                            fifties = metric_value(df, 'scores_between_50_and_99')
                             st.metric("Fifties", fifties)
                         
                         with col7:
-                            hs = df['highest_innings_score'].iloc[0] if 'highest_innings_score' in df.columns else "N/A"
+                            hs = metric_value(df, 'highest_innings_score')
                             st.metric("Highest Score", hs)
                         
                         with col8:
-                            sixes = df['boundary_sixes'].iloc[0] if 'boundary_sixes' in df.columns else "N/A"
+                            sixes = metric_value(df, 'boundary_sixes')
                             st.metric("Sixes", sixes)
                         
                         # Full table
                         st.markdown("### Complete Statistics")
-                        st.dataframe(df, use_container_width=True, hide_index=True)
+                        st.dataframe(df, use_container_width=True, hide_index=True, column_config={'format': None})
                     else:
                         st.info("No ODI batting statistics available for this player")
                 
@@ -391,43 +317,43 @@ elif page == "Player Details":
                         col1, col2, col3, col4 = st.columns(4)
                         
                         with col1:
-                            runs = df['runs_scored'].iloc[0] if 'runs_scored' in df.columns else "N/A"
+                            runs = metric_value(df, 'runs_scored')
                             st.metric("Total Runs", runs)
                         
                         with col2:
-                            avg = df['batting_average'].iloc[0] if 'batting_average' in df.columns else "N/A"
+                            avg = metric_value(df, 'batting_average')
                             st.metric("Batting Average", avg)
                         
                         with col3:
-                            matches = df['matches_played'].iloc[0] if 'matches_played' in df.columns else "N/A"
+                            matches = metric_value(df, 'matches_played')
                             st.metric("Matches", matches)
                         
                         with col4:
-                            sr = df['batting_strike_rate'].iloc[0] if 'batting_strike_rate' in df.columns else "N/A"
+                            sr = metric_value(df, 'batting_strike_rate')
                             st.metric("Strike Rate", sr)
                         
                         # More metrics
                         col5, col6, col7, col8 = st.columns(4)
                         
                         with col5:
-                            hundreds = df['hundreds_scored'].iloc[0] if 'hundreds_scored' in df.columns else "N/A"
+                            hundreds = metric_value(df, 'hundreds_scored')
                             st.metric("Hundreds", hundreds)
                         
                         with col6:
-                            fifties = df['scores_between_50_and_99'].iloc[0] if 'scores_between_50_and_99' in df.columns else "N/A"
+                            fifties = metric_value(df, 'scores_between_50_and_99')
                             st.metric("Fifties", fifties)
                         
                         with col7:
-                            hs = df['highest_innings_score'].iloc[0] if 'highest_innings_score' in df.columns else "N/A"
+                            hs = metric_value(df, 'highest_innings_score')
                             st.metric("Highest Score", hs)
                         
                         with col8:
-                            sixes = df['boundary_sixes'].iloc[0] if 'boundary_sixes' in df.columns else "N/A"
+                            sixes = metric_value(df, 'boundary_sixes')
                             st.metric("Sixes", sixes)
                         
                         # Full table
                         st.markdown("### Complete Statistics")
-                        st.dataframe(df, use_container_width=True, hide_index=True)
+                        st.dataframe(df, use_container_width=True, hide_index=True, column_config={'format': None})
                     else:
                         st.info("No T20 batting statistics available for this player")
                 
@@ -441,43 +367,43 @@ elif page == "Player Details":
                         col1, col2, col3, col4 = st.columns(4)
                         
                         with col1:
-                            wickets = df['wickets_taken'].iloc[0] if 'wickets_taken' in df.columns else "N/A"
+                            wickets = metric_value(df, 'wickets_taken')
                             st.metric("Total Wickets", wickets)
                         
                         with col2:
-                            avg = df['bowling_average'].iloc[0] if 'bowling_average' in df.columns else "N/A"
+                            avg = metric_value(df, 'bowling_average')
                             st.metric("Bowling Average", avg)
                         
                         with col3:
-                            matches = df['matches_played'].iloc[0] if 'matches_played' in df.columns else "N/A"
+                            matches = metric_value(df, 'matches_played')
                             st.metric("Matches", matches)
                         
                         with col4:
-                            economy = df['economy_rate'].iloc[0] if 'economy_rate' in df.columns else "N/A"
+                            economy = metric_value(df, 'economy_rate')
                             st.metric("Economy Rate", economy)
                         
                         # More metrics
                         col5, col6, col7, col8 = st.columns(4)
                         
                         with col5:
-                            sr = df['bowling_strike_rate'].iloc[0] if 'bowling_strike_rate' in df.columns else "N/A"
+                            sr = metric_value(df, 'bowling_strike_rate')
                             st.metric("Strike Rate", sr)
                         
                         with col6:
-                            bbi = df['best_bowling_in_an_innings'].iloc[0] if 'best_bowling_in_an_innings' in df.columns else "N/A"
+                            bbi = metric_value(df, 'best_bowling_in_an_innings')
                             st.metric("Best Bowling", bbi)
                         
                         with col7:
-                            four_wkts = df['four_wkts_exactly_in_an_inns'].iloc[0] if 'four_wkts_exactly_in_an_inns' in df.columns else "N/A"
+                            four_wkts = metric_value(df, 'four_wkts_exactly_in_an_inns')
                             st.metric("4 Wickets", four_wkts)
                         
                         with col8:
-                            five_wkts = df['five_wickets_in_an_inns'].iloc[0] if 'five_wickets_in_an_inns' in df.columns else "N/A"
+                            five_wkts = metric_value(df, 'five_wickets_in_an_inns')
                             st.metric("5 Wickets", five_wkts)
                         
                         # Full table
                         st.markdown("### Complete Statistics")
-                        st.dataframe(df, use_container_width=True, hide_index=True)
+                        st.dataframe(df, use_container_width=True, hide_index=True, column_config={'format': None})
                     else:
                         st.info("No ODI bowling statistics available for this player")
                 
@@ -491,48 +417,122 @@ elif page == "Player Details":
                         col1, col2, col3, col4 = st.columns(4)
                         
                         with col1:
-                            wickets = df['wickets_taken'].iloc[0] if 'wickets_taken' in df.columns else "N/A"
+                            wickets = metric_value(df, 'wickets_taken')
                             st.metric("Total Wickets", wickets)
                         
                         with col2:
-                            avg = df['bowling_average'].iloc[0] if 'bowling_average' in df.columns else "N/A"
+                            avg = metric_value(df, 'bowling_average')
                             st.metric("Bowling Average", avg)
                         
                         with col3:
-                            matches = df['matches_played'].iloc[0] if 'matches_played' in df.columns else "N/A"
+                            matches = metric_value(df, 'matches_played')
                             st.metric("Matches", matches)
                         
                         with col4:
-                            economy = df['economy_rate'].iloc[0] if 'economy_rate' in df.columns else "N/A"
+                            economy = metric_value(df, 'economy_rate')
                             st.metric("Economy Rate", economy)
                         
                         # More metrics
                         col5, col6, col7, col8 = st.columns(4)
                         
                         with col5:
-                            sr = df['bowling_strike_rate'].iloc[0] if 'bowling_strike_rate' in df.columns else "N/A"
+                            sr = metric_value(df, 'bowling_strike_rate')
                             st.metric("Strike Rate", sr)
                         
                         with col6:
-                            bbi = df['best_bowling_in_an_innings'].iloc[0] if 'best_bowling_in_an_innings' in df.columns else "N/A"
+                            bbi = metric_value(df, 'best_bowling_in_an_innings')
                             st.metric("Best Bowling", bbi)
                         
                         with col7:
-                            four_wkts = df['four_wkts_exactly_in_an_inns'].iloc[0] if 'four_wkts_exactly_in_an_inns' in df.columns else "N/A"
+                            four_wkts = metric_value(df, 'four_wkts_exactly_in_an_inns')
                             st.metric("4 Wickets", four_wkts)
                         
                         with col8:
-                            five_wkts = df['five_wickets_in_an_inns'].iloc[0] if 'five_wickets_in_an_inns' in df.columns else "N/A"
+                            five_wkts = metric_value(df, 'five_wickets_in_an_inns')
                             st.metric("5 Wickets", five_wkts)
                         
                         # Full table
                         st.markdown("### Complete Statistics")
-                        st.dataframe(df, use_container_width=True, hide_index=True)
+                        st.dataframe(df, use_container_width=True, hide_index=True, column_config={'format': None})
                     else:
                         st.info("No T20 bowling statistics available for this player")
     else:
         st.warning("No players found in database")
 
+elif page == "Compare Players":
+    st.header("⚖️ Compare Players")
+    st.markdown(f"Pick up to {MAX_COMPARE_PLAYERS} players to compare side by side")
+    
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        search = st.text_input("Search Player", key="compare_search",
+                               placeholder="Start of the name or surname, e.g. Kohli")
+    with col2:
+        country_filter = st.selectbox(
+            "Country",
+            [''] + data['countries']['country'].tolist(),
+            format_func=lambda x: x.replace('-', ' ').title() if x else "All Countries",
+            key="compare_country"
+        )
+    with col3:
+        match_type = st.selectbox("Match Type", ["ODI", "T20"], key="compare_format")
+    
+    # The options are the current selection plus one window of search results
+    window, matches = search_players(data, search, country_filter, match_type.lower(), 0, PICKER_WINDOW)
+    selection = st.session_state.get('compare_selection', [])
+    selection = st.multiselect(
+        "Players",
+        list(dict.fromkeys(selection + window)),
+        default=selection,
+        format_func=data['player_labels'].get,
+        max_selections=MAX_COMPARE_PLAYERS
+    )
+    st.session_state['compare_selection'] = selection
+    st.button(f"Add the {min(len(window), MAX_COMPARE_PLAYERS)} players shown", disabled=not window,
+              on_click=add_to_comparison, args=(window,))
+    
+    if selection:
+        # All selected players' stats and derived metrics come from one vectorised pass
+        df = compare_players(data, selection, match_type)
+        st.dataframe(df.rename(columns=COMPARISON_LABELS), use_container_width=True)
+        st.caption("Non-boundary SR: runs per 100 balls not hit for four or six.")
+        
+        col1, col2 = st.columns(2)
+        for i, column in enumerate(['runs_per_innings', 'boundary_pct', 'non_boundary_strike_rate', 'wickets_per_match']):
+            with (col1 if i % 2 == 0 else col2):
+                st.subheader(COMPARISON_LABELS[column])
+                st.bar_chart(df[column].dropna())
+    else:
+        st.info("Select players to compare")
+
+elif page == "Distributions":
+    st.header("📈 Distributions")
+    st.markdown("How a statistic is spread across a country's players (or everyone's)")
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        stat_label = st.selectbox("Statistic", list(DISTRIBUTION_STATS))
+    with col2:
+        country_filter = st.selectbox(
+            "Country",
+            [''] + data['countries']['country'].tolist(),
+            format_func=lambda x: x.replace('-', ' ').title() if x else "All Countries",
+            key="distribution_country"
+        )
+    with col3:
+        match_type = st.selectbox("Match Type", ["ODI", "T20"], key="distribution_format")
+    bins = st.slider("Bins", min_value=5, max_value=50, value=20)
+    
+    # Only the bin counts reach the browser, whatever the number of players
+    play_type, column = DISTRIBUTION_STATS[stat_label]
+    hist = distribution(data, play_type, column, match_type, country_filter or None, bins)
+    if hist['players'].sum():
+        hist.index = [f"{start:g}-{end:g}" for start, end in zip(hist['start'].round(1), hist['end'].round(1))]
+        st.bar_chart(hist['players'], x_label=stat_label, y_label="Players")
+        st.caption(f"{int(hist['players'].sum())} players in {bins} bins")
+    else:
+        st.info("No statistics found")
+
 # Footer
 st.sidebar.markdown("---")
 st.sidebar.markdown("**Cricket Stats Tracker**")
@@ -0,0 +1,51 @@
+"""ASGI entry point for the stats API.
+
+Serves the same Flask routes and JSON contracts as ``flask_app.py``, but from
+an event loop: sockets, keep-alive connections and slow clients are handled by
+the ASGI server, and only the request handling itself (which talks to SQLite)
+runs on a bounded thread pool. Thousands of idle or slow connections therefore
+cost no threads.
+
+The WSGI-to-ASGI bridge is ``a2wsgi.WSGIMiddleware``; this module only adds
+the lifespan hooks (warming the result cache, closing pooled connections).
+
+Run with any ASGI server, e.g.::
+
+    uvicorn asgi_app:app --host 0.0.0.0 --port 8080
+"""
+
+import asyncio
+import os
+
+from a2wsgi import WSGIMiddleware
+
+import flask_app
+
+# Threads that may run Flask handlers (and so hold a pooled SQLite connection) at once
+DB_THREADS = int(os.environ.get('CRICKET_ASGI_THREADS', 16))
+
+wsgi = WSGIMiddleware(flask_app.app, workers=DB_THREADS)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await asyncio.get_running_loop().run_in_executor(wsgi.executor, flask_app.warm_cache)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            wsgi.executor.shutdown(wait=False)
+            flask_app.db_pool.close_all()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    return await wsgi(scope, receive, send)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run('asgi_app:app', host='0.0.0.0', port=8080)
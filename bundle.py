@@ -0,0 +1,92 @@
+"""Bootstrap bundle: the whole dataset in one compressed file, rebuilt on every data version.
+
+The parser writes the bundle of each new data version next to the database before
+publishing the version; the API serves it precompressed from /api/v2/bootstrap.
+"""
+
+import glob
+import json
+import os
+import sqlite3
+
+from compression import compress, supported_encodings
+from encoders import type_column
+from schema import STATS_TABLES
+
+BUNDLE_FORMAT = 1
+# Databases with more players than this (e.g. scaled load-test copies) get no bundle;
+# clients page through the API instead
+MAX_BUNDLE_PLAYERS = 20000
+
+
+def bundle_path(dbname, version, encoding):
+    """Path of the bootstrap bundle of dbname at a data version, precompressed with encoding."""
+    return '{}.bundle-{}.json.{}'.format(dbname, version, 'br' if encoding == 'br' else 'gz')
+
+
+def build_bundle(sqlite_conn, version):
+    """Returns the bootstrap bundle of a database as JSON bytes, or None if it has more than
+    MAX_BUNDLE_PLAYERS players.
+
+    Tables are stored column by column with typed values ('-' and 'NA' become null). Player
+    names are dictionary-encoded: 'names' is the sorted list of every name, and the player
+    column of players and of each stats table holds indexes into it. Stats rows carry their
+    player_id (null for rows no crawl has keyed yet), which is what they join players on;
+    names are shared by namesakes. Stats tables keep rowid order, as the API pages them.
+    """
+    cur = sqlite_conn.cursor()
+    if cur.execute('SELECT COUNT(*) FROM Players').fetchone()[0] > MAX_BUNDLE_PLAYERS:
+        return None
+
+    def columns(query):
+        cur.execute(query)
+        names = [field[0] for field in cur.description]
+        rows = cur.fetchall()
+        return {name: [row[i] for row in rows] for i, name in enumerate(names)}
+
+    countries = columns('SELECT country_id, country FROM Countries ORDER BY country_id')
+    players = columns('SELECT country_id, player_id, player, odi_cap, t20_cap FROM Players ORDER BY player_id')
+    stats = {}
+    for table_name, table_columns in STATS_TABLES.items():
+        stats[table_name.lower()] = columns('SELECT player, {}, player_id FROM {} ORDER BY rowid'.format(
+            ', '.join(table_columns), table_name))
+    names = sorted(set(players['player']).union(*(table['player'] for table in stats.values())))
+    codes = {name: i for i, name in enumerate(names)}
+    for table in [players] + list(stats.values()):
+        table['player'] = [codes[name] for name in table['player']]
+    for cap in ('odi_cap', 't20_cap'):
+        players[cap] = [value == 'Y' for value in players[cap]]
+    for table in stats.values():
+        for column in list(table)[1:-1]:
+            table[column] = type_column(table[column])
+    bundle = {'format': BUNDLE_FORMAT, 'version': version, 'names': names, 'countries': countries,
+              'players': players, 'stats': stats}
+    return json.dumps(bundle, separators=(',', ':')).encode('utf-8')
+
+
+def write_bundle(dbname, version):
+    """Builds the bootstrap bundle of dbname for a data version and stores it precompressed
+    with every supported encoding next to the database. Returns the paths written (none if
+    the database is too large for a bundle)."""
+    conn = sqlite3.connect('file:{}?mode=ro'.format(os.path.abspath(dbname + '.sqlite')), uri=True)
+    try:
+        body = build_bundle(conn, version)
+    finally:
+        conn.close()
+    written = []
+    if body is not None:
+        for encoding in supported_encodings():
+            path = bundle_path(dbname, version, encoding)
+            with open(path + '.tmp', 'wb') as f:
+                f.write(compress(body, encoding, best=True))
+            os.replace(path + '.tmp', path)
+            written.append(path)
+    return written
+
+
+def prune_bundles(dbname, version):
+    """Removes the bootstrap bundles of dbname other than those of a data version."""
+    keep = {bundle_path(dbname, version, encoding) for encoding in ('gzip', 'br')}
+    for path in glob.glob(glob.escape(dbname) + '.bundle-*'):
+        if path not in keep:
+            os.remove(path)
@@ -0,0 +1,91 @@
+"""Response compression and precompressed static assets.
+
+gzip is always available; brotli is used when the optional ``brotli``
+package is installed.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are not worth the CPU or the extra header bytes
+MIN_COMPRESS_SIZE = 1024
+
+
+def supported_encodings():
+    """Encodings this process can produce, in order of preference."""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def negotiate_encoding(accept_encodings):
+    """Picks the best encoding the client accepts, or None for identity.
+
+    accept_encodings is a werkzeug Accept object (request.accept_encodings).
+    """
+    for encoding in supported_encodings():
+        if accept_encodings[encoding]:
+            return encoding
+    return None
+
+
+def compress(body, encoding, best=False):
+    """Compresses body; best trades time for size and is meant for precompression."""
+    if encoding == 'br':
+        return brotli.compress(body, quality=11 if best else 5)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=9 if best else 6, mtime=0)
+    return body
+
+
+class Asset:
+    """A static file held in memory with its precompressed variants."""
+
+    def __init__(self, name, body):
+        self.name = name
+        self.content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        if self.content_type.startswith('text/') or self.content_type.endswith(('json', 'javascript')):
+            self.content_type += '; charset=utf-8'
+        self.content_hash = hashlib.sha256(body).hexdigest()[:16]
+        self.variants = {None: body}
+        if len(body) >= MIN_COMPRESS_SIZE:
+            for encoding in supported_encodings():
+                compressed = compress(body, encoding, best=True)
+                if len(compressed) < len(body):
+                    self.variants[encoding] = compressed
+
+    def etag(self, encoding):
+        return self.content_hash + ('-' + encoding if encoding else '')
+
+    def body(self, encoding):
+        """Returns (encoding, body), falling back to identity if the variant was not worth keeping."""
+        if encoding in self.variants:
+            return encoding, self.variants[encoding]
+        return None, self.variants[None]
+
+
+class PrecompressedAssets:
+    """Loads every file under a directory into memory once, precompressed."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.assets = {}
+        self.reload()
+
+    def reload(self):
+        assets = {}
+        for root, _, files in os.walk(self.directory):
+            for filename in files:
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, self.directory).replace(os.sep, '/')
+                with open(path, 'rb') as f:
+                    assets[name] = Asset(name, f.read())
+        self.assets = assets
+
+    def get(self, name):
+        return self.assets.get(name)
@@ -9,26 +9,418 @@ import sqlite3
 import requests
 from bs4 import BeautifulSoup
 import re,sys,os,argparse
+import shutil
+import json
+import hashlib
+import itertools
 import logging
 import datetime
+import time
 from logging.handlers import RotatingFileHandler
+from refresh_jobs import JobQueue, ALL_COUNTRIES, MATCH_TYPES, ACTIONS, PRIORITY_HOT, PRIORITY_FULL
+from schema import BATTING_COLUMNS, BOWLING_COLUMNS, STATS_TABLES, TEXT_COLUMNS, INDEXED_NUMERIC_COLUMNS
+from bundle import write_bundle, prune_bundles
 
-def get_db_conn(dbname):
-    '''Returns sqlite db connection'''
+def get_db_conn(dbname,journal_mode=None):
+    '''Returns sqlite db connection.
+
+    Writers updating the live file in place pass journal_mode='WAL', which lets the API keep
+    reading the last committed data while a crawl writes. Published generations stay in
+    DELETE mode, since a -wal file left next to the live path would be replayed into
+    whatever file is renamed over it.'''
     try:
         conn=sqlite3.connect(dbname+'.sqlite')
+        if journal_mode:
+            conn.execute('PRAGMA journal_mode='+journal_mode)
     except Exception as e:
         print('Unable to establish connection with database with error',e)
         sys.exit(-1)
         
     return conn
 
+_data_version_cache = {}
+
+def get_data_version(dbname):
+    '''Returns the data version counter for dbname without opening the database.
+
+    The counter lives in <dbname>.version and is bumped by the parser after it commits
+    new data. The file is only re-read when its mtime changes; if it does not exist yet
+    the database file's mtime and size stand in for it.'''
+    path=dbname+'.version'
+    try:
+        stat=os.stat(path)
+    except OSError:
+        try:
+            stat=os.stat(dbname+'.sqlite')
+        except OSError:
+            return '0'
+        return 'db-{}-{}'.format(stat.st_mtime_ns,stat.st_size)
+    cached=_data_version_cache.get(path)
+    if cached and cached[0]==stat.st_mtime_ns:
+        return cached[1]
+    with open(path) as f:
+        version=f.read().strip() or '0'
+    _data_version_cache[path]=(stat.st_mtime_ns,version)
+    return version
+
+def bump_data_version(dbname):
+    '''Increments the data version counter after new data has been committed.
+
+    The bootstrap bundle of the new version is written before the version is published, so
+    readers never see a version without its bundle. A bundle that cannot be built is logged
+    and skipped (the API then builds it on demand); it never stops the version bump.'''
+    logger=logging.getLogger(__name__)
+    path=dbname+'.version'
+    try:
+        with open(path) as f:
+            version=int(f.read().strip() or 0)
+    except (OSError,ValueError):
+        version=0
+    try:
+        write_bundle(dbname,str(version+1))
+    except (sqlite3.Error,OSError,ValueError) as e:
+        logger.warning('Bootstrap bundle not built for {}: {}'.format(dbname,e))
+    tmp_path=path+'.tmp'
+    with open(tmp_path,'w') as f:
+        f.write(str(version+1))
+    os.replace(tmp_path,path)
+    try:
+        prune_bundles(dbname,str(version+1))
+    except OSError as e:
+        logger.warning('Old bootstrap bundles of {} not removed: {}'.format(dbname,e))
+    return version+1
+
+##Suffixes of the build-then-swap generation files next to <dbname>.sqlite
+STAGING_SUFFIX='.staging'
+PREVIOUS_SUFFIX='.previous'
+##Tables that must be non-empty in a published generation
+PUBLISHED_TABLES=('Countries','Players')+tuple(STATS_TABLES)
+
+def _replace_keeping_previous(dbname,source):
+    '''Atomically renames source over <dbname>.sqlite, hard-linking the replaced file to
+    <dbname>.previous.sqlite first so open readers and a later rollback both keep it.'''
+    live=dbname+'.sqlite'
+    previous=dbname+PREVIOUS_SUFFIX+'.sqlite'
+    if os.path.exists(live):
+        tmp_path=previous+'.tmp'
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        try:
+            os.link(live,tmp_path)
+        except OSError:
+            shutil.copy2(live,tmp_path)
+        os.replace(tmp_path,previous)
+    os.replace(source,live)
+
+def is_wal_database(path):
+    '''True if the sqlite file's header marks it as WAL mode (read/write versions of 2)'''
+    try:
+        with open(path,'rb') as f:
+            header=f.read(20)
+    except OSError:
+        return False
+    return len(header)==20 and header[18:20]==b'\x02\x02'
+
+def stage_generation(dbname):
+    '''Copies the live database into <dbname>.staging.sqlite and returns the staging dbname.
+
+    The crawl then writes to the copy while readers keep the untouched live file.'''
+    staging=dbname+STAGING_SUFFIX
+    for path in (staging+'.sqlite',staging+'.sqlite-journal',staging+'.version'):
+        if os.path.exists(path):
+            os.remove(path)
+    target=sqlite3.connect(staging+'.sqlite')
+    if os.path.exists(dbname+'.sqlite'):
+        source=sqlite3.connect(dbname+'.sqlite')
+        source.backup(target)
+        source.close()
+    target.execute('PRAGMA journal_mode=DELETE')
+    target.close()
+    return staging
+
+def validate_generation(staging,dbname,max_shrink=0.1):
+    '''Checks a staged database before it is published.
+
+    Returns a list of problems: a failed integrity check, a missing or empty table, or a
+    table that lost more than max_shrink of the rows the live generation has.'''
+    problems=[]
+    conn=sqlite3.connect(staging+'.sqlite')
+    try:
+        result=[row[0] for row in conn.execute('PRAGMA integrity_check')]
+        if result!=['ok']:
+            problems.append('integrity check failed: '+'; '.join(result[:5]))
+        live_conn=sqlite3.connect('file:{}?mode=ro'.format(os.path.abspath(dbname+'.sqlite')),uri=True) \
+            if os.path.exists(dbname+'.sqlite') else None
+        for table_name in PUBLISHED_TABLES:
+            try:
+                count=conn.execute('SELECT COUNT(*) FROM '+table_name).fetchone()[0]
+            except sqlite3.Error as e:
+                problems.append('{}: {}'.format(table_name,e))
+                continue
+            if count==0:
+                problems.append('{} is empty'.format(table_name))
+            if live_conn is None:
+                continue
+            try:
+                live_count=live_conn.execute('SELECT COUNT(*) FROM '+table_name).fetchone()[0]
+            except sqlite3.Error:
+                continue
+            if count<live_count*(1-max_shrink):
+                problems.append('{} shrank from {} to {} rows'.format(table_name,live_count,count))
+        if live_conn is not None:
+            live_conn.close()
+    finally:
+        conn.close()
+    return problems
+
+def publish_generation(dbname,staging,max_shrink=0.1):
+    '''Validates the staged database and atomically renames it over the live one.
+
+    Readers with the old file open keep reading it until they notice the new generation
+    and reopen; the replaced file is kept as <dbname>.previous.sqlite for rollback.
+    Raises ValueError without touching the live file if validation fails.'''
+    problems=validate_generation(staging,dbname,max_shrink)
+    if problems:
+        raise ValueError('staged database {} not published: {}'.format(staging,', '.join(problems)))
+    live=dbname+'.sqlite'
+    if is_wal_database(live):
+        ##A live file last written in WAL mode must leave it before anything is renamed over it,
+        ##which needs every other connection to it closed
+        conn=sqlite3.connect(live,timeout=30)
+        mode=conn.execute('PRAGMA journal_mode=DELETE').fetchone()[0]
+        conn.close()
+        if mode.lower()!='delete':
+            raise RuntimeError('{} is still in WAL mode; stop other writers and retry'.format(live))
+    _replace_keeping_previous(dbname,staging+'.sqlite')
+    return bump_data_version(dbname)
+
+def rollback_generation(dbname):
+    '''Swaps <dbname>.previous.sqlite back in; the generation it replaces becomes the previous one'''
+    previous=dbname+PREVIOUS_SUFFIX+'.sqlite'
+    if not os.path.exists(previous):
+        raise FileNotFoundError('no previous generation at '+previous)
+    rollback_path=dbname+'.rollback.sqlite'
+    os.replace(previous,rollback_path)
+    _replace_keeping_previous(dbname,rollback_path)
+    return bump_data_version(dbname)
+
+def start_crawl(sqlite_conn,match_type,countries):
+    '''Records a new crawl version and returns its crawl_id.
+
+    The first versioned crawl also snapshots whatever is already in the stats
+    tables, so history starts from the data we had before versioning existed.'''
+    cur=sqlite_conn.cursor()
+    cur.execute('INSERT INTO Crawls (started_at,match_type,countries) VALUES (?,?,?)',
+                (datetime.datetime.now().isoformat(),match_type,','.join(countries)))
+    crawl_id=cur.lastrowid
+    for table_name,columns in STATS_TABLES.items():
+        cur.execute('SELECT 1 FROM Stats_History WHERE table_name=? LIMIT 1',(table_name,))
+        if cur.fetchone():
+            continue
+        rows=cur.execute('SELECT player,player_id,'+','.join(columns)+' FROM '+table_name).fetchall()
+        cur.executemany('INSERT INTO Stats_History (crawl_id,table_name,player,player_id,delta) VALUES (?,?,?,?,?)',
+                        [(crawl_id,table_name,row[0],row[1],json.dumps(dict(zip(columns,row[2:])))) for row in rows])
+    sqlite_conn.commit()
+    return crawl_id
+
+def finish_crawl(sqlite_conn,crawl_id):
+    '''Marks a crawl version as complete'''
+    sqlite_conn.execute('UPDATE Crawls SET finished_at=? WHERE crawl_id=?',(datetime.datetime.now().isoformat(),crawl_id))
+    sqlite_conn.commit()
+
+def row_hash(values):
+    '''Returns the content hash of a stats row's values'''
+    return hashlib.sha1(json.dumps(list(values)).encode('utf-8')).hexdigest()
+
+def load_row_hashes(cur,table_name):
+    '''Returns {player_id: row_hash} for every stats row of table_name'''
+    cur.execute('SELECT player_id,row_hash FROM Stats_Row_Hashes WHERE table_name=?',(table_name,))
+    return dict(cur.fetchall())
+
+def store_stats_row(cur,table_name,player_id,player_name,values,crawl_id):
+    '''Writes a player's stats row and records the changed columns as a delta for crawl_id.
+
+    Rows are keyed by player_id, since names are not unique. Only columns whose value
+    differs from the stored row are written to Stats_History, so an unchanged player
+    costs nothing in the history.
+    Returns 'new', 'changed' or 'unchanged'.'''
+    columns=STATS_TABLES[table_name]
+    new_row=dict(zip(columns,values))
+    cur.execute('SELECT '+','.join(columns)+' FROM '+table_name+' WHERE player_id=?',(player_id,))
+    existing=cur.fetchone()
+    if existing is None:
+        ##A namesake's row from before rows carried player_id: claim one, with its history
+        cur.execute('SELECT rowid,'+','.join(columns)+' FROM '+table_name+' WHERE player=? AND player_id IS NULL '
+                    'ORDER BY rowid LIMIT 1',(player_name,))
+        legacy=cur.fetchone()
+        if legacy is not None:
+            cur.execute('UPDATE '+table_name+' SET player_id=? WHERE rowid=?',(player_id,legacy[0]))
+            claimed=cur.execute('UPDATE Stats_History SET player_id=? WHERE table_name=? AND player=? '
+                                'AND player_id IS NULL',(player_id,table_name,player_name)).rowcount
+            ##History already claimed by another namesake: restart this player's history in full
+            existing=legacy[1:] if claimed else (None,)*len(columns)
+    if existing is None:
+        status='new'
+        delta=new_row
+        cur.execute('INSERT INTO '+table_name+' (player,player_id,'+','.join(columns)+') VALUES (?,?'+',?'*len(columns)+')',
+                    (player_name,player_id)+tuple(values))
+    else:
+        delta={col:val for col,old,val in zip(columns,existing,values) if old!=val}
+        status='changed' if delta else 'unchanged'
+        if delta:
+            cur.execute('UPDATE '+table_name+' SET '+','.join(col+'=?' for col in delta)+' WHERE player_id=?',
+                        tuple(delta.values())+(player_id,))
+    if delta:
+        cur.execute('INSERT INTO Stats_History (crawl_id,table_name,player,player_id,delta) VALUES (?,?,?,?,?)',
+                    (crawl_id,table_name,player_name,player_id,json.dumps(delta)))
+    cur.execute('INSERT OR REPLACE INTO Stats_Row_Hashes (table_name,player_id,row_hash) VALUES (?,?,?)',
+                (table_name,player_id,row_hash(values)))
+    return status
+
+def iter_stats_as_of(cur,table_name,as_of,player_query=None,params=(),after=None):
+    '''Yields the rows of a stats table as they were after crawl as_of, ordered by player
+    name then player_id (namesakes are separate rows).
+
+    player_query is an optional sub-select of (player_id, player) used to restrict the result:
+    rows match on player_id, or on the name if no crawl has keyed them yet.
+    Deltas are folded in crawl order, so each player's row is the latest value of every column.
+    Only one player's row is held in memory at a time; after=(player,player_id) skips rows
+    up to that one.'''
+    columns=STATS_TABLES[table_name]
+    query='SELECT player,player_id,delta FROM Stats_History WHERE table_name=? AND crawl_id<=?'
+    args=[table_name,as_of]
+    if player_query:
+        query+=(' AND (player_id IN (SELECT player_id FROM ({0})) OR '
+                '(player_id IS NULL AND player IN (SELECT player FROM ({0}))))').format(player_query)
+        args.extend(list(params)*2)
+    if after is not None:
+        query+=' AND (player>? OR (player=? AND IFNULL(player_id,-1)>IFNULL(?,-1)))'
+        args.extend([after[0],after[0],after[1]])
+    query+=' ORDER BY player,IFNULL(player_id,-1),crawl_id'
+    current,values=None,None
+    for player,player_id,delta in cur.execute(query,args):
+        if (player,player_id)!=current:
+            if current is not None:
+                yield dict(player=current[0],player_id=current[1],**values)
+            current,values=(player,player_id),dict.fromkeys(columns)
+        values.update(json.loads(delta))
+    if current is not None:
+        yield dict(player=current[0],player_id=current[1],**values)
+
+def get_stats_as_of(cur,table_name,as_of,player_query=None,params=(),after=None,limit=None):
+    '''Returns up to limit rows of iter_stats_as_of as a list'''
+    return list(itertools.islice(iter_stats_as_of(cur,table_name,as_of,player_query,params,after),limit))
+
+def create_indexes(cur):
+    '''Creates the indexes used by the API lookups and keyset pagination'''
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_countries_country ON Countries (country)')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_players_country ON Players (country_id,player_id)')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_players_player ON Players (player)')
+    for table_name,columns in STATS_TABLES.items():
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_{0}_player ON {0} (player)'.format(table_name))
+        for column in columns:
+            if column in INDEXED_NUMERIC_COLUMNS:
+                cur.execute('CREATE INDEX IF NOT EXISTS idx_{0}_{1} ON {0} (CAST({1} AS REAL))'.format(table_name,column))
+
 # def db_execute(conn,query):
     # '''executes provided query and commits the connection'''
     # cur=conn.cursor()
     # cur.execute(query)
     # conn.commit()
 
+def add_player_ids(cur):
+    '''Adds the player_id key to stats and history tables created when rows were keyed by
+    name alone, filling it in wherever the name belongs to exactly one player.
+
+    Rows of namesakes stay NULL until the next crawl of each player claims one by name.'''
+    for table_name in tuple(STATS_TABLES)+('Stats_History',):
+        columns=[row[1] for row in cur.execute('PRAGMA table_info('+table_name+')')]
+        if 'player_id' not in columns:
+            cur.execute('ALTER TABLE '+table_name+' ADD COLUMN player_id INTEGER')
+            cur.execute('''UPDATE {0} SET player_id=(SELECT player_id FROM Players p WHERE p.player={0}.player)
+                        WHERE player IN (SELECT player FROM Players GROUP BY player HAVING COUNT(*)=1)'''.format(table_name))
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_{0}_player_id ON {0} (player_id)'.format(table_name))
+
+def create_tables(sqlite_conn):
+    '''Creates the stats, crawl history tables and their indexes if missing'''
+    cur = sqlite_conn.cursor()
+    cur.execute('''CREATE TABLE IF NOT EXISTS Countries
+            (country_id INTEGER PRIMARY KEY,country TEXT)''')
+    
+    cur.execute('''CREATE TABLE IF NOT EXISTS Players
+            (country_id INTEGER,player_id INTEGER UNIQUE,player TEXT,odi_cap TEXT,t20_cap TEXT)''')
+    #cur.execute('''CREATE TABLE IF NOT EXISTS Batting_Stats_Odi
+    #                    (player TEXT,runs INTEGER,sixes INTEGER,fours INTEGER,ducks INTEGER,fifties INTEGER,hundreds INTEGER,balls_faced INTEGER,innings INTEGER)''')
+    #cur.execute('''CREATE TABLE IF NOT EXISTS Bowling_Stats_Odi
+    #                    (player TEXT,bowlinnings INTEGER ,overs INTEGER ,runsgiven INTEGER,maidens INTEGER,wickets INTEGER,fourw INTEGER,fivew INTEGER)''')
+    #cur.execute('''CREATE TABLE IF NOT EXISTS Batting_Stats_T20
+    #                    (player TEXT,runs INTEGER,sixes INTEGER,fours INTEGER,ducks INTEGER,fifties INTEGER,hundreds INTEGER,balls_faced INTEGER,innings INTEGER)''')
+    #cur.execute('''CREATE TABLE IF NOT EXISTS Bowling_Stats_T20
+    #                    (player TEXT,bowlinnings INTEGER ,overs INTEGER ,runsgiven INTEGER,maidens INTEGER,wickets INTEGER,fourw INTEGER,fivew INTEGER)''')
+    
+    cur.execute('''CREATE TABLE IF NOT EXISTS Batting_Stats_Odi (player TEXT,playing_span TEXT,matches_played TEXT,
+                innings_batted TEXT,not_outs TEXT, runs_scored TEXT,highest_innings_score TEXT,batting_average TEXT,
+                balls_faced TEXT,batting_strike_rate TEXT,hundreds_scored TEXT,scores_between_50_and_99 TEXT,
+                ducks_scored TEXT,boundary_fours TEXT,boundary_sixes TEXT,player_id INTEGER)''')
+    
+    cur.execute('''CREATE TABLE IF NOT EXISTS Bowling_Stats_Odi (player TEXT,playing_span TEXT,matches_played TEXT,innings_bowled_in TEXT,
+                overs_bowled TEXT,balls_bowled TEXT,runs_conceded TEXT,maidens_earned TEXT,wickets_taken TEXT, 
+                best_bowling_in_an_innings TEXT,bowling_average TEXT,economy_rate TEXT,bowling_strike_rate TEXT,
+                four_wkts_exactly_in_an_inns TEXT,five_wickets_in_an_inns TEXT,player_id INTEGER)''')        
+    cur.execute('''CREATE TABLE IF NOT EXISTS Batting_Stats_T20 (player TEXT,playing_span TEXT,matches_played TEXT,
+                innings_batted TEXT,not_outs TEXT, runs_scored TEXT,highest_innings_score TEXT,batting_average TEXT,
+                balls_faced TEXT,batting_strike_rate TEXT,hundreds_scored TEXT,scores_between_50_and_99 TEXT,ducks_scored TEXT,
+                boundary_fours TEXT,boundary_sixes TEXT,player_id INTEGER)''')
+    cur.execute('''CREATE TABLE IF NOT EXISTS Bowling_Stats_T20 (player TEXT, playing_span TEXT,matches_played TEXT,innings_bowled_in TEXT,
+                overs_bowled TEXT,balls_bowled TEXT,runs_conceded TEXT,maidens_earned TEXT,wickets_taken TEXT, 
+                best_bowling_in_an_innings TEXT,bowling_average TEXT,economy_rate TEXT,bowling_strike_rate TEXT,
+                four_wkts_exactly_in_an_inns TEXT,five_wickets_in_an_inns TEXT,player_id INTEGER)''') 
+    
+    ##Crawl versions and per-crawl deltas of changed stats columns
+    cur.execute('''CREATE TABLE IF NOT EXISTS Crawls (crawl_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                started_at TEXT,finished_at TEXT,match_type TEXT,countries TEXT)''')
+    cur.execute('''CREATE TABLE IF NOT EXISTS Stats_History (crawl_id INTEGER,table_name TEXT,player TEXT,delta TEXT,
+                player_id INTEGER)''')
+    cur.execute('''CREATE INDEX IF NOT EXISTS idx_stats_history ON Stats_History (table_name,player,crawl_id)''')
+    cur.execute('''CREATE TABLE IF NOT EXISTS Stats_Row_Hashes (table_name TEXT,player_id INTEGER,row_hash TEXT,
+                PRIMARY KEY (table_name,player_id))''')
+    add_player_ids(cur)
+    create_indexes(cur)
+    sqlite_conn.commit()
+
+def schema_is_current(cur):
+    '''True once create_tables has run on the database: the crawl history tables exist and
+    stats and history rows carry player_id'''
+    tables={row[0] for row in cur.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    if not {'Crawls','Stats_History','Stats_Row_Hashes'}<=tables:
+        return False
+    return all('player_id' in [row[1] for row in cur.execute('PRAGMA table_info('+table_name+')')]
+               for table_name in tuple(STATS_TABLES)+('Stats_History',))
+
+def migrate_database(dbname,publish=False,max_shrink=0.1):
+    '''Brings a database written by an older parser up to create_tables and publishes a new
+    data version, so the API notices. With publish the migration runs on a staged copy that
+    is validated and swapped in like a crawl.
+
+    Returns the new data version, or None if the schema was already current.'''
+    conn=sqlite3.connect(dbname+'.sqlite')
+    try:
+        current=schema_is_current(conn.cursor())
+    finally:
+        conn.close()
+    if current:
+        return None
+    if publish:
+        staging=stage_generation(dbname)
+        with get_db_conn(staging) as sqlite_conn:
+            create_tables(sqlite_conn)
+        sqlite_conn.close()
+        return publish_generation(dbname,staging,max_shrink)
+    with get_db_conn(dbname,journal_mode='WAL') as sqlite_conn:
+        create_tables(sqlite_conn)
+    sqlite_conn.close()
+    return bump_data_version(dbname)
+
 def get_country_details(country_links,selected_countries,sqlite_conn):
     
     cur = sqlite_conn.cursor()
@@ -74,15 +466,32 @@ def get_player_details(country_ids,sqlite_conn,match_types):
             
                 sqlite_conn.commit()
 
-def get_player_statistics(action,play_list,match_type,sqlite_conn):
+def get_player_statistics(action,play_list,match_type,sqlite_conn,crawl_id,progress=None,commit_every=100):
+    '''Fetches and stores stats for every player in play_list.
+
+    progress(done,counts) is called every 10 players. commit_every=None keeps the
+    whole run in one transaction, so readers only ever see complete crawls.'''
     
     cur = sqlite_conn.cursor() 
     i=0
     print('match_type>>>',match_type)
+    
+    if match_type==2:
+        table_name = 'Batting_Stats_Odi' if action=='batting' else 'Bowling_Stats_Odi'
+    elif match_type==3:
+        table_name = 'Batting_Stats_T20' if action=='batting' else 'Bowling_Stats_T20'
+    
+    ##Rows whose content hash matches the stored one are skipped without touching the table
+    hashes = load_row_hashes(cur,table_name)
+    counts = {'new':0,'changed':0,'unchanged':0}
     for play in play_list:
         i+=1
         if i%100==0:
             print('completed',i)
+            if commit_every:
+                sqlite_conn.commit()
+        if progress and i%10==0:
+            progress(i,counts)
         pid=play[2]
         country_name=play[1]
         player_name=play[3]
@@ -107,13 +516,6 @@ def get_player_statistics(action,play_list,match_type,sqlite_conn):
             print(play)
             continue
         
-        if match_type==2:
-            table_name_bat = 'Batting_Stats_Odi'
-            table_name_bowl = 'Bowling_Stats_Odi'
-        elif match_type==3:
-            table_name_bat = 'Batting_Stats_T20'
-            table_name_bowl = 'Bowling_Stats_T20'
-        
         if action=="bowling":
             
             Span = dict_col_val.get('Span','NA')
@@ -133,12 +535,7 @@ def get_player_statistics(action,play_list,match_type,sqlite_conn):
             
             
             
-            cur.execute('''INSERT OR IGNORE INTO '''+table_name_bowl+ ''' (player,playing_span ,matches_played,innings_bowled_in,
-                    overs_bowled ,balls_bowled ,runs_conceded ,maidens_earned ,wickets_taken , 
-                    best_bowling_in_an_innings ,bowling_average ,economy_rate ,bowling_strike_rate ,
-                    four_wkts_exactly_in_an_inns ,five_wickets_in_an_inns)
-                    VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)''',(player_name,Span,Mat,Inns,Overs,Balls,Runs,Mdns,Wkts,BBI,Ave,Econ,SR,fourW,fiveW))  
-            sqlite_conn.commit()
+            values = (Span,Mat,Inns,Overs,Balls,Runs,Mdns,Wkts,BBI,Ave,Econ,SR,fourW,fiveW)
                     
         elif action =='batting':  
         
@@ -157,15 +554,113 @@ def get_player_statistics(action,play_list,match_type,sqlite_conn):
             Fours = dict_col_val.get('4s','NA')
             Sixes = dict_col_val.get('6s','NA')
             
-            cur.execute('''INSERT OR IGNORE INTO '''+table_name_bat+''' (player,playing_span ,matches_played ,
-                    innings_batted ,not_outs, runs_scored ,highest_innings_score ,batting_average ,
-                    balls_faced ,batting_strike_rate ,hundreds_scored ,scores_between_50_and_99 ,ducks_scored ,
-                    boundary_fours ,boundary_sixes)VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)''',(player_name,Span,Mat,Inns,NO,Runs,HS,Ave,BF,
-                    SR,No100s,No50s,Ducks,Fours,Sixes))
-            sqlite_conn.commit()
+            values = (Span,Mat,Inns,NO,Runs,HS,Ave,BF,SR,No100s,No50s,Ducks,Fours,Sixes)
+        
+        content_hash = row_hash(values)
+        if hashes.get(pid) == content_hash:
+            counts['unchanged']+=1
+            continue
+        counts[store_stats_row(cur,table_name,pid,player_name,values,crawl_id)]+=1
+        hashes[pid] = content_hash
     
+    sqlite_conn.commit()
+    print(table_name,'new',counts['new'],'changed',counts['changed'],'unchanged',counts['unchanged'])
+    return counts
         
 
+def recently_changed_player_ids(cur,table_name,days):
+    '''Returns ids of players whose table_name row changed in a crawl of the last days.
+
+    Players in a live series are the ones whose stats keep changing, so these go first.
+    The first crawl is skipped since its history is the baseline snapshot of every player.'''
+    since=(datetime.datetime.now()-datetime.timedelta(days=days)).isoformat()
+    cur.execute('''select distinct h.player_id from Stats_History h join Crawls c on c.crawl_id=h.crawl_id
+                where h.table_name=? and c.started_at>=? and h.player_id is not null
+                and h.crawl_id>(select min(crawl_id) from Crawls)''',(table_name,since))
+    return [row[0] for row in cur.fetchall()]
+
+def schedule_hot_jobs(dbname,queue,days):
+    '''Queues a high priority refresh of recently changed players for each stats table'''
+    with get_db_conn(dbname) as sqlite_conn:
+        cur=sqlite_conn.cursor()
+        for match_type in MATCH_TYPES:
+            for action in ACTIONS:
+                table_name='{}_Stats_{}'.format(action.capitalize(),'Odi' if match_type=='ODI' else 'T20')
+                player_ids=recently_changed_player_ids(cur,table_name,days)
+                if player_ids:
+                    queue.enqueue(match_type,action,player_ids=player_ids,priority=PRIORITY_HOT)
+
+def run_refresh_job(dbname,queue,job,publish=False):
+    '''Crawls one queued job's stats in a single transaction and publishes a new data version.
+
+    In place, the database is in WAL mode, so the API keeps reading the previous data until
+    the commit and never caches a half-refreshed table under the old data version. With
+    publish the job runs against a staged copy that is then validated and swapped in.'''
+    logger=logging.getLogger(__name__)
+    job_id=job['job_id']
+    match_type=2 if job['match_type']=='ODI' else 3
+    cap='odi_cap' if match_type==2 else 't20_cap'
+    query='select a.country_id,a.country,b.player_id,b.player from Countries a,Players b where a.country_id=b.country_id and b.'+cap+'="Y"'
+    params=[]
+    if job['countries']:
+        query+=' and a.country in ('+','.join('?'*len(job['countries']))+')'
+        params+=job['countries']
+    if job['player_ids']:
+        query+=' and b.player_id in ('+','.join('?'*len(job['player_ids']))+')'
+        params+=job['player_ids']
+    try:
+        target=stage_generation(dbname) if publish else dbname
+        with get_db_conn(target,journal_mode=None if publish else 'WAL') as sqlite_conn:
+            play_list=sqlite_conn.execute(query,params).fetchall()
+            queue.progress(job_id,total=len(play_list))
+            crawl_id=start_crawl(sqlite_conn,job['match_type'],job['countries'] or ALL_COUNTRIES)
+            queue.progress(job_id,crawl_id=crawl_id)
+            logger.info('Job {} started crawl version {} for {} players'.format(job_id,crawl_id,len(play_list)))
+            counts=get_player_statistics(job['action'],play_list,match_type,sqlite_conn,crawl_id,
+                                         progress=lambda done,counts:queue.progress(job_id,done=done,**counts),
+                                         commit_every=None)
+            finish_crawl(sqlite_conn,crawl_id)
+        sqlite_conn.close()
+        if publish:
+            publish_generation(dbname,target)
+        else:
+            bump_data_version(dbname)
+        queue.progress(job_id,done=len(play_list),**counts)
+        queue.finish(job_id)
+    except Exception as e:
+        logger.exception('Refresh job {} failed'.format(job_id))
+        queue.finish(job_id,error=str(e))
+
+def run_scheduler(dbname,interval,hot_interval,hot_days,poll=5,publish=False):
+    '''Runs queued refresh jobs forever, queueing a full sweep every interval seconds
+    and a refresh of recently changed players every hot_interval seconds.
+
+    Jobs (including ones queued through the admin API) live in <dbname>_jobs.sqlite.'''
+    logger=logging.getLogger(__name__)
+    queue=JobQueue(dbname+'_jobs.sqlite')
+    if migrate_database(dbname,publish) is not None:
+        logger.info('Migrated {} to the current schema'.format(dbname))
+    requeued=queue.requeue_interrupted()
+    if requeued:
+        logger.info('Requeued {} interrupted jobs'.format(requeued))
+    next_full=next_hot=time.time()
+    while True:
+        now=time.time()
+        if now>=next_hot:
+            schedule_hot_jobs(dbname,queue,hot_days)
+            next_hot=now+hot_interval
+        if now>=next_full:
+            for match_type in MATCH_TYPES:
+                for action in ACTIONS:
+                    queue.enqueue(match_type,action,priority=PRIORITY_FULL)
+            next_full=now+interval
+        job=queue.claim()
+        if job is None:
+            time.sleep(poll)
+            continue
+        logger.info('Running refresh job {job_id}: {match_type} {action} priority {priority}'.format(**job))
+        run_refresh_job(dbname,queue,job,publish)
+
 def main():    
     
     global url
@@ -195,19 +690,57 @@ def main():
                         help='enter ODI/T20/ALL to fetch corresponding data')
     parser.add_argument('-c', '--countries', dest='countries',default='ALL',nargs='*',
                         help='valid entries =  [australia,bangladesh,england,india,new-zealand,pakistan,south-africa,sri-lanka,west-indies,zimbabwe,afghanistan].Players performance from mentioned countries data would be updated in database,default = ALL to update all players from all countries')
+    parser.add_argument('--publish', dest='publish', action='store_true',
+                        help='build into <databasename>.staging.sqlite, validate it and atomically swap it in')
+    parser.add_argument('--max-shrink', dest='max_shrink', type=float, default=0.1,
+                        help='refuse to publish if a table lost more than this fraction of its rows, default = 0.1')
+    parser.add_argument('--rollback', dest='rollback', action='store_true',
+                        help='swap the previous published generation back in and exit')
+    parser.add_argument('--migrate', dest='migrate', action='store_true',
+                        help='add the crawl history tables and player_id keys to an older database and exit; the API needs them')
+    parser.add_argument('--schedule', dest='schedule', action='store_true',
+                        help='run as a long-lived refresh scheduler instead of a one-off crawl')
+    parser.add_argument('--interval', dest='interval', type=float, default=86400,
+                        help='seconds between full refresh sweeps in scheduler mode, default = 86400')
+    parser.add_argument('--hot-interval', dest='hot_interval', type=float, default=900,
+                        help='seconds between refreshes of recently changed players in scheduler mode, default = 900')
+    parser.add_argument('--hot-days', dest='hot_days', type=float, default=14,
+                        help='players changed in crawls of the last N days count as recently changed, default = 14')
 
     args = parser.parse_args()
     dbname = args.databasename
     countries = args.countries
     match_type = args.typeofmatch
     
+    if args.rollback:
+        version=rollback_generation(dbname)
+        print('Rolled back {} to the previous generation, data version {}'.format(dbname,version))
+        return
     
-    all_countries =  ['australia','bangladesh','england','india','new-zealand','pakistan','south-africa','sri-lanka','west-indies','zimbabwe','afghanistan']
+    if args.migrate:
+        version=migrate_database(dbname,args.publish,args.max_shrink)
+        if version is None:
+            print('{} already has the current schema'.format(dbname))
+        else:
+            print('Migrated {} to the current schema, data version {}'.format(dbname,version))
+        return
+    
+    if args.schedule:
+        logging.basicConfig(level=logging.INFO,format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+        run_scheduler(dbname,args.interval,args.hot_interval,args.hot_days,publish=args.publish)
+        return
+    
+    ##With --publish every phase writes to a staged copy; readers only see the final swap
+    live_dbname = dbname
+    journal_mode = None if args.publish else 'WAL'
+    if args.publish:
+        dbname = stage_generation(live_dbname)
+        logger.info('Building into staging database {}'.format(dbname))
     
     if countries=='ALL':
-        selected_countries = all_countries
+        selected_countries = ALL_COUNTRIES
     else:
-        selected_countries = [x for x in countries if x in all_countries]
+        selected_countries = [x for x in countries if x in ALL_COUNTRIES]
         
     
     #u1 = 'http://www.espncricinfo.com/story/_/id/18791072/all-cricket-teams-index'
@@ -250,55 +783,23 @@ def main():
     #print(country_links)
     
     ##Create necessary tables in database for insertion of stats data
-    with get_db_conn(dbname) as sqlite_conn:
-        cur = sqlite_conn.cursor()
-        cur.execute('''CREATE TABLE IF NOT EXISTS Countries
-                (country_id INTEGER PRIMARY KEY,country TEXT)''')
-        
-        cur.execute('''CREATE TABLE IF NOT EXISTS Players
-                (country_id INTEGER,player_id INTEGER UNIQUE,player TEXT,odi_cap TEXT,t20_cap TEXT)''')
-        #cur.execute('''CREATE TABLE IF NOT EXISTS Batting_Stats_Odi
-        #                    (player TEXT,runs INTEGER,sixes INTEGER,fours INTEGER,ducks INTEGER,fifties INTEGER,hundreds INTEGER,balls_faced INTEGER,innings INTEGER)''')
-        #cur.execute('''CREATE TABLE IF NOT EXISTS Bowling_Stats_Odi
-        #                    (player TEXT,bowlinnings INTEGER ,overs INTEGER ,runsgiven INTEGER,maidens INTEGER,wickets INTEGER,fourw INTEGER,fivew INTEGER)''')
-        #cur.execute('''CREATE TABLE IF NOT EXISTS Batting_Stats_T20
-        #                    (player TEXT,runs INTEGER,sixes INTEGER,fours INTEGER,ducks INTEGER,fifties INTEGER,hundreds INTEGER,balls_faced INTEGER,innings INTEGER)''')
-        #cur.execute('''CREATE TABLE IF NOT EXISTS Bowling_Stats_T20
-        #                    (player TEXT,bowlinnings INTEGER ,overs INTEGER ,runsgiven INTEGER,maidens INTEGER,wickets INTEGER,fourw INTEGER,fivew INTEGER)''')
-        
-        cur.execute('''CREATE TABLE IF NOT EXISTS Batting_Stats_Odi (player TEXT,playing_span TEXT,matches_played TEXT,
-                    innings_batted TEXT,not_outs TEXT, runs_scored TEXT,highest_innings_score TEXT,batting_average TEXT,
-                    balls_faced TEXT,batting_strike_rate TEXT,hundreds_scored TEXT,scores_between_50_and_99 TEXT,
-                    ducks_scored TEXT,boundary_fours TEXT,boundary_sixes TEXT)''')
-        
-        cur.execute('''CREATE TABLE IF NOT EXISTS Bowling_Stats_Odi (player TEXT,playing_span TEXT,matches_played TEXT,innings_bowled_in TEXT,
-                    overs_bowled TEXT,balls_bowled TEXT,runs_conceded TEXT,maidens_earned TEXT,wickets_taken TEXT, 
-                    best_bowling_in_an_innings TEXT,bowling_average TEXT,economy_rate TEXT,bowling_strike_rate TEXT,
-                    four_wkts_exactly_in_an_inns TEXT,five_wickets_in_an_inns TEXT)''')        
-        cur.execute('''CREATE TABLE IF NOT EXISTS Batting_Stats_T20 (player TEXT,playing_span TEXT,matches_played TEXT,
-                    innings_batted TEXT,not_outs TEXT, runs_scored TEXT,highest_innings_score TEXT,batting_average TEXT,
-                    balls_faced TEXT,batting_strike_rate TEXT,hundreds_scored TEXT,scores_between_50_and_99 TEXT,ducks_scored TEXT,
-                    boundary_fours TEXT,boundary_sixes TEXT)''')
-        cur.execute('''CREATE TABLE IF NOT EXISTS Bowling_Stats_T20 (player TEXT, playing_span TEXT,matches_played TEXT,innings_bowled_in TEXT,
-                    overs_bowled TEXT,balls_bowled TEXT,runs_conceded TEXT,maidens_earned TEXT,wickets_taken TEXT, 
-                    best_bowling_in_an_innings TEXT,bowling_average TEXT,economy_rate TEXT,bowling_strike_rate TEXT,
-                    four_wkts_exactly_in_an_inns TEXT,five_wickets_in_an_inns TEXT)''') 
-        
-        
-        sqlite_conn.commit();
+    with get_db_conn(dbname,journal_mode) as sqlite_conn:
+        create_tables(sqlite_conn)
     
     logger.info('Created necessary tables in database')
     
     ##Fetch all  countires name and id and store in database
-    with get_db_conn(dbname) as sqlite_conn:
+    with get_db_conn(dbname,journal_mode) as sqlite_conn:
         logger.info('Fetching select countries data')
         get_country_details(country_links,selected_countries,sqlite_conn)
+    if not args.publish:
+        bump_data_version(dbname)
     
     logger.info('Inserted data into Countries table')
     
     
     ##Fetch countries id from database and store in list
-    with get_db_conn(dbname) as sqlite_conn:
+    with get_db_conn(dbname,journal_mode) as sqlite_conn:
         cur = sqlite_conn.cursor()
         cur.execute('SELECT country_id,country FROM Countries')
         countryid_list=list()
@@ -310,6 +811,8 @@ def main():
             get_player_details(countryid_list,sqlite_conn,[3]) 
         elif match_type =='ALL':
             get_player_details(countryid_list,sqlite_conn,[2,3]) 
+    if not args.publish:
+        bump_data_version(dbname)
    
     
 
@@ -317,7 +820,7 @@ def main():
     #print('Inserted data into Players table')
     
     ##select country id,name and player id,name from database and fetch player statistics
-    with get_db_conn(dbname) as sqlite_conn:
+    with get_db_conn(dbname,journal_mode) as sqlite_conn:
         cur = sqlite_conn.cursor()
         
         cur.execute('''select a.country_id,a.country,b.player_id,b.player from Countries a,Players b where a.country_id=b.country_id and b.odi_cap="Y";''')
@@ -331,22 +834,36 @@ def main():
             play_listt20.append(row)
 ############################################################################################################           
             
-    with get_db_conn(dbname) as sqlite_conn:
+    with get_db_conn(dbname,journal_mode) as sqlite_conn:
+        crawl_id = start_crawl(sqlite_conn,match_type,selected_countries)
+        logger.info('Started crawl version {}'.format(crawl_id))
         
+        runs = []
         if match_type == 'ODI':
             for action in ['batting','bowling']:
-                get_player_statistics(action,play_listodi,2,sqlite_conn)
+                runs.append(get_player_statistics(action,play_listodi,2,sqlite_conn,crawl_id))
                 
                 
         elif match_type == 'T20':
             for action in ['batting','bowling']:
-                get_player_statistics(action,play_listt20,3,sqlite_conn)
+                runs.append(get_player_statistics(action,play_listt20,3,sqlite_conn,crawl_id))
                 
                 
         elif match_type == 'ALL':
             for action in ['batting','bowling']:
-                get_player_statistics(action,play_listodi,2,sqlite_conn)        
-                get_player_statistics(action,play_listt20,3,sqlite_conn)
+                runs.append(get_player_statistics(action,play_listodi,2,sqlite_conn,crawl_id))
+                runs.append(get_player_statistics(action,play_listt20,3,sqlite_conn,crawl_id))
+        
+        finish_crawl(sqlite_conn,crawl_id)
+        
+        totals = {key:sum(run[key] for run in runs) for key in ('new','changed','unchanged')}
+        logger.info('Crawl {} stats rows: {new} new, {changed} changed, {unchanged} unchanged'.format(crawl_id,**totals))
+    if args.publish:
+        sqlite_conn.close()
+        version = publish_generation(live_dbname,dbname,args.max_shrink)
+        logger.info('Published {} as data version {}'.format(live_dbname,version))
+    else:
+        bump_data_version(dbname)
 
  
 
@@ -0,0 +1,293 @@
+"""The whole stats database as typed, in-memory pandas frames.
+
+The data is small (a few thousand players), so the dashboard loads it once per
+process and answers every page by filtering these frames with vectorised masks
+instead of querying SQLite per interaction:
+
+- countries: country_id, country (category)
+- players: country_id, country (category), player_id, player (category), odi_cap, t20_cap (bool)
+- batting / bowling: player (category), player_id (Int64, missing on rows no crawl has keyed
+  yet), format (category, ODI/T20) and the stats columns, numeric where every value parses
+  ('-' and 'NA' become missing), text otherwise; sorted by player and format, with
+  'batting_rows' / 'bowling_rows' mapping (player, format) to its slice of rows
+- player_names / player_labels: player_id -> name, and -> a label unique across namesakes
+
+Names are not unique, so players are picked and compared by player_id. Stats rows match on
+player_id, falling back to the name for rows without one, as the API does.
+
+Player search uses 'name_index': per (country, match_type) scope, the lowercased full
+names and surnames sorted, so a prefix lookup is a binary search however big the roster.
+
+Filters compare category codes as numpy arrays, which keeps a page's lookups well under
+a millisecond.
+
+Frames are shared between sessions and must be treated as read-only.
+"""
+
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from encoders import infer_type, type_column
+from schema import STATS_TABLES
+
+FORMATS = ('ODI', 'T20')
+
+
+def _typed_series(series):
+    """series as Int64 or float64 when encoders.infer_type finds it numeric, else unchanged,
+    so the frames type each column the way the bootstrap bundle does"""
+    values = series.tolist()
+    kind = infer_type(values)
+    if kind == 'str':
+        return series
+    return pd.Series(type_column(values), index=series.index, dtype='Int64' if kind == 'int' else 'float64')
+
+
+def _read(conn, query):
+    cur = conn.execute(query)
+    return pd.DataFrame(cur.fetchall(), columns=[field[0] for field in cur.description])
+
+
+def _stats_frame(conn, discipline):
+    frames = []
+    for fmt in FORMATS:
+        table_name = '{}_Stats_{}'.format(discipline, 'Odi' if fmt == 'ODI' else 'T20')
+        columns = ('player', 'player_id') + STATS_TABLES[table_name]
+        frame = _read(conn, 'SELECT {} FROM {}'.format(','.join(columns), table_name))
+        frame.insert(2, 'format', fmt)
+        frames.append(frame)
+    frame = pd.concat(frames, ignore_index=True)
+    frame['player_id'] = frame['player_id'].astype('Int64')
+    frame['format'] = pd.Categorical(frame['format'], categories=FORMATS)
+    for column in frame.columns[3:]:
+        frame[column] = _typed_series(frame[column])
+    return frame
+
+
+def _row_slices(frame):
+    """Maps (player, format) to the slice of rows holding it in a frame sorted by both."""
+    keys = frame['player'].cat.codes.to_numpy() * len(FORMATS) + frame['format'].cat.codes.to_numpy()
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    stops = np.r_[starts[1:], len(keys)]
+    players = frame['player'].cat.categories
+    return {(players[key // len(FORMATS)], FORMATS[key % len(FORMATS)]): slice(start, stop)
+            for key, start, stop in zip(keys[starts].tolist(), starts.tolist(), stops.tolist())}
+
+
+def _player_labels(players):
+    """player_id -> name, with the country (and if need be the id) added to names players share"""
+    names = players['player'].astype(str)
+    labels = names.where(~names.duplicated(keep=False), names + ' (' + players['country'].astype(str) + ')')
+    labels = labels.where(~labels.duplicated(keep=False), labels.str[:-1] + ', ' + players['player_id'].astype(str) + ')')
+    return dict(zip(players['player_id'].tolist(), labels.tolist()))
+
+
+def _category_mask(series, value):
+    """Boolean numpy mask of series == value for a categorical series."""
+    try:
+        code = series.cat.categories.get_loc(value)
+    except KeyError:
+        return np.zeros(len(series), dtype=bool)
+    return series.cat.codes.to_numpy() == code
+
+
+def load_dataset(dbname):
+    """Reads every table of dbname into typed frames; returns a dict of DataFrames."""
+    path = os.path.abspath(dbname + '.sqlite')
+    conn = sqlite3.connect('file:{}?mode=ro'.format(path), uri=True)
+    try:
+        countries = _read(conn, 'SELECT country_id, country FROM Countries ORDER BY country')
+        players = _read(conn, '''SELECT a.country_id, b.country, a.player_id, a.player, a.odi_cap, a.t20_cap
+                              FROM Players a JOIN Countries b ON a.country_id=b.country_id ORDER BY a.player''')
+        batting = _stats_frame(conn, 'Batting')
+        bowling = _stats_frame(conn, 'Bowling')
+    finally:
+        conn.close()
+    country_type = pd.CategoricalDtype(countries['country'].tolist())
+    countries['country'] = countries['country'].astype(country_type)
+    players['country'] = players['country'].astype(country_type)
+    for cap in ('odi_cap', 't20_cap'):
+        players[cap] = players[cap] == 'Y'
+    # One player dtype for every frame, so codes can be compared across them
+    player_type = pd.CategoricalDtype(sorted(set(players['player']) | set(batting['player']) | set(bowling['player'])))
+    data = {'countries': countries}
+    for name, frame in (('players', players), ('batting', batting), ('bowling', bowling)):
+        frame['player'] = frame['player'].astype(player_type)
+        data[name] = frame
+    for name in ('batting', 'bowling'):
+        data[name] = data[name].sort_values(['player', 'format'], kind='stable', ignore_index=True)
+        data[name + '_rows'] = _row_slices(data[name])
+    data['player_names'] = dict(zip(players['player_id'].tolist(), players['player'].astype(str).tolist()))
+    data['player_labels'] = _player_labels(players)
+    data['name_index'] = _name_index(players)
+    return data
+
+
+def _search_keys(players):
+    """Sorted (keys, player_ids, all player_ids by name): each player under their full lowercased
+    name and under each later word"""
+    pairs = set()
+    for player_id, name in zip(players['player_id'].tolist(), players['player'].astype(str).tolist()):
+        words = name.lower().split()
+        pairs.add((name.lower(), player_id))
+        pairs.update((word, player_id) for word in words[1:])
+    pairs = sorted(pairs)
+    # players is ordered by name
+    return (np.array([key for key, _ in pairs], dtype=object), np.array([pid for _, pid in pairs], dtype=np.int64),
+            players['player_id'].to_numpy(dtype=np.int64))
+
+
+def _name_index(players):
+    """Search keys for every (country or None, 'odi'/'t20' or None) scope"""
+    index = {}
+    for country in [None] + players['country'].cat.categories.tolist():
+        in_country = players if country is None else players[_category_mask(players['country'], country)]
+        for match_type in (None, 'odi', 't20'):
+            scope = in_country if match_type is None else in_country[in_country[match_type + '_cap'].to_numpy()]
+            index[(country, match_type)] = _search_keys(scope)
+    return index
+
+
+def search_players(data, prefix, country=None, match_type=None, offset=0, limit=50):
+    """Returns (player_ids, matches): up to limit players from offset on whose full name or
+    any later word starts with prefix (case-insensitive), and the number of matching keys.
+    An empty prefix pages through every player of the scope. data['player_labels'] names them."""
+    empty = (np.array([], dtype=object), np.array([], dtype=np.int64), np.array([], dtype=np.int64))
+    keys, player_ids, all_ids = data['name_index'].get((country or None, match_type or None), empty)
+    prefix = ' '.join(prefix.lower().split())
+    if not prefix:
+        return all_ids[offset:offset + limit].tolist(), len(all_ids)
+    start = np.searchsorted(keys, prefix, side='left')
+    # Every key with this prefix sorts before prefix + the highest code point
+    stop = np.searchsorted(keys, prefix + '\U0010ffff', side='left')
+    window = player_ids[start + offset:min(start + offset + limit, stop)].tolist()
+    return list(dict.fromkeys(window)), int(stop - start)
+
+
+def select_players(data, country=None, match_type=None):
+    """Players of a country, optionally only those capped in match_type ('odi'/'t20')."""
+    players = data['players']
+    mask = np.ones(len(players), dtype=bool)
+    if country:
+        mask &= _category_mask(players['country'], country)
+    if match_type:
+        mask &= players['{}_cap'.format(match_type.lower())].to_numpy()
+    return players[mask]
+
+
+def select_stats(data, country, play_type, match_type):
+    """Stats rows of the match_type-capped players of a country, like the API's per-country stats."""
+    players = select_players(data, country, match_type)
+    stats = data[play_type.lower()]
+    ids = stats['player_id']
+    selected = np.zeros(len(stats['player'].cat.categories), dtype=bool)
+    selected[players['player'].cat.codes.to_numpy()] = True
+    by_name = selected[stats['player'].cat.codes.to_numpy()] & ids.isna().to_numpy()
+    mask = (ids.isin(players['player_id']).to_numpy(dtype=bool) | by_name) & \
+        _category_mask(stats['format'], match_type.upper())
+    return stats[mask]
+
+
+def select_player(data, player_id):
+    """Returns {'batting_odi': frame, ...} with the player's rows in each stats table (possibly empty).
+
+    The frames hold the format and player_id columns; rows without a player_id belong to
+    every player of that name."""
+    name = data['player_names'].get(player_id)
+    result = {}
+    for play_type in ('batting', 'bowling'):
+        stats = data[play_type]
+        for fmt in FORMATS:
+            rows = stats.iloc[data[play_type + '_rows'].get((name, fmt), slice(0, 0))]
+            ids = rows['player_id']
+            result['{}_{}'.format(play_type, fmt.lower())] = \
+                rows[ids.isin([player_id]).to_numpy(dtype=bool) | ids.isna().to_numpy()]
+    return result
+
+
+# Columns of the comparison table, in display order
+COMPARISON_COLUMNS = ('matches', 'runs', 'batting_average', 'batting_strike_rate', 'runs_per_innings',
+                      'boundary_pct', 'non_boundary_strike_rate', 'wickets', 'bowling_average', 'economy_rate',
+                      'wickets_per_match')
+
+
+def _player_rows(data, play_type, index, match_type, columns):
+    """The players' rows as float columns, aligned to an index of player_ids (missing players are NaN)"""
+    stats = data[play_type]
+    stats = stats[_category_mask(stats['format'], match_type.upper())]
+    ids = stats['player_id']
+    # The scraped tables can hold the same player row more than once
+    keyed = stats[ids.isin(index).to_numpy(dtype=bool)].drop_duplicates('player_id')
+    positions = index.get_indexer(keyed['player_id'])
+    aligned = np.full((len(index), len(columns)), np.nan)
+    aligned[positions] = keyed[list(columns)].astype('float64').to_numpy()
+    # Players without a keyed row take the row stored under their name without a player_id, if any
+    missing = np.ones(len(index), dtype=bool)
+    missing[positions] = False
+    missing = np.flatnonzero(missing)
+    unkeyed = stats[ids.isna().to_numpy()].drop_duplicates('player')
+    rows = pd.Index(unkeyed['player'].astype(str)).get_indexer(
+        [data['player_names'].get(player_id) for player_id in index[missing]])
+    aligned[missing[rows >= 0]] = unkeyed[list(columns)].astype('float64').to_numpy()[rows[rows >= 0]]
+    return pd.DataFrame(aligned, index=index, columns=columns)
+
+
+def _ratio(numerator, denominator):
+    return (numerator / denominator).replace([np.inf, -np.inf], np.nan)
+
+
+def compare_players(data, player_ids, match_type):
+    """One row per player in player_ids (in that order, indexed by data['player_labels']) with
+    batting and bowling figures for match_type and derived metrics, computed column-wise over
+    all players at once:
+
+    - runs_per_innings: runs / innings batted
+    - boundary_pct: share of runs scored in fours and sixes
+    - non_boundary_strike_rate: runs per 100 balls not hit for four or six (the tables carry no
+      ball-by-ball data, so this is the closest measure of scoring between boundaries)
+    - wickets_per_match: wickets / matches played
+    """
+    index = pd.Index(list(dict.fromkeys(player_ids)), dtype='int64', name='player_id')
+    batting = _player_rows(data, 'batting', index, match_type,
+                           ('matches_played', 'innings_batted', 'runs_scored', 'batting_average', 'balls_faced',
+                            'batting_strike_rate', 'boundary_fours', 'boundary_sixes'))
+    bowling = _player_rows(data, 'bowling', index, match_type,
+                           ('matches_played', 'wickets_taken', 'bowling_average', 'economy_rate'))
+    
+    runs = batting['runs_scored']
+    fours, sixes = batting['boundary_fours'], batting['boundary_sixes']
+    boundary_runs = 4 * fours + 6 * sixes
+    result = pd.DataFrame({
+        'matches': batting['matches_played'].fillna(bowling['matches_played']),
+        'runs': runs,
+        'batting_average': batting['batting_average'],
+        'batting_strike_rate': batting['batting_strike_rate'],
+        'runs_per_innings': _ratio(runs, batting['innings_batted']),
+        'boundary_pct': _ratio(100 * boundary_runs, runs),
+        'non_boundary_strike_rate': _ratio(100 * (runs - boundary_runs), batting['balls_faced'] - fours - sixes),
+        'wickets': bowling['wickets_taken'],
+        'bowling_average': bowling['bowling_average'],
+        'economy_rate': bowling['economy_rate'],
+        'wickets_per_match': _ratio(bowling['wickets_taken'], bowling['matches_played']),
+    }, index=index)
+    result.index = pd.Index([data['player_labels'].get(player_id, str(player_id)) for player_id in index], name='player')
+    return result[list(COMPARISON_COLUMNS)].round(2)
+
+
+def distribution(data, play_type, column, match_type, country=None, bins=20):
+    """Equal-width histogram of a numeric stats column over the match_type-capped players of
+    country (or every country), with the same edges as /api/v2/get_stats/distribution.
+
+    Returns a frame of bins rows (start, end, players): the chart never sees player rows."""
+    if country:
+        stats = select_stats(data, country, play_type, match_type)
+    else:
+        stats = data[play_type.lower()]
+        stats = stats[_category_mask(stats['format'], match_type.upper())]
+    # Repeated rows count once, as in the API; namesakes keyed by player_id count separately
+    values = stats.drop_duplicates(['player', 'player_id', column])[column].astype('float64').dropna().to_numpy()
+    counts, edges = np.histogram(values, bins=bins)
+    return pd.DataFrame({'start': edges[:-1], 'end': edges[1:], 'players': counts})
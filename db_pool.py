@@ -0,0 +1,211 @@
+"""Bounded pool of read-only sqlite connections for the API.
+
+Threads check a connection out for the duration of a request (or a streamed
+response) and put it back when done, so connections are reused however many
+threads the server spawns: a threaded dev server starting a thread per
+request costs no extra file descriptors. Idle connections are reused last in,
+first out, which keeps the hottest page and prepared statement caches busy.
+At most max_connections are ever open; a checkout beyond that waits for one
+to come back.
+
+When the parser publishes a new generation by renaming a fresh file over the
+database path, open connections keep reading the old file; the pool notices
+the new inode (checked at most once per second) and replaces each connection
+opened on the old file as it is checked out, so readers never see a
+half-written database and never wait on one.
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+
+class PoolTimeout(sqlite3.OperationalError):
+    """No connection came back to the pool within the checkout timeout."""
+
+
+class _PooledConnection:
+    """A connection with the bookkeeping the pool needs between checkouts."""
+
+    def __init__(self, conn, generation):
+        self.conn = conn
+        self.generation = generation
+        self.last_used = time.monotonic()
+
+
+class ReadOnlyConnectionPool:
+    """Hands out at most max_connections reusable read-only connections."""
+
+    def __init__(self, dbname, mmap_size=256 * 1024 * 1024, cached_statements=256,
+                 health_check_interval=30, factory=sqlite3.Connection, generation_check_interval=1,
+                 max_connections=16, timeout=30):
+        self.dbname = dbname
+        self.factory = factory
+        self.mmap_size = mmap_size
+        self.cached_statements = cached_statements
+        self.health_check_interval = health_check_interval
+        self.generation_check_interval = generation_check_interval
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._idle = queue.LifoQueue()
+        self._open_count = 0
+        self._generation_checked = 0
+        self._current_generation = None
+        self._counters = {'opened': 0, 'reused': 0, 'closed': 0, 'in_use': 0, 'waits': 0,
+                          'health_checks': 0, 'health_failures': 0, 'generation_reopens': 0}
+
+    def _count(self, name, delta=1):
+        with self._lock:
+            self._counters[name] += delta
+
+    def _path(self):
+        return os.path.abspath(self.dbname + '.sqlite')
+
+    def _generation(self):
+        try:
+            return os.stat(self._path()).st_ino
+        except OSError:
+            return None
+
+    def _latest_generation(self):
+        """The database file's current inode, re-read at most once per generation_check_interval"""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._generation_checked < self.generation_check_interval:
+                return self._current_generation
+            self._generation_checked = now
+        generation = self._generation()
+        with self._lock:
+            self._current_generation = generation
+        return generation
+
+    def _open(self):
+        # Taken before connecting: a swap in between only costs one extra reopen
+        generation = self._generation()
+        try:
+            conn = sqlite3.connect('file:{}?mode=ro'.format(self._path()), uri=True,
+                                   check_same_thread=False, factory=self.factory,
+                                   cached_statements=self.cached_statements)
+            conn.execute('PRAGMA query_only=ON')
+            conn.execute('PRAGMA mmap_size={:d}'.format(self.mmap_size))
+        except BaseException:
+            with self._lock:
+                self._open_count -= 1
+            raise
+        self._count('opened')
+        return _PooledConnection(conn, generation)
+
+    def _discard(self, pooled):
+        with self._lock:
+            self._open_count -= 1
+            self._counters['closed'] += 1
+        try:
+            pooled.conn.close()
+        except sqlite3.Error:
+            pass
+
+    def _is_healthy(self, conn):
+        self._count('health_checks')
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            self._count('health_failures')
+            return False
+
+    def _usable(self, pooled):
+        generation = self._latest_generation()
+        if generation is not None and generation != pooled.generation:
+            self._count('generation_reopens')
+            return False
+        if time.monotonic() - pooled.last_used > self.health_check_interval:
+            return self._is_healthy(pooled.conn)
+        return True
+
+    def _take(self):
+        """Returns an idle connection, a new one if the pool has room, or waits for one."""
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    room = self._open_count < self.max_connections
+                    if room:
+                        self._open_count += 1
+                if room:
+                    return self._open()
+                self._count('waits')
+                try:
+                    pooled = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise PoolTimeout('no database connection free after {}s'.format(self.timeout))
+            if self._usable(pooled):
+                self._count('reused')
+                return pooled
+            self._discard(pooled)
+
+    def acquire(self):
+        """Checks a connection out; pass it back to release() when done."""
+        pooled = self._take()
+        self._count('in_use')
+        return pooled
+
+    def release(self, pooled):
+        self._count('in_use', -1)
+        pooled.last_used = time.monotonic()
+        self._idle.put(pooled)
+
+    def connection(self):
+        """Context manager checking a connection out for the duration of the block."""
+        return _Checkout(self)
+
+    def check(self):
+        """Runs a health check on a pooled connection."""
+        with self.connection() as conn:
+            return self._is_healthy(conn)
+
+    def close_all(self):
+        """Closes every idle connection; checked out ones are kept and reused once released."""
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(pooled)
+
+    def after_fork(self):
+        """Forgets connections inherited from a parent process without closing them.
+
+        SQLite connections must not be used across fork(); the child opens its own.
+        """
+        with self._lock:
+            self._idle = queue.LifoQueue()
+            self._open_count = 0
+            self._counters['in_use'] = 0
+
+    def stats(self):
+        """Returns pool usage counters."""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['open'] = self._open_count
+            stats['max'] = self.max_connections
+        return stats
+
+
+class _Checkout:
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.pooled = None
+
+    def __enter__(self):
+        self.pooled = self.pool.acquire()
+        return self.pooled.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.pool.release(self.pooled)
+        self.pooled = None
+        return False
@@ -0,0 +1,148 @@
+"""Compact binary encodings for bulk API clients.
+
+The stats tables store every value as TEXT. These encoders give each column
+a fixed type first, so clients receive numbers instead of number-like strings
+and every page of a listing has the same schema:
+
+- numeric stats columns are float64, read the way SQLite's CAST reads them
+  ('88*' is 88; '-', 'NA' and anything without a leading number are null);
+- ids and counts are int64;
+- every other column (player names, playing spans, best bowling figures,
+  caps, ...) is a string.
+
+The encodings are:
+
+- MessagePack, row oriented, for clients that iterate records;
+- Arrow IPC stream, column oriented, for dataframe and model-training jobs.
+
+Both libraries are optional; ``available()`` tells which can be produced.
+"""
+
+import json
+import re
+
+from schema import STATS_TABLES, TEXT_COLUMNS
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
+MSGPACK_MIMETYPE = 'application/msgpack'
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+
+NULL_TOKENS = ('-', 'NA', '')
+
+FLOAT_COLUMNS = frozenset(column for columns in STATS_TABLES.values() for column in columns
+                          if column not in TEXT_COLUMNS) | {'start', 'end'}
+INT_COLUMNS = frozenset(('country_id', 'player_id', 'crawl_id', 'count'))
+
+# The leading number SQLite's CAST(... AS REAL) reads
+NUMBER_PREFIX = re.compile(r'\s*[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+
+
+def available(fmt):
+    return {'msgpack': msgpack, 'arrow': pyarrow}.get(fmt) is not None
+
+
+def column_type(name):
+    """'float', 'int' or 'str': the type a column has in every binary response."""
+    if name in FLOAT_COLUMNS:
+        return 'float'
+    if name in INT_COLUMNS:
+        return 'int'
+    return 'str'
+
+
+def _to_float(value):
+    if value is None or isinstance(value, (int, float)):
+        return None if value is None else float(value)
+    match = NUMBER_PREFIX.match(value)
+    return float(match.group()) if match else None
+
+
+def _to_int(value):
+    if value is None or isinstance(value, int):
+        return value
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def _to_str(value):
+    return None if value is None else str(value)
+
+
+CONVERTERS = {'float': _to_float, 'int': _to_int, 'str': _to_str}
+
+
+def typed_column(name, values):
+    """Returns the column's values converted to its fixed type."""
+    convert = CONVERTERS[column_type(name)]
+    return [convert(value) for value in values]
+
+
+def infer_type(values):
+    """'int', 'float' or 'str': the first of int and float that every string value parses as
+    (NULL_TOKENS are null), else 'str'.
+
+    Only for one-off payloads typed as a whole, like the bootstrap bundle and the dashboard's
+    frames; paged responses use the fixed column types so their schema does not change
+    between pages."""
+    strings = [value for value in values if isinstance(value, str) and value not in NULL_TOKENS]
+    for name, cast in (('int', int), ('float', float)):
+        try:
+            for value in strings:
+                cast(value)
+        except ValueError:
+            continue
+        return name
+    return 'str'
+
+
+def type_column(values):
+    """Returns the column converted to its infer_type: ints, else floats, else unchanged."""
+    kind = infer_type(values)
+    if kind == 'str':
+        return list(values)
+    cast = int if kind == 'int' else float
+    return [None if value is None or value in NULL_TOKENS else cast(value) if isinstance(value, str) else value
+            for value in values]
+
+
+def typed_columns(rows):
+    """Turns a list of row dicts into {column: typed values}, keeping first-seen column order."""
+    names = list(dict.fromkeys(name for row in rows for name in row))
+    return {name: typed_column(name, [row.get(name) for row in rows]) for name in names}
+
+
+def typed_rows(rows):
+    columns = typed_columns(rows)
+    return [dict(zip(columns, values)) for values in zip(*columns.values())] if columns else []
+
+
+def to_msgpack(payload, rows_key):
+    """Encodes payload with the rows under rows_key typed column by column."""
+    payload = dict(payload)
+    payload[rows_key] = typed_rows(payload[rows_key])
+    return msgpack.packb(payload, use_bin_type=True)
+
+
+def to_arrow(rows, metadata):
+    """Encodes rows as one Arrow record batch; metadata (e.g. next_cursor) goes in the schema."""
+    columns = typed_columns(rows)
+    arrow_types = {'float': pyarrow.float64(), 'int': pyarrow.int64(), 'str': pyarrow.string()}
+    schema = pyarrow.schema([(name, arrow_types[column_type(name)]) for name in columns])
+    table = pyarrow.table(columns, schema=schema)
+    table = table.replace_schema_metadata({'payload': json.dumps(metadata)})
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
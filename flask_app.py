@@ -1,15 +1,318 @@
-from flask import Flask, abort, jsonify, request, Response
+from flask import Flask, abort, jsonify, request, Response, url_for, g, stream_with_context
 import json
+import hashlib
+import hmac
+import functools
+import gzip
+import itertools
+import math
 import requests
 import time
 import os
 #from customException import ApplicationException
-from cricket_parser_v2 import get_db_conn
-app = Flask(__name__)
-dbname = 'CRICKET_PERF'
+from cricket_parser_v2 import get_stats_as_of, iter_stats_as_of, get_data_version, schema_is_current
+from schema import STATS_TABLES, TEXT_COLUMNS
+from bundle import bundle_path, build_bundle
+from db_pool import ReadOnlyConnectionPool
+from result_cache import ResultCache, SingleFlight
+from refresh_jobs import JobQueue, MATCH_TYPES, ACTIONS, PRIORITY_ADMIN
+import metrics
+import encoders
+from compression import PrecompressedAssets, MIN_COMPRESS_SIZE, compress, negotiate_encoding, supported_encodings
+app = Flask(__name__, static_folder=None)
+dbname = os.environ.get('CRICKET_DB', 'CRICKET_PERF')
+db_pool = ReadOnlyConnectionPool(dbname, mmap_size=int(os.environ.get('CRICKET_MMAP_SIZE', 256 * 1024 * 1024)),
+                                 factory=metrics.TimedConnection,
+                                 max_connections=int(os.environ.get('CRICKET_POOL_SIZE', 16)))
+result_cache = ResultCache(dbname + '_cache.sqlite')
+single_flight = SingleFlight()
+refresh_jobs = JobQueue(dbname + '_jobs.sqlite')
+# Admin endpoints are disabled unless a token is configured
+ADMIN_TOKEN = os.environ.get('CRICKET_ADMIN_TOKEN')
+metrics.registry.add_gauges('cricket_db_pool', 'Read-only connection pool counter', db_pool.stats)
+metrics.registry.add_gauges('cricket_result_cache', 'Result cache counter', result_cache.stats)
+metrics.registry.add_gauges('cricket_single_flight', 'Request coalescing counter', single_flight.stats)
+metrics.registry.add_gauges('cricket_refresh_jobs', 'Refresh jobs by status', refresh_jobs.stats)
+static_assets = PrecompressedAssets(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static'))
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+def get_page_args(query_parameters, cursor_type=int):
+    '''Returns (limit, after) for keyset pagination, with limit capped at MAX_PAGE_SIZE'''
+    limit = min(max(query_parameters.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    after = query_parameters.get('after')
+    if after is not None:
+        after = cursor_type(after)
+    return limit, after
+
+def next_page(rows, limit, key):
+    '''Trims the extra look-ahead row and returns (rows, next_cursor, next_link)'''
+    if len(rows) <= limit:
+        return rows, None, None
+    rows = rows[:limit]
+    cursor = key(rows[-1])
+    args = request.args.to_dict()
+    args.update(after=cursor, limit=limit)
+    return rows, cursor, url_for(request.endpoint, **args)
+
+# Short names accepted by fields=, sort= and min_/max_ filters on the stats endpoints
+STATS_ALIASES = {
+    'Batting': {'matches': 'matches_played', 'innings': 'innings_batted', 'runs': 'runs_scored',
+                'average': 'batting_average', 'strike_rate': 'batting_strike_rate', 'hundreds': 'hundreds_scored',
+                'fifties': 'scores_between_50_and_99', 'fours': 'boundary_fours', 'sixes': 'boundary_sixes'},
+    'Bowling': {'matches': 'matches_played', 'innings': 'innings_bowled_in', 'runs': 'runs_conceded',
+                'wickets': 'wickets_taken', 'average': 'bowling_average', 'economy': 'economy_rate',
+                'strike_rate': 'bowling_strike_rate'},
+}
+
+def get_stats_options(query_parameters, table_name):
+    '''Parses fields=, sort= and min_/max_ range filters against the table's column allowlist.
+
+    Returns (fields, filters, filter_params, sort_expr, descending). Numeric columns are
+    compared as CAST(col AS REAL), matching the expression indexes the parser creates.
+    Raises ValueError for unknown columns or non-numeric bounds.'''
+    columns = ('player',) + STATS_TABLES[table_name]
+    aliases = STATS_ALIASES[table_name.split('_')[0]]
+    
+    def resolve(name):
+        column = aliases.get(name, name)
+        if column not in columns:
+            raise ValueError('unknown column: {}'.format(name))
+        return column
+    
+    def numeric(column):
+        return column not in TEXT_COLUMNS and column != 'player'
+    
+    fields = None
+    if query_parameters.get('fields'):
+        fields = [resolve(name.strip()) for name in query_parameters['fields'].split(',') if name.strip()]
+    
+    filters = []
+    filter_params = []
+    for key, value in query_parameters.items(multi=True):
+        if key[:4] not in ('min_', 'max_'):
+            continue
+        column = resolve(key[4:])
+        if not numeric(column):
+            raise ValueError('{} is not a numeric column'.format(key[4:]))
+        try:
+            bound = float(value)
+        except ValueError:
+            bound = math.nan
+        # nan would silently match nothing
+        if not math.isfinite(bound):
+            raise ValueError('{} must be a finite number'.format(key))
+        filters.append('CAST({} AS REAL) {} ?'.format(column, '>=' if key.startswith('min_') else '<='))
+        filter_params.append(bound)
+    
+    sort_expr, descending = None, False
+    sort = query_parameters.get('sort')
+    if sort:
+        descending = sort.startswith('-')
+        column = resolve(sort.lstrip('-'))
+        sort_expr = 'CAST({} AS REAL)'.format(column) if numeric(column) else column
+    
+    return fields, filters, filter_params, sort_expr, descending
+
+def check_pair_cursor(after, first_types, second_types):
+    '''Raises ValueError unless after is a decoded [first, second] cursor of the given types.
+    Booleans and non-finite floats are not numbers here.'''
+    if not isinstance(after, list) or len(after) != 2:
+        raise ValueError(after)
+    for part, types in zip(after, (first_types, second_types)):
+        if isinstance(part, bool) or not isinstance(part, types) or \
+                (isinstance(part, float) and not math.isfinite(part)):
+            raise ValueError(after)
+
+# Endpoints whose responses reflect live process state rather than the crawled data
+UNVERSIONED_ENDPOINTS = {'health', 'prometheus_metrics', 'admin_jobs', 'admin_job', 'admin_job_events'}
+# Endpoints reading the crawl history or player_id-keyed stats rows, which only the parser's migration adds
+MIGRATED_ENDPOINTS = {'get_players_stats', 'get_batch_players_stats', 'get_stats_distribution', 'get_crawls'}
+# Data version -> whether the database had the current schema; a migration always publishes a new version
+schema_checks = {}
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+STREAM_BATCH_SIZE = 500
+
+RESPONSE_FORMATS = {'application/json': 'json', NDJSON_MIMETYPE: 'ndjson',
+                    encoders.MSGPACK_MIMETYPE: 'msgpack', 'application/x-msgpack': 'msgpack',
+                    encoders.ARROW_MIMETYPE: 'arrow'}
+
+def response_format():
+    '''Representation negotiated for the current request'''
+    if request.args.get('stream') == '1':
+        return 'ndjson'
+    best = request.accept_mimetypes.best_match(list(RESPONSE_FORMATS), default='application/json')
+    return RESPONSE_FORMATS[best]
+
+def render(payload, rows_key, table=None):
+    '''Encodes a successful payload in the negotiated format.
+
+    JSON returns payload as is. The binary formats encode table (default payload[rows_key])
+    with typed columns; the remaining payload keys travel alongside it.'''
+    fmt = response_format()
+    if fmt not in ('msgpack', 'arrow'):
+        return jsonify(payload)
+    if not encoders.available(fmt):
+        return jsonify({'error': '{} responses are not available on this server'.format(fmt)}), 406
+    rows = payload[rows_key] if table is None else table
+    metadata = {key: value for key, value in payload.items() if key != rows_key}
+    if fmt == 'msgpack':
+        return Response(encoders.to_msgpack(dict(metadata, **{rows_key: rows}), rows_key),
+                        mimetype=encoders.MSGPACK_MIMETYPE)
+    return Response(encoders.to_arrow(rows, metadata), mimetype=encoders.ARROW_MIMETYPE)
+
+def stream_rows(rows):
+    '''Streams an iterable of row dicts as newline-delimited JSON, one batch per chunk'''
+    def generate():
+        for batch in iter(lambda: list(itertools.islice(rows, STREAM_BATCH_SIZE)), []):
+            yield ''.join(json.dumps(row) + '\n' for row in batch)
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+def iter_query(query, params):
+    '''Yields the rows of a query as dicts straight off the cursor'''
+    with db_pool.connection() as sqlite_conn:
+        cur = sqlite_conn.execute(query, params)
+        col_names = [field[0] for field in cur.description]
+        for row in cur:
+            yield dict(zip(col_names, row))
+
+def request_etag():
+    '''ETag for the current request: data version + path + query parameters + negotiated format'''
+    key = json.dumps([get_data_version(dbname), request.path, sorted(request.args.items(multi=True)),
+                      response_format()])
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+@app.before_request
+def start_timer():
+    g.start_time = time.perf_counter()
+
+def schema_ready():
+    '''True if the database has the tables and columns create_tables adds, checked once per data version'''
+    version = get_data_version(dbname)
+    ready = schema_checks.get(version)
+    if ready is None:
+        with db_pool.connection() as sqlite_conn:
+            ready = schema_is_current(sqlite_conn.cursor())
+        schema_checks.clear()
+        schema_checks[version] = ready
+    return ready
+
+@app.before_request
+def require_schema():
+    # The API never writes to the database; an older one is migrated by the parser
+    if request.endpoint in MIGRATED_ENDPOINTS and not schema_ready():
+        return jsonify({'error': 'The database has no crawl history or player_id keys yet; '
+                                 'run python cricket_parser_v2.py --migrate'}), 503
+    return None
+
+@app.before_request
+def check_etag():
+    g.etag = None
+    # HEAD runs the GET view, so it gets the same ETag and revalidation
+    if request.method not in ('GET', 'HEAD') or not request.path.startswith('/api/') or \
+            request.endpoint in UNVERSIONED_ENDPOINTS:
+        return None
+    g.etag = request_etag()
+    # Revalidation only needs the version file, so a repeated dashboard never reaches SQLite.
+    # Compressed responses carry the encoding as an ETag suffix, so accept those too.
+    for etag in [g.etag] + [g.etag + '-' + encoding for encoding in supported_encodings()]:
+        if etag in request.if_none_match:
+            g.etag = etag
+            return Response(status=304)
+    return None
+
+def cached(view):
+    '''Serves a view from the shared result cache, keyed by the request ETag.
+
+    The ETag already folds in the data version, so a new crawl naturally misses;
+    stale entries are purged the first time a response for the new version is stored.
+    Concurrent misses for the same key are coalesced, so only one of them runs the view
+    and the rest reuse its serialised body.'''
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = g.get('etag')
+        if key is None or response_format() == 'ndjson':
+            return view(*args, **kwargs)
+        entry = result_cache.get(key, get_data_version(dbname))
+        if entry is not None:
+            content_type, body = entry
+            return Response(body, content_type=content_type)
+        
+        def render():
+            response = app.make_response(view(*args, **kwargs))
+            body = response.get_data()
+            if response.status_code == 200:
+                result_cache.put(key, get_data_version(dbname), response.content_type, body)
+            return response.status_code, response.content_type, body
+        
+        status, content_type, body = single_flight.do(key, render)
+        return Response(body, status=status, content_type=content_type)
+    return wrapper
+
+def warm_cache():
+    '''Pre-computes the countries list and every country/format/discipline stats page'''
+    client = app.test_client()
+    client.get('/api/v2/countries/all')
+    with db_pool.connection() as sqlite_conn:
+        countries = [row[0] for row in sqlite_conn.execute('select country from Countries')]
+    for country in countries:
+        client.get('/api/v2/countries', query_string={'name': country})
+        for match_type in ['ODI', 'T20']:
+            for play_type in ['batting', 'bowling']:
+                client.get('/api/v2/get_stats/countries',
+                           query_string={'name': country, 'play_type': play_type, 'match_type': match_type})
+
+def compress_response(response):
+    '''Compresses a buffered API response with the best encoding the client accepts'''
+    response.vary.add('Accept-Encoding')
+    if response.status_code != 200 or response.is_streamed or 'Content-Encoding' in response.headers:
+        return
+    encoding = negotiate_encoding(request.accept_encodings)
+    body = response.get_data()
+    if encoding is None or len(body) < MIN_COMPRESS_SIZE:
+        return
+    response.set_data(compress(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    if g.get('etag'):
+        response.set_etag(g.etag + '-' + encoding)
+
+def serve_asset(name, cache_control):
+    '''Serves a precompressed in-memory static asset with its content-hash ETag'''
+    asset = static_assets.get(name)
+    if asset is None:
+        abort(404)
+    encoding, body = asset.body(negotiate_encoding(request.accept_encodings))
+    etag = asset.etag(encoding)
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = Response(body, content_type=asset.content_type)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    response.vary.add('Accept-Encoding')
+    return response
+
+def record_metrics(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    if 'start_time' in g:
+        metrics.request_latency.observe(time.perf_counter() - g.start_time, route, request.method)
+    metrics.responses.inc(route, response.status_code)
+    if not response.is_streamed:
+        metrics.response_size.observe(response.calculate_content_length() or 0, route)
 
 @app.after_request
 def after_request(response):
+    if g.get('etag') and response.status_code in (200, 304):
+        response.set_etag(g.etag)
+        response.headers['Cache-Control'] = 'public, max-age=0, must-revalidate'
+        response.vary.add('Accept')
+    if request.path.startswith('/api/'):
+        compress_response(response)
+    record_metrics(response)
     response.headers.add('Access-Control-Allow-Origin', '*')
     response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
     response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
@@ -17,22 +320,27 @@ def after_request(response):
 
 @app.route('/')
 def index():
-    try:
-        file_path = os.path.join(os.path.dirname(__file__), 'static', 'index.html')
-        with open(file_path, 'r', encoding='utf-8') as f:
-            html_content = f.read()
-        return Response(html_content, mimetype='text/html')
-    except Exception as e:
-        return f'<h1>Error loading page</h1><p>{str(e)}</p>', 500
+    if static_assets.get('index.html') is None:
+        return '<h1>Error loading page</h1><p>static/index.html not found</p>', 500
+    # The page URL is not content-addressed, so browsers must revalidate it
+    return serve_asset('index.html', 'no-cache')
+
+@app.route('/static/<path:filename>')
+def static_file(filename):
+    # Asset URLs are not content-addressed, so browsers revalidate against the ETag
+    return serve_asset(filename, 'no-cache')
    
 @app.errorhandler(404)
 def page_not_found(e):
     return jsonify({'error': 'Resource not found'}), 404
     
 @app.route('/api/v2/countries/all', methods=['GET'])
+@cached
 def get_all_countries():
+    if response_format() == 'ndjson':
+        return stream_rows(iter_query('select * from Countries;', []))
     try:
-        with get_db_conn(dbname) as sqlite_conn:
+        with db_pool.connection() as sqlite_conn:
             cur = sqlite_conn.cursor()
             cur.execute('''select * from Countries; ''')
             
@@ -43,17 +351,23 @@ def get_all_countries():
             for row in rows:
                 result.append(dict(zip(col_names, row)))
             
-            return jsonify({'countries': result})
+            return render({'countries': result}, 'countries')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
     
 @app.route('/api/v2/countries', methods=['GET'])
+@cached
 def get_country_players():
     query_parameters = request.args
     country_name = query_parameters.get('name')
     match_type = query_parameters.get('match_type')
     
+    try:
+        limit, after = get_page_args(query_parameters)
+    except ValueError:
+        return jsonify({'error': 'after must be a player_id'}), 400
+    
     query = "select a.country_id,b.country,a.player_id,a.player,a.odi_cap,a.t20_cap from Players a join Countries b on a.country_id=b.country_id where"
     to_filter = []
     conditions = []
@@ -62,16 +376,27 @@ def get_country_players():
         conditions.append('b.country=?')
         to_filter.append(country_name)
     if match_type:
-        conditions.append('a.{}_cap=?'.format(match_type))
+        if match_type.lower() not in ['odi', 't20']:
+            return jsonify({'error': 'match_type must be ODI or T20'}), 400
+        conditions.append('a.{}_cap=?'.format(match_type.lower()))
         to_filter.append('Y')
     
     if not conditions:
         return jsonify({'error': 'At least one filter parameter (name or match_type) is required'}), 400
     
-    query += ' ' + ' AND '.join(conditions) + ';'
+    if response_format() == 'ndjson':
+        # Full exports stream the whole result, so they are not paged
+        return stream_rows(iter_query(query + ' ' + ' AND '.join(conditions) + ' order by a.player_id;', to_filter))
+    
+    # player_id is unique, so it gives a stable, indexed keyset order
+    if after is not None:
+        conditions.append('a.player_id>?')
+        to_filter.append(after)
+    query += ' ' + ' AND '.join(conditions) + ' order by a.player_id limit ?;'
+    to_filter.append(limit + 1)
     
     try:
-        with get_db_conn(dbname) as sqlite_conn:
+        with db_pool.connection() as sqlite_conn:
             cur = sqlite_conn.cursor()
             cur.execute(query, to_filter)
             
@@ -82,16 +407,19 @@ def get_country_players():
             for row in rows:
                 result.append(dict(zip(col_names, row)))
             
-            return jsonify({'players': result})
+            result, cursor, next_link = next_page(result, limit, lambda row: row['player_id'])
+            return render({'players': result, 'next_cursor': cursor, 'next': next_link}, 'players')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     
 @app.route('/api/v2/get_stats/countries', methods=['GET'])
+@cached
 def get_players_stats():
     query_parameters = request.args
     country_name = query_parameters.get('name')
     play_type = query_parameters.get('play_type')
     match_type = query_parameters.get('match_type')
+    as_of = query_parameters.get('as_of')
     
     if not play_type or not match_type:
         return jsonify({'error': 'play_type and match_type are required'}), 400
@@ -110,7 +438,37 @@ def get_players_stats():
     if play_type_capitalized not in ['Batting', 'Bowling']:
         return jsonify({'error': 'play_type must be Batting or Bowling'}), 400
     
-    query = "select * from {}_Stats_{} where player in (select a.player from Players a join Countries b on a.country_id=b.country_id where".format(play_type_capitalized, match_type_table)
+    if as_of is not None:
+        try:
+            as_of = int(as_of)
+        except ValueError:
+            return jsonify({'error': 'as_of must be a crawl id'}), 400
+    
+    table_name = '{}_Stats_{}'.format(play_type_capitalized, match_type_table)
+    try:
+        fields, filters, filter_params, sort_expr, descending = get_stats_options(query_parameters, table_name)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if as_of is not None and (filters or sort_expr):
+        return jsonify({'error': 'sort and range filters are not supported with as_of'}), 400
+    
+    # Live rows page by rowid, or by (sort value, rowid) when sorted; as_of rows page by (player, player_id)
+    try:
+        limit, after = get_page_args(query_parameters, str)
+        if after is not None:
+            if as_of is not None:
+                after = json.loads(after)
+                check_pair_cursor(after, str, (int, type(None)))
+            elif sort_expr:
+                # (sort value, rowid); the value is a number for CAST sorts, else text, and NULL sorts as None
+                after = json.loads(after)
+                check_pair_cursor(after, ((int, float) if sort_expr.startswith('CAST(') else (str,)) + (type(None),), int)
+            else:
+                after = int(after)
+    except ValueError:
+        return jsonify({'error': 'after must be a cursor returned by a previous page'}), 400
+    
+    player_query = "select a.player_id, a.player from Players a join Countries b on a.country_id=b.country_id where"
     to_filter = []
     conditions = []
 
@@ -127,12 +485,50 @@ def get_players_stats():
     if not conditions:
         return jsonify({'error': 'At least country name is required'}), 400
     
-    query += ' ' + ' AND '.join(conditions) + ');'
+    player_query += ' ' + ' AND '.join(conditions)
+    
+    select_list = ', '.join(fields) if fields else '*'
+    # Rows belong to a player by player_id; only rows no crawl has keyed yet match by name
+    where = ('(player_id in (select player_id from ({0})) or '
+             '(player_id is null and player in (select player from ({0}))))'.format(player_query) +
+             ''.join(' and ' + condition for condition in filters))
+    params = to_filter * 2 + filter_params
+    order = '{} {}, rowid'.format(sort_expr, 'desc' if descending else 'asc') if sort_expr else 'rowid'
+    
+    def project(rows):
+        if fields is None:
+            return rows
+        return ({field: row[field] for field in fields} for row in rows)
+    
+    if response_format() == 'ndjson':
+        # Full exports stream the whole result, so they are not paged
+        if as_of is not None:
+            def rows():
+                with db_pool.connection() as sqlite_conn:
+                    yield from iter_stats_as_of(sqlite_conn.cursor(), table_name, as_of, player_query, to_filter)
+            return stream_rows(project(rows()))
+        return stream_rows(iter_query('select {} from {} where {} order by {};'.format(select_list, table_name, where, order), params))
+    
+    query = 'select rowid as _cursor, {} as _sort, {} from {} where {}'.format(sort_expr or 'null', select_list, table_name, where)
+    if after is not None and sort_expr:
+        query += ' and ({0} {1} ? or ({0} = ? and rowid > ?))'.format(sort_expr, '<' if descending else '>')
+        params += [after[0], after[0], after[1]]
+    elif after is not None:
+        query += ' and rowid>?'
+        params.append(after)
+    query += ' order by {} limit ?;'.format(order)
+    params.append(limit + 1)
     
     try:
-        with get_db_conn(dbname) as sqlite_conn:
+        with db_pool.connection() as sqlite_conn:
             cur = sqlite_conn.cursor()
-            cur.execute(query, to_filter)
+            if as_of is not None:
+                # Rebuild the table from the per-crawl deltas instead of reading the live rows
+                result = get_stats_as_of(cur, table_name, as_of, player_query, to_filter, after, limit + 1)
+                result, cursor, next_link = next_page(result, limit, lambda row: json.dumps([row['player'], row['player_id']]))
+                return render({'stats': list(project(result)), 'as_of': as_of, 'next_cursor': cursor, 'next': next_link}, 'stats')
+            
+            cur.execute(query, params)
             
             col_names = [field[0] for field in cur.description]
             rows = cur.fetchall()
@@ -141,9 +537,290 @@ def get_players_stats():
             for row in rows:
                 result.append(dict(zip(col_names, row)))
             
-            return jsonify({'stats': result})
+            if sort_expr:
+                cursor_key = lambda row: json.dumps([row['_sort'], row['_cursor']])
+            else:
+                cursor_key = lambda row: row['_cursor']
+            result, cursor, next_link = next_page(result, limit, cursor_key)
+            for row in result:
+                del row['_cursor'], row['_sort']
+            return render({'stats': result, 'next_cursor': cursor, 'next': next_link}, 'stats')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+MAX_BATCH_PLAYERS = 100
+
+@app.route('/api/v2/get_stats/players', methods=['GET'])
+@cached
+def get_batch_players_stats():
+    query_parameters = request.args
+    try:
+        player_ids = [int(pid) for value in query_parameters.getlist('ids') for pid in value.split(',') if pid.strip()]
+    except ValueError:
+        return jsonify({'error': 'ids must be a comma separated list of player ids'}), 400
+    player_ids = list(dict.fromkeys(player_ids))
+    if not player_ids:
+        return jsonify({'error': 'ids is required'}), 400
+    if len(player_ids) > MAX_BATCH_PLAYERS:
+        return jsonify({'error': 'at most {} ids per request'.format(MAX_BATCH_PLAYERS)}), 400
+    
+    match_types = query_parameters.get('match_type', 'ODI,T20').upper().split(',')
+    play_types = query_parameters.get('play_type', 'batting,bowling').lower().split(',')
+    if not set(match_types) <= {'ODI', 'T20'}:
+        return jsonify({'error': 'match_type must be ODI, T20 or both'}), 400
+    if not set(play_types) <= {'batting', 'bowling'}:
+        return jsonify({'error': 'play_type must be batting, bowling or both'}), 400
+    
+    placeholders = ','.join('?' * len(player_ids))
+    try:
+        with db_pool.connection() as sqlite_conn:
+            cur = sqlite_conn.cursor()
+            cur.execute('select player_id, player, country_id from Players where player_id in ({});'.format(placeholders), player_ids)
+            players = {row[0]: {'player': row[1], 'country_id': row[2]} for row in cur.fetchall()}
+            
+            # One indexed IN lookup per stats table on player_id. Rows stored before stats carried
+            # player_id, which are left only for namesakes, match by name and are flagged as ambiguous.
+            for play_type in play_types:
+                for match_type in match_types:
+                    key = '{}_{}'.format(play_type, match_type.lower())
+                    table_name = '{}_Stats_{}'.format(play_type.capitalize(), 'Odi' if match_type == 'ODI' else 'T20')
+                    columns = ('player',) + STATS_TABLES[table_name]
+                    cur.execute('select p.player_id, s.player_id is null, {} from Players p join {} s '
+                                'on s.player_id=p.player_id or (s.player_id is null and s.player=p.player) '
+                                'where p.player_id in ({}) order by s.player_id is null, s.rowid;'.format(
+                                    ', '.join('s.' + column for column in columns), table_name, placeholders),
+                                player_ids)
+                    for row in cur:
+                        if key in players[row[0]]:
+                            continue
+                        players[row[0]][key] = dict(zip(columns, row[2:]))
+                        if row[1]:
+                            players[row[0]].setdefault('ambiguous', []).append(key)
+            
+            found = [pid for pid in player_ids if pid in players]
+            payload = {'players': {str(pid): players[pid] for pid in found},
+                       'missing': [pid for pid in player_ids if pid not in players]}
+            # Binary formats get one flat row per player and stats table
+            table = [dict({'player_id': pid, 'player': players[pid]['player'], 'country_id': players[pid]['country_id'],
+                           'stats': key}, **stats)
+                     for pid in found for key, stats in players[pid].items() if isinstance(stats, dict)]
+            return render(payload, 'players', table)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+DEFAULT_BINS = 20
+MAX_BINS = 100
+
+@app.route('/api/v2/get_stats/distribution', methods=['GET'])
+@cached
+def get_stats_distribution():
+    '''Equal-width histogram of one numeric stats column over a country's (or every country's) capped players.
+
+    SQLite does the binning, so the response has exactly `bins` entries however many players match.
+    The range defaults to the observed min/max; min= and max= fix it, leaving out values outside.'''
+    query_parameters = request.args
+    play_type = (query_parameters.get('play_type') or '').capitalize()
+    match_type = (query_parameters.get('match_type') or '').upper()
+    country_name = query_parameters.get('name')
+    if play_type not in ('Batting', 'Bowling') or match_type not in ('ODI', 'T20'):
+        return jsonify({'error': 'play_type must be batting or bowling and match_type ODI or T20'}), 400
+    
+    table_name = '{}_Stats_{}'.format(play_type, 'Odi' if match_type == 'ODI' else 'T20')
+    stat = query_parameters.get('stat', '')
+    column = STATS_ALIASES[play_type].get(stat, stat)
+    if column not in STATS_TABLES[table_name] or column in TEXT_COLUMNS:
+        return jsonify({'error': 'stat must be a numeric column of {}'.format(table_name)}), 400
+    try:
+        bins = int(query_parameters.get('bins', DEFAULT_BINS))
+    except ValueError:
+        bins = 0
+    if not 1 <= bins <= MAX_BINS:
+        return jsonify({'error': 'bins must be an integer from 1 to {}'.format(MAX_BINS)}), 400
+    try:
+        bounds = [float(query_parameters[key]) if key in query_parameters else None for key in ('min', 'max')]
+        if not all(bound is None or math.isfinite(bound) for bound in bounds):
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': 'min and max must be numbers'}), 400
+    if None not in bounds and bounds[0] >= bounds[1]:
+        return jsonify({'error': 'min must be less than max'}), 400
+    
+    # Rows are matched to capped players by player_id; rows the crawls have not keyed yet fall back to the name
+    capped = ("from Players a join Countries b on a.country_id=b.country_id where a.{}_cap='Y'{}".format(
+        match_type.lower(), ' and b.country=?' if country_name else ''))
+    conditions = ["s.{} NOT IN ('-', 'NA', '')".format(column),
+                  "(s.player_id in (select a.player_id {0}) or "
+                  "(s.player_id is null and s.player in (select a.player {0})))".format(capped)]
+    params = [country_name] * 2 if country_name else []
+    for bound, op in zip(bounds, ('>=', '<=')):
+        if bound is not None:
+            conditions.append('CAST(s.{} AS REAL) {} ?'.format(column, op))
+            params.append(bound)
+    # Duplicate scraped rows of a player count once
+    values = 'select distinct s.player_id, s.player, CAST(s.{} AS REAL) as x from {} s where {}'.format(
+        column, table_name, ' and '.join(conditions))
+    
+    try:
+        with db_pool.connection() as sqlite_conn:
+            cur = sqlite_conn.cursor()
+            cur.execute('select min(x), max(x), count(*), avg(x) from ({});'.format(values), params)
+            low, high, count, mean = cur.fetchone()
+            low = bounds[0] if bounds[0] is not None else low
+            high = bounds[1] if bounds[1] is not None else high
+            counts = [0] * bins
+            if count:
+                width = (high - low) / bins
+                # Values equal to the upper bound go in the last bin, as numpy.histogram does
+                cur.execute('select min(cast((x - ?) / ? as integer), ?) as bin, count(*) from ({}) '
+                            'group by bin;'.format(values), [low, width or 1, bins - 1] + params)
+                for index, bin_count in cur.fetchall():
+                    counts[index] += bin_count
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    edges = [low + (high - low) * i / bins for i in range(bins + 1)] if count else [None] * (bins + 1)
+    return render({'stat': column, 'play_type': play_type.lower(), 'match_type': match_type, 'name': country_name,
+                   'count': count, 'mean': mean, 'min': low, 'max': high,
+                   'bins': [{'start': edges[i], 'end': edges[i + 1], 'count': counts[i]} for i in range(bins)]},
+                  'bins')
+
+# {data version: bootstrap bundle bodies by encoding} for the last version loaded. The dict is
+# replaced whole, never changed in place, so a reader holding it never sees it half-updated
+bootstrap_bundles = {}
+
+def load_bootstrap_bundle(version):
+    '''Returns {encoding: body} of the bootstrap bundle at a data version, or None if the database
+    is too large for one.
+
+    The parser writes the bundle precompressed at ingest; if those files are missing (e.g. a
+    database from before bundles existed) it is built here once from the live data.'''
+    global bootstrap_bundles
+    loaded = bootstrap_bundles
+    if version in loaded:
+        return loaded[version]
+    bodies = {}
+    for encoding in supported_encodings():
+        try:
+            with open(bundle_path(dbname, version, encoding), 'rb') as f:
+                bodies[encoding] = f.read()
+        except OSError:
+            continue
+    if 'gzip' not in bodies:
+        with db_pool.connection() as sqlite_conn:
+            body = build_bundle(sqlite_conn, version)
+        bodies = {encoding: compress(body, encoding) for encoding in supported_encodings()} if body else None
+    bootstrap_bundles = {version: bodies}
+    return bodies
+
+@app.route('/api/v2/bootstrap', methods=['GET'])
+def get_bootstrap():
+    '''Countries, players and typed stats in one precompressed, columnar bundle
+    (see bundle.build_bundle), so a client can load the data once and filter locally.'''
+    version = get_data_version(dbname)
+    bodies = single_flight.do('bootstrap-' + version, lambda: load_bootstrap_bundle(version))
+    if bodies is None:
+        return jsonify({'error': 'The database is too large for a bootstrap bundle; use the paged endpoints'}), 404
+    encoding = next((encoding for encoding in bodies if request.accept_encodings[encoding]), None)
+    response = Response(bodies[encoding] if encoding else gzip.decompress(bodies['gzip']), mimetype='application/json')
+    if encoding:
+        # Already compressed, so compress_response leaves it alone; the ETag names the encoding
+        response.headers['Content-Encoding'] = encoding
+        if g.get('etag'):
+            g.etag = g.etag + '-' + encoding
+    return response
+
+@app.route('/api/v2/crawls', methods=['GET'])
+@cached
+def get_crawls():
+    if response_format() == 'ndjson':
+        return stream_rows(iter_query('select * from Crawls order by crawl_id;', []))
+    try:
+        with db_pool.connection() as sqlite_conn:
+            cur = sqlite_conn.cursor()
+            cur.execute('select * from Crawls order by crawl_id;')
+            
+            col_names = [field[0] for field in cur.description]
+            result = [dict(zip(col_names, row)) for row in cur.fetchall()]
+            
+            return render({'crawls': result}, 'crawls')
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/v2/health', methods=['GET'])
+def health():
+    try:
+        healthy = db_pool.check()
+    except Exception as e:
+        return jsonify({'status': 'error', 'error': str(e), 'pool': db_pool.stats()}), 503
+    return jsonify({'status': 'ok' if healthy else 'error', 'pool': db_pool.stats(),
+                    'cache': result_cache.stats(), 'single_flight': single_flight.stats()}), 200 if healthy else 503
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+def admin_required(view):
+    '''Requires the CRICKET_ADMIN_TOKEN bearer token; the endpoints 404 when no token is configured'''
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            abort(404)
+        supplied = request.headers.get('Authorization', '').encode('utf-8')
+        if not hmac.compare_digest(supplied, ('Bearer ' + ADMIN_TOKEN).encode('utf-8')):
+            return jsonify({'error': 'admin token required'}), 401, {'WWW-Authenticate': 'Bearer'}
+        return view(*args, **kwargs)
+    return wrapper
+
+@app.route('/api/v2/admin/jobs', methods=['GET', 'POST'])
+@admin_required
+def admin_jobs():
+    '''GET lists queued, running and recent jobs. POST queues refresh jobs for the scheduler:
+    {"match_type": "ODI"|"T20"|"ALL", "action": "batting"|"bowling"|"ALL", "countries": [...], "player_ids": [...]}'''
+    if request.method == 'GET':
+        return jsonify({'jobs': refresh_jobs.recent(request.args.get('limit', 50, type=int)),
+                        'stats': refresh_jobs.stats()})
+    body = request.get_json(silent=True) or {}
+    match_type = str(body.get('match_type', 'ALL')).upper()
+    action = str(body.get('action', 'ALL')).lower()
+    match_types = MATCH_TYPES if match_type == 'ALL' else [match_type]
+    actions = ACTIONS if action == 'all' else [action]
+    try:
+        job_ids = [refresh_jobs.enqueue(mt, act, countries=body.get('countries'), player_ids=body.get('player_ids'),
+                                        priority=PRIORITY_ADMIN, requested_by='admin')
+                   for mt in match_types for act in actions]
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'jobs': [refresh_jobs.get(job_id) for job_id in job_ids]}), 202
+
+@app.route('/api/v2/admin/jobs/<int:job_id>', methods=['GET'])
+@admin_required
+def admin_job(job_id):
+    job = refresh_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'no such job'}), 404
+    return jsonify({'job': job})
+
+@app.route('/api/v2/admin/jobs/<int:job_id>/events', methods=['GET'])
+@admin_required
+def admin_job_events(job_id):
+    '''Server-sent events with the job's state each time its progress changes, until it finishes'''
+    if refresh_jobs.get(job_id) is None:
+        return jsonify({'error': 'no such job'}), 404
+    
+    def generate():
+        last = None
+        while True:
+            job = refresh_jobs.get(job_id)
+            if job != last:
+                yield 'data: {}\n\n'.format(json.dumps(job))
+                last = job
+            if job['status'] in ('done', 'failed'):
+                return
+            time.sleep(1)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache'})
+
 if __name__ == "__main__":
+    warm_cache()
     app.run(debug=True, host='0.0.0.0', port=8080)
\ No newline at end of file
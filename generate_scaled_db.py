@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Builds a synthetic database with the same schema as CRICKET_PERF, scaled up
+from the real data, for load and capacity testing.
+
+Every player (and each of their stats rows) is replicated --scale times under
+a new player_id and name, with numeric stats jittered so that sorting,
+filtering and distributions behave like real data rather than copies.
+"""
+
+import argparse
+import os
+import random
+import re
+import sqlite3
+
+from cricket_parser_v2 import STATS_TABLES, TEXT_COLUMNS, bump_data_version, create_indexes
+
+NUMBER = re.compile(r'^(\d+)(\.\d+)?(\*?)$')
+
+def jitter(value, rng):
+    '''Scales a number-like TEXT value by a random factor, keeping its format'''
+    match = NUMBER.match(value or '')
+    if not match:
+        return value
+    whole, fraction, star = match.groups()
+    scaled = float(whole + (fraction or '')) * rng.uniform(0.6, 1.4)
+    if fraction:
+        return '{:.{}f}{}'.format(scaled, len(fraction) - 1, star)
+    return '{:d}{}'.format(int(round(scaled)), star)
+
+def table_columns(conn, table_name):
+    return [row[1] for row in conn.execute('PRAGMA table_info({})'.format(table_name))]
+
+def generate(source, target, scale, seed=0):
+    rng = random.Random(seed)
+    src = sqlite3.connect(source + '.sqlite')
+    if os.path.exists(target + '.sqlite'):
+        os.remove(target + '.sqlite')
+    dst = sqlite3.connect(target + '.sqlite')
+    dst.execute('PRAGMA journal_mode=OFF')
+    dst.execute('PRAGMA synchronous=OFF')
+    
+    for (sql,) in src.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name IN ('Countries','Players',{})"
+                              .format(','.join("'{}'".format(t) for t in STATS_TABLES))):
+        dst.execute(sql)
+    for table_name in STATS_TABLES:
+        if 'player_id' not in table_columns(dst, table_name):
+            dst.execute('ALTER TABLE {} ADD COLUMN player_id INTEGER'.format(table_name))
+    dst.executemany('INSERT INTO Countries VALUES (?,?)', src.execute('SELECT country_id,country FROM Countries'))
+    
+    players = src.execute('SELECT country_id,player_id,player,odi_cap,t20_cap FROM Players').fetchall()
+    id_offset = max(row[1] for row in players) + 1
+    for copy in range(scale):
+        suffix = ' #{}'.format(copy) if copy else ''
+        dst.executemany('INSERT INTO Players VALUES (?,?,?,?,?)',
+                        [(cid, pid + copy * id_offset, name + suffix, odi, t20) for cid, pid, name, odi, t20 in players])
+        for table_name, columns in STATS_TABLES.items():
+            # Stats rows carry player_id since namesakes were told apart; older databases lack it
+            keys = 'player,player_id' if 'player_id' in table_columns(src, table_name) else 'player,NULL'
+            rows = src.execute('SELECT {},{} FROM {}'.format(keys, ','.join(columns), table_name)).fetchall()
+            if copy:
+                rows = [(row[0] + suffix, None if row[1] is None else row[1] + copy * id_offset) +
+                        tuple(value if column in TEXT_COLUMNS else jitter(value, rng) for column, value in zip(columns, row[2:]))
+                        for row in rows]
+            dst.executemany('INSERT INTO {} (player,player_id,{}) VALUES (?,?{})'.format(table_name, ','.join(columns), ',?' * len(columns)), rows)
+        dst.commit()
+        print('generated copy', copy + 1, 'of', scale)
+    
+    create_indexes(dst.cursor())
+    dst.commit()
+    dst.execute('ANALYZE')
+    dst.close()
+    bump_data_version(target)
+
+def main():
+    parser = argparse.ArgumentParser(description='Scaled synthetic Cricket Performance database generator')
+    parser.add_argument('-s', '--scale', dest='scale', type=int, default=10,
+                        help='number of copies of every player to generate, e.g. 10, 100, 1000')
+    parser.add_argument('-d', '--databasename', dest='databasename', default='CRICKET_PERF',
+                        help='source database name')
+    parser.add_argument('-o', '--output', dest='output', default=None,
+                        help='output database name, default = <databasename>_x<scale>')
+    parser.add_argument('--seed', dest='seed', type=int, default=0, help='random seed for jittered stats')
+    args = parser.parse_args()
+    
+    generate(args.databasename, args.output or '{}_x{}'.format(args.databasename, args.scale), args.scale, args.seed)
+
+if __name__ == "__main__":
+    main()
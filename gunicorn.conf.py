@@ -0,0 +1,59 @@
+"""Production serving config: ``gunicorn -c gunicorn.conf.py``.
+
+The app is imported once in the master (preload_app) and N workers are
+forked from it, so code and the warmed result cache are shared copy-on-write.
+Every worker opens the database read-only with a large mmap_size, so they all
+read the same pages from the OS page cache instead of each holding a private
+copy. When the parser publishes a new data version the master gracefully
+reloads the workers (SIGHUP): old workers finish their in-flight requests
+while new ones start on the fresh data.
+"""
+
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+# Read by flask_app when it is imported below (preload_app)
+os.environ.setdefault('CRICKET_MMAP_SIZE', str(1024 * 1024 * 1024))
+
+wsgi_app = 'flask_app:app'
+bind = os.environ.get('CRICKET_BIND', '0.0.0.0:8080')
+workers = int(os.environ.get('CRICKET_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('CRICKET_THREADS', 4))
+preload_app = True
+graceful_timeout = 30
+keepalive = 5
+
+# Seconds between checks of the data version file for a new crawl
+version_poll_interval = int(os.environ.get('CRICKET_VERSION_POLL', 5))
+
+
+def watch_data_version(server):
+    from flask_app import dbname
+    from cricket_parser_v2 import get_data_version
+    version = get_data_version(dbname)
+    while True:
+        time.sleep(version_poll_interval)
+        latest = get_data_version(dbname)
+        if latest != version:
+            server.log.info('Data version %s -> %s, reloading workers', version, latest)
+            version = latest
+            os.kill(os.getpid(), signal.SIGHUP)
+
+
+def when_ready(server):
+    import flask_app
+    flask_app.warm_cache()
+    # No connection may be inherited by the workers
+    flask_app.db_pool.close_all()
+    threading.Thread(target=watch_data_version, args=(server,), name='data-version-watch', daemon=True).start()
+
+
+def post_fork(server, worker):
+    import flask_app
+    flask_app.db_pool.after_fork()
+    flask_app.result_cache.after_fork()
+    flask_app.refresh_jobs.after_fork()
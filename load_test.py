@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+HTTP load test for the /api/v2 endpoints.
+
+Starts the API locally against the chosen database (or targets --url), replays
+a weighted mix of dashboard-style requests from --concurrency client threads
+for --duration seconds and reports throughput, p50/p95/p99 latency per
+endpoint and the server's peak resident memory.
+
+    python generate_scaled_db.py -s 100
+    python load_test.py -d CRICKET_PERF_x100 -c 64 -t 60
+"""
+
+import argparse
+import http.client
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))]
+
+def build_traffic(dbname):
+    '''Returns a list of (weight, endpoint, make_path) built from the database contents'''
+    conn = sqlite3.connect(dbname + '.sqlite')
+    countries = [row[0] for row in conn.execute('SELECT country FROM Countries')]
+    player_ids = [row[0] for row in conn.execute('SELECT player_id FROM Players')]
+    conn.close()
+
+    def stats_path(rng):
+        args = {'name': rng.choice(countries), 'play_type': rng.choice(['batting', 'bowling']),
+                'match_type': rng.choice(['ODI', 'T20'])}
+        if rng.random() < 0.3:
+            args.update(sort='-matches', min_matches=rng.choice([1, 10, 50]), fields='player,matches')
+        return '/api/v2/get_stats/countries?' + urllib.parse.urlencode(args)
+
+    return [
+        (10, 'countries/all', lambda rng: '/api/v2/countries/all'),
+        (20, 'countries', lambda rng: '/api/v2/countries?' + urllib.parse.urlencode(
+            {'name': rng.choice(countries), 'match_type': rng.choice(['odi', 't20'])})),
+        (50, 'get_stats/countries', stats_path),
+        (15, 'get_stats/players', lambda rng: '/api/v2/get_stats/players?ids=' + ','.join(
+            str(pid) for pid in rng.sample(player_ids, min(15, len(player_ids))))),
+        (5, 'export', lambda rng: '/api/v2/get_stats/countries?stream=1&' + urllib.parse.urlencode(
+            {'name': rng.choice(countries), 'play_type': 'batting', 'match_type': 'ODI'})),
+    ]
+
+def rss_kb(pid):
+    '''Resident memory of a process and its children in KB (Linux only)'''
+    total = 0
+    pids = [pid]
+    try:
+        with open('/proc/{}/task/{}/children'.format(pid, pid)) as f:
+            pids += [int(child) for child in f.read().split()]
+    except OSError:
+        pass
+    for p in pids:
+        try:
+            with open('/proc/{}/status'.format(p)) as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1])
+        except OSError:
+            pass
+    return total
+
+def start_server(dbname, port, command):
+    env = dict(os.environ, CRICKET_DB=dbname)
+    if command:
+        args = command.format(port=port).split()
+    else:
+        args = [sys.executable, '-c', 'import flask_app; flask_app.app.run(host="127.0.0.1", port={}, threaded=True)'.format(port)]
+    server = subprocess.Popen(args, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/api/v2/health')
+            conn.getresponse().read()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    sys.exit('server did not start on port {}'.format(port))
+
+def run(url, traffic, concurrency, duration, seed):
+    parsed = urllib.parse.urlparse(url)
+    weights = [weight for weight, _, _ in traffic]
+    results = {}
+    errors = {}
+    lock = threading.Lock()
+    stop_at = time.time() + duration
+
+    def client(n):
+        rng = random.Random(seed + n)
+        conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=30)
+        latencies = {}
+        failures = {}
+        while time.time() < stop_at:
+            _, endpoint, make_path = rng.choices(traffic, weights)[0]
+            start = time.perf_counter()
+            try:
+                conn.request('GET', make_path(rng), headers={'Accept-Encoding': 'gzip'})
+                response = conn.getresponse()
+                response.read()
+                if response.status >= 400:
+                    failures[endpoint] = failures.get(endpoint, 0) + 1
+            except (OSError, http.client.HTTPException):
+                failures[endpoint] = failures.get(endpoint, 0) + 1
+                conn.close()
+                conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=30)
+                continue
+            latencies.setdefault(endpoint, []).append(time.perf_counter() - start)
+        with lock:
+            for endpoint, values in latencies.items():
+                results.setdefault(endpoint, []).extend(values)
+            for endpoint, count in failures.items():
+                errors[endpoint] = errors.get(endpoint, 0) + count
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+def report(results, errors, duration, peak_rss):
+    print('{:<22}{:>9}{:>8}{:>10}{:>10}{:>10}{:>10}'.format('endpoint', 'requests', 'errors', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms'))
+    everything = []
+    for endpoint in sorted(set(results) | set(errors)):
+        values = results.get(endpoint, [])
+        everything.extend(values)
+        print('{:<22}{:>9}{:>8}{:>10.1f}{:>10.2f}{:>10.2f}{:>10.2f}'.format(
+            endpoint, len(values), errors.get(endpoint, 0), len(values) / duration,
+            percentile(values, 50) * 1000, percentile(values, 95) * 1000, percentile(values, 99) * 1000))
+    print('{:<22}{:>9}{:>8}{:>10.1f}{:>10.2f}{:>10.2f}{:>10.2f}'.format(
+        'total', len(everything), sum(errors.values()), len(everything) / duration,
+        percentile(everything, 50) * 1000, percentile(everything, 95) * 1000, percentile(everything, 99) * 1000))
+    if peak_rss:
+        print('server peak RSS: {:.1f} MB'.format(peak_rss / 1024.0))
+
+def main():
+    parser = argparse.ArgumentParser(description='Cricket stats API load test')
+    parser.add_argument('-d', '--databasename', dest='databasename', default='CRICKET_PERF',
+                        help='database to serve and to draw request parameters from')
+    parser.add_argument('-u', '--url', dest='url', default=None,
+                        help='target an already running server instead of starting one')
+    parser.add_argument('--server-cmd', dest='server_cmd', default=None,
+                        help='command used to start the server, {port} is substituted, '
+                             'e.g. "gunicorn -c gunicorn.conf.py --bind 127.0.0.1:{port}"')
+    parser.add_argument('-p', '--port', dest='port', type=int, default=8099)
+    parser.add_argument('-c', '--concurrency', dest='concurrency', type=int, default=16)
+    parser.add_argument('-t', '--duration', dest='duration', type=float, default=30)
+    parser.add_argument('--seed', dest='seed', type=int, default=0)
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        server = start_server(args.databasename, args.port, args.server_cmd)
+        url = 'http://127.0.0.1:{}'.format(args.port)
+
+    peak_rss = 0
+    try:
+        threads, results, errors = run(url, build_traffic(args.databasename), args.concurrency, args.duration, args.seed)
+        while any(thread.is_alive() for thread in threads):
+            if server:
+                peak_rss = max(peak_rss, rss_kb(server.pid))
+            time.sleep(0.5)
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+    report(results, errors, args.duration, peak_rss)
+
+if __name__ == "__main__":
+    main()
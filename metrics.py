@@ -0,0 +1,232 @@
+"""In-process metrics in the Prometheus text exposition format.
+
+Counters and histograms are kept per process; under gunicorn each worker
+reports its own numbers and the scraper aggregates them.
+"""
+
+import bisect
+import logging
+import sqlite3
+import threading
+import time
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+ROW_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000, 10000)
+
+# Statements slower than this are logged with their query plan
+SLOW_QUERY_SECONDS = 0.1
+
+slow_query_logger = logging.getLogger('cricket.slow_query')
+
+
+def _labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in pairs) + '}'
+
+
+class Counter:
+
+    def __init__(self, name, help, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = ['# HELP {} {}'.format(self.name, self.help), '# TYPE {} counter'.format(self.name)]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append('{}{} {}'.format(self.name, _labels(self.labelnames, labels), value))
+        return lines
+
+
+class Histogram:
+
+    def __init__(self, name, help, buckets, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(labels, ([0] * (len(self.buckets) + 1), 0))
+            counts[index] += 1
+            self._values[labels] = (counts, total + value)
+
+    def render(self):
+        lines = ['# HELP {} {}'.format(self.name, self.help), '# TYPE {} histogram'.format(self.name)]
+        with self._lock:
+            for labels, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ('+Inf',), counts):
+                    cumulative += count
+                    lines.append('{}_bucket{} {}'.format(
+                        self.name, _labels(self.labelnames, labels, [('le', bound)]), cumulative))
+                lines.append('{}_sum{} {}'.format(self.name, _labels(self.labelnames, labels), total))
+                lines.append('{}_count{} {}'.format(self.name, _labels(self.labelnames, labels), cumulative))
+        return lines
+
+
+class Registry:
+
+    def __init__(self):
+        self.metrics = []
+        self.gauge_sources = []
+
+    def counter(self, *args, **kwargs):
+        metric = Counter(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs):
+        metric = Histogram(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def add_gauges(self, prefix, help, source):
+        """Exports every numeric value of source() as <prefix>_<key>."""
+        self.gauge_sources.append((prefix, help, source))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for prefix, help, source in self.gauge_sources:
+            try:
+                values = source()
+            except Exception:
+                continue
+            for key, value in sorted(values.items()):
+                name = '{}_{}'.format(prefix, key)
+                lines.extend(['# HELP {} {}'.format(name, help), '# TYPE {} gauge'.format(name),
+                              '{} {}'.format(name, value)])
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+request_latency = registry.histogram('cricket_request_duration_seconds', 'Request latency by route',
+                                     LATENCY_BUCKETS, ('route', 'method'))
+response_size = registry.histogram('cricket_response_bytes', 'Buffered response body size by route',
+                                   SIZE_BUCKETS, ('route',))
+responses = registry.counter('cricket_responses_total', 'Responses by route and status', ('route', 'status'))
+sql_latency = registry.histogram('cricket_sql_duration_seconds', 'SQLite statement time, execute through last fetch',
+                                 LATENCY_BUCKETS)
+sql_rows = registry.histogram('cricket_sql_rows', 'Rows fetched per statement', ROW_BUCKETS)
+slow_queries = registry.counter('cricket_slow_queries_total', 'Statements slower than the slow query threshold')
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that records each statement's time and fetched rows, and logs slow statements.
+
+    sqlite3 runs only the first step of a statement in execute(); the rest runs as rows are
+    fetched, so the fetches are timed as well. A statement is recorded once its rows are
+    exhausted, or when the cursor runs the next one, is closed or is collected."""
+
+    _sql = None
+    _parameters = ()
+    _elapsed = 0.0
+    _rows = 0
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._sql, self._parameters = sql, parameters
+            self._elapsed = time.perf_counter() - start
+            self._rows = 0
+            if self.description is None:
+                self._finish()
+
+    def _finish(self):
+        if self._sql is None:
+            return
+        sql, parameters, elapsed = self._sql, self._parameters, self._elapsed
+        self._sql = None
+        sql_latency.observe(elapsed)
+        if self.description is not None:
+            sql_rows.observe(self._rows)
+        if elapsed >= SLOW_QUERY_SECONDS:
+            self._log_slow(sql, parameters, elapsed)
+
+    def _log_slow(self, sql, parameters, elapsed):
+        slow_queries.inc()
+        plan = 'n/a'
+        if sql.lstrip().lower().startswith(('select', 'with')):
+            try:
+                # A plain cursor, so fetching the plan is not itself timed or logged
+                rows = self.connection.cursor(sqlite3.Cursor).execute('EXPLAIN QUERY PLAN ' + sql, parameters)
+                plan = '; '.join(row[-1] for row in rows)
+            except sqlite3.Error as e:
+                plan = 'unavailable: {}'.format(e)
+        slow_query_logger.warning('slow query %.3fs: %s params=%r plan=%s', elapsed, ' '.join(sql.split()),
+                                  parameters, plan)
+
+    def _timed(self, fetch, *args):
+        start = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            self._elapsed += time.perf_counter() - start
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is not None:
+            self._rows += 1
+        else:
+            self._finish()
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._timed(super().fetchmany, *args)
+        self._rows += len(rows)
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        self._rows += len(rows)
+        self._finish()
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._elapsed += time.perf_counter() - start
+            self._finish()
+            raise
+        self._elapsed += time.perf_counter() - start
+        self._rows += 1
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+
+class TimedConnection(sqlite3.Connection):
+    """Connection whose cursors (including execute() shortcuts) are TimedCursors."""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
@@ -0,0 +1,139 @@
+"""Queue of stats refresh jobs shared by the scheduler and the admin API.
+
+Jobs live in their own small sqlite file next to the stats database, so
+queueing a job or reporting progress never takes a lock on the database the
+API reads from. Jobs are claimed in (priority, job_id) order; lower numbers
+run first.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+# Admin-triggered jobs jump the queue, then recently active players, then full sweeps
+PRIORITY_ADMIN = 0
+PRIORITY_HOT = 1
+PRIORITY_FULL = 5
+
+MATCH_TYPES = ('ODI', 'T20')
+ACTIONS = ('batting', 'bowling')
+ALL_COUNTRIES = ['australia', 'bangladesh', 'england', 'india', 'new-zealand', 'pakistan', 'south-africa',
+                 'sri-lanka', 'west-indies', 'zimbabwe', 'afghanistan']
+
+
+class JobQueue:
+    """sqlite-backed priority queue of refresh jobs with per-job progress."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS Refresh_Jobs (job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                         match_type TEXT, action TEXT, countries TEXT, player_ids TEXT, priority INTEGER,
+                         requested_by TEXT, status TEXT, created_at REAL, started_at REAL, finished_at REAL,
+                         total INTEGER, done INTEGER DEFAULT 0, new INTEGER DEFAULT 0, changed INTEGER DEFAULT 0,
+                         unchanged INTEGER DEFAULT 0, crawl_id INTEGER, error TEXT)''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_refresh_jobs_queue ON Refresh_Jobs (status, priority, job_id)')
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, match_type, action, countries=None, player_ids=None, priority=PRIORITY_FULL,
+                requested_by='schedule'):
+        """Queues a job unless an identical one is already waiting; returns the job_id either way."""
+        if match_type not in MATCH_TYPES or action not in ACTIONS:
+            raise ValueError('match_type must be one of {} and action one of {}'.format(MATCH_TYPES, ACTIONS))
+        if countries is not None:
+            if not isinstance(countries, (list, tuple)) or not all(isinstance(c, str) for c in countries):
+                raise ValueError('countries must be a list of country names')
+            unknown = sorted(set(countries) - set(ALL_COUNTRIES))
+            if unknown:
+                raise ValueError('unknown countries {}; valid ones are {}'.format(unknown, ALL_COUNTRIES))
+        if player_ids is not None and not isinstance(player_ids, (list, tuple)):
+            raise ValueError('player_ids must be a list of player ids')
+        countries = ','.join(sorted(set(countries))) if countries else None
+        player_ids = json.dumps(sorted(int(pid) for pid in player_ids)) if player_ids else None
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('''SELECT job_id, priority FROM Refresh_Jobs WHERE status='queued' AND match_type=?
+                               AND action=? AND countries IS ? AND player_ids IS ?''',
+                               (match_type, action, countries, player_ids)).fetchone()
+            if row is not None:
+                if priority < row['priority']:
+                    conn.execute('UPDATE Refresh_Jobs SET priority=? WHERE job_id=?', (priority, row['job_id']))
+                job_id = row['job_id']
+            else:
+                job_id = conn.execute('''INSERT INTO Refresh_Jobs (match_type, action, countries, player_ids,
+                                      priority, requested_by, status, created_at) VALUES (?,?,?,?,?,?,'queued',?)''',
+                                      (match_type, action, countries, player_ids, priority, requested_by,
+                                       time.time())).lastrowid
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return job_id
+
+    def claim(self):
+        """Marks the highest priority queued job as running and returns it, or None."""
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute("SELECT job_id FROM Refresh_Jobs WHERE status='queued' "
+                               "ORDER BY priority, job_id LIMIT 1").fetchone()
+            if row is not None:
+                conn.execute("UPDATE Refresh_Jobs SET status='running', started_at=? WHERE job_id=?",
+                             (time.time(), row['job_id']))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return self.get(row['job_id']) if row is not None else None
+
+    def progress(self, job_id, **fields):
+        """Updates total/done/new/changed/unchanged/crawl_id of a running job."""
+        columns = [name for name in ('total', 'done', 'new', 'changed', 'unchanged', 'crawl_id') if name in fields]
+        if columns:
+            self._conn().execute('UPDATE Refresh_Jobs SET ' + ','.join(name + '=?' for name in columns) +
+                                 ' WHERE job_id=?', [fields[name] for name in columns] + [job_id])
+
+    def finish(self, job_id, error=None):
+        self._conn().execute('UPDATE Refresh_Jobs SET status=?, finished_at=?, error=? WHERE job_id=?',
+                             ('failed' if error else 'done', time.time(), error, job_id))
+
+    def requeue_interrupted(self):
+        """Puts jobs left running by a scheduler that died back in the queue."""
+        return self._conn().execute("UPDATE Refresh_Jobs SET status='queued', started_at=NULL, done=0 "
+                                    "WHERE status='running'").rowcount
+
+    def get(self, job_id):
+        row = self._conn().execute('SELECT * FROM Refresh_Jobs WHERE job_id=?', (job_id,)).fetchone()
+        return self._as_dict(row) if row is not None else None
+
+    def recent(self, limit=50):
+        """Returns queued and running jobs first, then the most recent finished ones."""
+        rows = self._conn().execute("SELECT * FROM Refresh_Jobs ORDER BY status IN ('queued', 'running') DESC, "
+                                    "job_id DESC LIMIT ?", (limit,))
+        return [self._as_dict(row) for row in rows]
+
+    def stats(self):
+        counts = dict(self._conn().execute('SELECT status, COUNT(*) FROM Refresh_Jobs GROUP BY status').fetchall())
+        return {status: counts.get(status, 0) for status in ('queued', 'running', 'done', 'failed')}
+
+    def after_fork(self):
+        """Forgets the parent's connection so the child process opens its own."""
+        self._local = threading.local()
+
+    @staticmethod
+    def _as_dict(row):
+        job = dict(row)
+        job['countries'] = job['countries'].split(',') if job['countries'] else None
+        job['player_ids'] = json.loads(job['player_ids']) if job['player_ids'] else None
+        return job
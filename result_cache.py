@@ -0,0 +1,153 @@
+"""Bounded response cache shared by every API worker process, and request coalescing.
+
+Entries live in a small sqlite file next to the stats database, so all
+workers on a box see the same cache. Each entry records the data version it
+was built from; entries from older versions are dropped as soon as a newer
+version is seen, and the least recently used entries are evicted once the
+entry count or total size goes over its limit.
+"""
+
+import sqlite3
+import threading
+import time
+
+
+class ResultCache:
+    """LRU cache of serialised responses keyed by request, bounded by count and bytes."""
+
+    def __init__(self, path, max_entries=2048, max_bytes=64 * 1024 * 1024):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._version = None
+        self._counters = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+        with self._conn() as conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS Cache_Entries (key TEXT PRIMARY KEY, version TEXT,
+                         content_type TEXT, body BLOB, size INTEGER, last_access REAL)''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_cache_last_access ON Cache_Entries (last_access)')
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name, delta=1):
+        with self._lock:
+            self._counters[name] += delta
+
+    def get(self, key, version):
+        """Returns (content_type, body) for key at version, or None."""
+        conn = self._conn()
+        row = conn.execute('SELECT version, content_type, body, last_access FROM Cache_Entries WHERE key=?',
+                           (key,)).fetchone()
+        if row is None or row[0] != version:
+            self._count('misses')
+            return None
+        now = time.time()
+        # Refreshing the LRU timestamp on every hit would turn reads into writes
+        if now - row[3] > 1:
+            conn.execute('UPDATE Cache_Entries SET last_access=? WHERE key=?', (now, key))
+        self._count('hits')
+        return row[1], row[2]
+
+    def put(self, key, version, content_type, body):
+        """Stores a response body, dropping stale versions and evicting LRU entries over the limits."""
+        if len(body) > self.max_bytes:
+            return
+        conn = self._conn()
+        if version != self._version:
+            self.invalidate(version)
+        conn.execute('INSERT OR REPLACE INTO Cache_Entries VALUES (?,?,?,?,?,?)',
+                     (key, version, content_type, body, len(body), time.time()))
+        self._count('stores')
+        self._evict(conn)
+
+    def _evict(self, conn):
+        entries, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM Cache_Entries').fetchone()
+        if entries <= self.max_entries and total <= self.max_bytes:
+            return
+        victims = []
+        for key, size in conn.execute('SELECT key, size FROM Cache_Entries ORDER BY last_access'):
+            if entries <= self.max_entries and total <= self.max_bytes:
+                break
+            victims.append((key,))
+            entries -= 1
+            total -= size
+        conn.executemany('DELETE FROM Cache_Entries WHERE key=?', victims)
+        self._count('evictions', len(victims))
+
+    def invalidate(self, version):
+        """Drops every entry not built from version."""
+        self._version = version
+        self._conn().execute('DELETE FROM Cache_Entries WHERE version!=?', (version,))
+
+    def after_fork(self):
+        """Forgets the parent's connection so the child process opens its own."""
+        self._local = threading.local()
+
+    def stats(self):
+        """Returns hit/miss counters for this process and the shared entry totals."""
+        entries, total = self._conn().execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM Cache_Entries').fetchone()
+        with self._lock:
+            stats = dict(self._counters)
+        stats.update(entries=entries, bytes=total)
+        return stats
+
+
+class _Call:
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait for it and receive the same result (or exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._counters = {'executions': 0, 'coalesced': 0, 'in_flight': 0}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._counters['executions'] += 1
+                self._counters['in_flight'] += 1
+            else:
+                self._counters['coalesced'] += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                self._counters['in_flight'] -= 1
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters)
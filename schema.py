@@ -0,0 +1,21 @@
+"""Column layout of the stats tables.
+
+Shared by the parser, which creates and fills the tables, and by the modules
+that type their values (encoders, bundle), which the parser itself imports.
+"""
+
+# Stats table columns (excluding player) in the order they are stored
+BATTING_COLUMNS = ('playing_span', 'matches_played', 'innings_batted', 'not_outs', 'runs_scored',
+                   'highest_innings_score', 'batting_average', 'balls_faced', 'batting_strike_rate',
+                   'hundreds_scored', 'scores_between_50_and_99', 'ducks_scored', 'boundary_fours', 'boundary_sixes')
+BOWLING_COLUMNS = ('playing_span', 'matches_played', 'innings_bowled_in', 'overs_bowled', 'balls_bowled',
+                   'runs_conceded', 'maidens_earned', 'wickets_taken', 'best_bowling_in_an_innings',
+                   'bowling_average', 'economy_rate', 'bowling_strike_rate', 'four_wkts_exactly_in_an_inns',
+                   'five_wickets_in_an_inns')
+STATS_TABLES = {'Batting_Stats_Odi': BATTING_COLUMNS, 'Batting_Stats_T20': BATTING_COLUMNS,
+                'Bowling_Stats_Odi': BOWLING_COLUMNS, 'Bowling_Stats_T20': BOWLING_COLUMNS}
+# Columns holding numbers stored as TEXT ('-' and 'NA' read as 0 once CAST to REAL)
+TEXT_COLUMNS = ('playing_span', 'best_bowling_in_an_innings')
+# Numeric columns commonly filtered or sorted on; they get CAST(... AS REAL) expression indexes
+INDEXED_NUMERIC_COLUMNS = ('matches_played', 'runs_scored', 'batting_average', 'batting_strike_rate',
+                           'runs_conceded', 'wickets_taken', 'bowling_average', 'economy_rate')
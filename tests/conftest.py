@@ -0,0 +1,99 @@
+"""Shared fixtures: a small stats database and a Flask test client serving it.
+
+The database starts in the shape of the shipped CRICKET_PERF.sqlite (stats rows keyed
+by name, no crawl history), so importing the app exercises its schema upgrade. A crawl
+then records the ODI batting of two namesakes, 'A Sharma' of india and of england, under
+their own ids; their one ODI bowling row stays keyed by name only.
+"""
+
+import importlib
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cricket_parser_v2 as parser  # noqa: E402
+
+BATTING_DEFAULTS = dict(playing_span='2010-2020', matches_played='10', innings_batted='10', not_outs='1',
+                        runs_scored='300', highest_innings_score='88*', batting_average='33.33', balls_faced='400',
+                        batting_strike_rate='75.00', hundreds_scored='0', scores_between_50_and_99='2',
+                        ducks_scored='1', boundary_fours='30', boundary_sixes='5')
+BOWLING_DEFAULTS = dict(playing_span='2010-2020', matches_played='10', innings_bowled_in='9', overs_bowled='80.0',
+                        balls_bowled='480', runs_conceded='400', maidens_earned='2', wickets_taken='12',
+                        best_bowling_in_an_innings='3/20', bowling_average='33.33', economy_rate='5.00',
+                        bowling_strike_rate='40.0', four_wkts_exactly_in_an_inns='0', five_wickets_in_an_inns='0')
+
+COUNTRIES = [(1, 'india'), (2, 'england')]
+PLAYERS = [(1, 101, 'A Sharma', 'Y', 'Y'), (1, 102, 'B Kumar', 'Y', 'Y'), (1, 103, 'C Singh', 'Y', None),
+           (1, 104, 'E Patel', None, 'Y'), (2, 201, 'A Sharma', 'Y', None), (2, 202, 'D Root', 'Y', 'Y')]
+# Rows as the original scraper stored them: by name only, with one 'A Sharma' row per table
+LEGACY_STATS = {
+    'Batting_Stats_Odi': [('A Sharma', dict(runs_scored='700', batting_average='70.00')),
+                          ('B Kumar', dict(runs_scored='500', batting_average='50.00')),
+                          ('C Singh', dict(runs_scored='120', batting_average='-')),
+                          ('D Root', dict(runs_scored='900', batting_average='45.00'))],
+    'Batting_Stats_T20': [('B Kumar', dict(runs_scored='200')), ('E Patel', dict(runs_scored='80')),
+                          ('D Root', dict(runs_scored='350'))],
+    'Bowling_Stats_Odi': [('A Sharma', dict(wickets_taken='3')), ('B Kumar', dict(wickets_taken='20')),
+                          ('C Singh', dict(wickets_taken='5', economy_rate='6.50')),
+                          ('D Root', dict(wickets_taken='1', bowling_average='-'))],
+    'Bowling_Stats_T20': [('E Patel', dict(wickets_taken='8'))],
+}
+# The crawl run over the legacy database: (table, player_id, name, overrides)
+CRAWL_STATS = [('Batting_Stats_Odi', 101, 'A Sharma', dict(runs_scored='700', batting_average='70.00')),
+               ('Batting_Stats_Odi', 201, 'A Sharma', dict(runs_scored='150', batting_average='15.00'))]
+
+
+def stats_values(table_name, **overrides):
+    defaults = BATTING_DEFAULTS if table_name.startswith('Batting') else BOWLING_DEFAULTS
+    return tuple(overrides.get(column, defaults[column]) for column in parser.STATS_TABLES[table_name])
+
+
+def make_legacy_db(dbname):
+    """Writes a database in the original schema: no player_id on stats rows, no history tables."""
+    conn = sqlite3.connect(dbname + '.sqlite')
+    conn.execute('CREATE TABLE Countries (country_id INTEGER PRIMARY KEY,country TEXT)')
+    conn.execute('CREATE TABLE Players (country_id INTEGER,player_id INTEGER UNIQUE,player TEXT,odi_cap TEXT,t20_cap TEXT)')
+    conn.executemany('INSERT INTO Countries VALUES (?,?)', COUNTRIES)
+    conn.executemany('INSERT INTO Players VALUES (?,?,?,?,?)', PLAYERS)
+    for table_name, columns in parser.STATS_TABLES.items():
+        conn.execute('CREATE TABLE {} (player TEXT,{})'.format(table_name, ','.join(c + ' TEXT' for c in columns)))
+        conn.executemany('INSERT INTO {} VALUES (?{})'.format(table_name, ',?' * len(columns)),
+                         [(name,) + stats_values(table_name, **overrides)
+                          for name, overrides in LEGACY_STATS[table_name]])
+    conn.commit()
+    conn.close()
+
+
+def run_crawl(dbname, stats):
+    """Stores stats rows the way the parser does and returns the crawl_id."""
+    conn = sqlite3.connect(dbname + '.sqlite')
+    parser.create_tables(conn)
+    crawl_id = parser.start_crawl(conn, 'ODI', ['india', 'england'])
+    for table_name, player_id, name, overrides in stats:
+        parser.store_stats_row(conn.cursor(), table_name, player_id, name, stats_values(table_name, **overrides),
+                               crawl_id)
+    parser.finish_crawl(conn, crawl_id)
+    conn.close()
+    return crawl_id
+
+
+@pytest.fixture(scope='session')
+def flask_app(tmp_path_factory):
+    dbname = str(tmp_path_factory.mktemp('db') / 'CRICKET_TEST')
+    make_legacy_db(dbname)
+    # The API never changes the schema itself
+    parser.migrate_database(dbname)
+    os.environ['CRICKET_DB'] = dbname
+    module = importlib.import_module('flask_app')
+    run_crawl(dbname, CRAWL_STATS)
+    parser.bump_data_version(dbname)
+    return module
+
+
+@pytest.fixture
+def client(flask_app):
+    return flask_app.app.test_client()
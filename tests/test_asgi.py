@@ -0,0 +1,33 @@
+import asyncio
+import importlib
+
+
+def call(app, path, query=b''):
+    messages = []
+    requests = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+             'path': path, 'raw_path': path.encode(), 'root_path': '', 'query_string': query, 'headers': [],
+             'server': ('testserver', 80), 'client': ('127.0.0.1', 1234)}
+    asyncio.run(app(scope, receive, send))
+    status = next(message['status'] for message in messages if message['type'] == 'http.response.start')
+    body = b''.join(message.get('body', b'') for message in messages if message['type'] == 'http.response.body')
+    return status, body
+
+
+def test_serves_flask_routes(flask_app):
+    asgi_app = importlib.import_module('asgi_app')
+    status, body = call(asgi_app.app, '/api/v2/countries/all')
+    assert status == 200
+    assert b'england' in body
+    status, body = call(asgi_app.app, '/api/v2/countries', b'name=india&stream=1')
+    assert status == 200
+    assert len(body.splitlines()) == 4
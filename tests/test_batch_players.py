@@ -0,0 +1,25 @@
+def get_players(client, **params):
+    response = client.get('/api/v2/get_stats/players', query_string=params)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_namesakes_get_their_own_rows(client):
+    body = get_players(client, ids='101,201', match_type='ODI', play_type='batting')
+    assert body['players']['101']['batting_odi']['runs_scored'] == '700'
+    assert body['players']['201']['batting_odi']['runs_scored'] == '150'
+    assert 'ambiguous' not in body['players']['101']
+
+
+def test_rows_matched_by_name_are_flagged(client):
+    body = get_players(client, ids='101,201', match_type='ODI', play_type='bowling')
+    for pid in ('101', '201'):
+        assert body['players'][pid]['bowling_odi']['wickets_taken'] == '3'
+        assert body['players'][pid]['ambiguous'] == ['bowling_odi']
+
+
+def test_missing_and_invalid_ids(client):
+    assert get_players(client, ids='102,999')['missing'] == [999]
+    assert client.get('/api/v2/get_stats/players', query_string={'ids': 'x'}).status_code == 400
+    too_many = ','.join(str(pid) for pid in range(1, 102))
+    assert client.get('/api/v2/get_stats/players', query_string={'ids': too_many}).status_code == 400
@@ -0,0 +1,66 @@
+import gzip
+import json
+import os
+
+import cricket_parser_v2 as parser
+from bundle import BUNDLE_FORMAT, bundle_path
+from conftest import make_legacy_db
+
+
+def test_bundle_is_served_precompressed(client):
+    response = client.get('/api/v2/bootstrap', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['ETag'].endswith('-gzip"')
+    bundle = json.loads(gzip.decompress(response.data))
+    assert bundle['format'] == BUNDLE_FORMAT
+    assert bundle['countries']['country'] == ['india', 'england']
+
+    cached = client.get('/api/v2/bootstrap', headers={'Accept-Encoding': 'gzip',
+                                                      'If-None-Match': response.headers['ETag']})
+    assert cached.status_code == 304
+
+
+def test_head_requests_get_the_same_etag(client):
+    get = client.get('/api/v2/bootstrap', headers={'Accept-Encoding': 'gzip'})
+    head = client.head('/api/v2/bootstrap', headers={'Accept-Encoding': 'gzip'})
+    assert head.status_code == 200
+    assert head.headers['Content-Encoding'] == 'gzip'
+    assert head.headers['ETag'] == get.headers['ETag']
+    assert client.head('/api/v2/bootstrap', headers={'Accept-Encoding': 'gzip',
+                                                     'If-None-Match': get.headers['ETag']}).status_code == 304
+
+
+def test_bundle_stats_rows_carry_player_ids(client):
+    bundle = client.get('/api/v2/bootstrap').get_json()
+    batting = bundle['stats']['batting_stats_odi']
+    rows = {(bundle['names'][code], player_id): runs
+            for code, player_id, runs in zip(batting['player'], batting['player_id'], batting['runs_scored'])}
+    assert rows[('A Sharma', 101)] == 700 and rows[('A Sharma', 201)] == 150
+    # The ODI bowling row of 'A Sharma' was never keyed by a crawl
+    bowling = bundle['stats']['bowling_stats_odi']
+    assert None in bowling['player_id']
+
+
+def test_bump_writes_the_bundle_before_publishing_the_version(tmp_path):
+    dbname = str(tmp_path / 'bundle')
+    make_legacy_db(dbname)
+    with parser.get_db_conn(dbname) as conn:
+        parser.create_tables(conn)
+    assert parser.bump_data_version(dbname) == 1
+    assert parser.bump_data_version(dbname) == 2
+    assert os.path.exists(bundle_path(dbname, '2', 'gzip'))
+    # Bundles of older versions are removed once the new version is published
+    assert not os.path.exists(bundle_path(dbname, '1', 'gzip'))
+
+
+def test_bump_survives_a_failed_bundle(tmp_path, monkeypatch):
+    dbname = str(tmp_path / 'nobundle')
+    make_legacy_db(dbname)
+
+    def fail(dbname, version):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(parser, 'write_bundle', fail)
+    assert parser.bump_data_version(dbname) == 1
+    assert parser.get_data_version(dbname) == '1'
@@ -0,0 +1,44 @@
+import gzip
+
+LARGE = ('/api/v2/get_stats/countries', {'name': 'india', 'play_type': 'batting', 'match_type': 'ODI'})
+
+
+def test_large_responses_are_gzipped(client):
+    path, query = LARGE
+    plain = client.get(path, query_string=query)
+    compressed = client.get(path, query_string=query, headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in plain.headers
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    assert gzip.decompress(compressed.data) == plain.data
+    assert compressed.headers['ETag'] == plain.headers['ETag'][:-1] + '-gzip"'
+
+
+def test_compressed_etag_revalidates(client):
+    path, query = LARGE
+    etag = client.get(path, query_string=query, headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+    response = client.get(path, query_string=query, headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert response.status_code == 304
+
+
+def test_small_responses_are_sent_as_is(client):
+    response = client.get('/api/v2/countries/all', headers={'Accept-Encoding': 'gzip'})
+    assert len(response.data) < 1024
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_static_page_is_served_precompressed(flask_app, client):
+    response = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    asset = flask_app.static_assets.get('index.html')
+    assert gzip.decompress(response.data) == asset.body(None)[1]
+    revalidated = client.get('/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
+
+
+def test_streamed_responses_are_not_compressed(client):
+    path, query = LARGE
+    response = client.get(path, query_string=dict(query, stream=1), headers={'Accept-Encoding': 'gzip'})
+    assert response.is_streamed
+    assert 'Content-Encoding' not in response.headers
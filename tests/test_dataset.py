@@ -0,0 +1,103 @@
+import pandas as pd
+import pytest
+
+from conftest import CRAWL_STATS, make_legacy_db, run_crawl
+from dataset import (compare_players, distribution, load_dataset, search_players, select_player, select_players,
+                     select_stats)
+
+
+@pytest.fixture(scope='module')
+def data(tmp_path_factory):
+    # The fixture database after one crawl: India's A Sharma (101) and England's (201) each have an
+    # ODI batting row keyed by player_id, while the legacy A Sharma ODI bowling row has none
+    dbname = str(tmp_path_factory.mktemp('dataset') / 'CRICKET_TEST')
+    make_legacy_db(dbname)
+    run_crawl(dbname, CRAWL_STATS)
+    return load_dataset(dbname)
+
+
+def rows(frame, *columns):
+    return [tuple(None if pd.isna(value) else value for value in row)
+            for row in frame[list(columns)].astype(object).itertuples(index=False)]
+
+
+def test_load_dataset_types_the_stats_columns(data):
+    batting = data['batting']
+    assert list(batting.columns[:3]) == ['player', 'player_id', 'format']
+    assert str(batting['player_id'].dtype) == 'Int64'
+    assert str(batting['runs_scored'].dtype) == 'Int64'
+    assert batting['batting_average'].dtype == 'float64'
+    assert not pd.api.types.is_numeric_dtype(batting['playing_span'])
+    # C Singh's '-' average is missing rather than text
+    assert batting.loc[batting['player'] == 'C Singh', 'batting_average'].isna().all()
+    assert data['players']['odi_cap'].dtype == bool
+
+
+def test_rows_index_covers_every_player_and_format(data):
+    batting = data['batting']
+    sharma = batting.iloc[data['batting_rows'][('A Sharma', 'ODI')]]
+    assert sorted(sharma['player_id'].tolist()) == [101, 201]
+    assert ('A Sharma', 'T20') not in data['batting_rows']
+
+
+def test_select_players_by_country_and_cap(data):
+    assert select_players(data, 'india')['player_id'].tolist() == [101, 102, 103, 104]
+    assert select_players(data, 'india', 't20')['player_id'].tolist() == [101, 102, 104]
+    assert select_players(data, 'england', 'ODI')['player_id'].tolist() == [201, 202]
+    assert select_players(data, 'narnia').empty
+
+
+def test_select_stats_matches_namesakes_by_player_id(data):
+    india = select_stats(data, 'india', 'batting', 'ODI')
+    assert rows(india, 'player', 'player_id', 'runs_scored') == [('A Sharma', 101, 700), ('B Kumar', 102, 500),
+                                                                ('C Singh', 103, 120)]
+    england = select_stats(data, 'england', 'batting', 'odi')
+    assert rows(england, 'player', 'player_id', 'runs_scored') == [('A Sharma', 201, 150), ('D Root', 202, 900)]
+
+
+def test_select_stats_falls_back_to_the_name_without_a_player_id(data):
+    # No crawl has keyed the legacy A Sharma bowling row, so both namesakes' countries list it
+    for country in ('india', 'england'):
+        bowling = select_stats(data, country, 'bowling', 'ODI')
+        assert ('A Sharma', None, 3) in rows(bowling, 'player', 'player_id', 'wickets_taken')
+
+
+def test_search_players_by_name_or_surname_prefix(data):
+    # Namesakes are separate matches, told apart by their labels
+    assert search_players(data, 'sha') == ([101, 201], 2)
+    assert [data['player_labels'][player_id] for player_id in search_players(data, 'a sh')[0]] == \
+        ['A Sharma (india)', 'A Sharma (england)']
+    assert search_players(data, '  B   KUM') == ([102], 1)
+    assert search_players(data, 'r', country='england')[0] == [202]
+    assert search_players(data, 'patel', match_type='odi') == ([], 0)
+    assert search_players(data, '', country='india', offset=1, limit=2) == ([102, 103], 4)
+
+
+def test_select_player_keeps_namesakes_apart(data):
+    india = select_player(data, 101)
+    assert rows(india['batting_odi'], 'player_id', 'runs_scored') == [(101, 700)]
+    assert rows(select_player(data, 201)['batting_odi'], 'player_id', 'runs_scored') == [(201, 150)]
+    # A row without a player_id belongs to every player of that name
+    assert rows(india['bowling_odi'], 'player_id', 'wickets_taken') == [(None, 3)]
+    assert india['batting_t20'].empty
+    assert all(frame.empty for frame in select_player(data, 999).values())
+
+
+def test_compare_players_by_player_id(data):
+    result = compare_players(data, [201, 101, 102, 201, 999], 'ODI')
+    assert result.index.tolist() == ['A Sharma (england)', 'A Sharma (india)', 'B Kumar', '999']
+    assert result['runs'].tolist()[:3] == [150.0, 700.0, 500.0]
+    # England's A Sharma has no keyed bowling row, so takes the one stored under the name
+    assert result['wickets'].tolist()[:3] == [3.0, 3.0, 20.0]
+    assert result.loc['B Kumar', 'runs_per_innings'] == 50.0
+    assert result.loc['B Kumar', 'boundary_pct'] == round(100 * (4 * 30 + 6 * 5) / 500, 2)
+    assert result.loc['999'].isna().all()
+
+
+def test_distribution_counts_namesakes_separately(data):
+    hist = distribution(data, 'batting', 'runs_scored', 'ODI', bins=4)
+    # 150, 120, 500, 700 and 900: both A Sharmas count
+    assert hist['players'].tolist() == [2, 1, 1, 1]
+    assert (hist['start'].iloc[0], hist['end'].iloc[-1]) == (120.0, 900.0)
+    india = distribution(data, 'batting', 'runs_scored', 'ODI', country='india', bins=2)
+    assert india['players'].sum() == 3
@@ -0,0 +1,55 @@
+import os
+import shutil
+import threading
+
+import pytest
+
+from db_pool import PoolTimeout, ReadOnlyConnectionPool
+
+
+@pytest.fixture
+def pool(flask_app):
+    return ReadOnlyConnectionPool(flask_app.dbname, max_connections=2, timeout=0.2, generation_check_interval=0)
+
+
+def test_thread_per_request_reuses_connections(pool):
+    def request():
+        with pool.connection() as conn:
+            conn.execute('SELECT COUNT(*) FROM Players').fetchone()
+
+    for _ in range(20):
+        thread = threading.Thread(target=request)
+        thread.start()
+        thread.join()
+    stats = pool.stats()
+    assert stats['opened'] == 1
+    assert stats['open'] == 1
+    assert stats['in_use'] == 0
+
+
+def test_checkouts_are_bounded(pool):
+    with pool.connection(), pool.connection():
+        with pytest.raises(PoolTimeout):
+            with pool.connection():
+                pass
+    assert pool.stats()['open'] == 2
+
+
+def test_new_generation_replaces_connections(pool, flask_app, tmp_path):
+    with pool.connection() as conn:
+        conn.execute('SELECT 1')
+    # A new generation is a different file renamed over the database path
+    copy = str(tmp_path / 'copy.sqlite')
+    shutil.copy(flask_app.dbname + '.sqlite', copy)
+    live = flask_app.dbname + '.sqlite'
+    backup = str(tmp_path / 'live.sqlite')
+    os.link(live, backup)
+    os.replace(copy, live)
+    try:
+        with pool.connection() as conn:
+            assert conn.execute('SELECT COUNT(*) FROM Players').fetchone()[0] == 6
+    finally:
+        os.replace(backup, live)
+    stats = pool.stats()
+    assert stats['generation_reopens'] == 1
+    assert stats['open'] == 1
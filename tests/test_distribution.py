@@ -0,0 +1,30 @@
+import pytest
+
+QUERY = {'stat': 'runs_scored', 'play_type': 'batting', 'match_type': 'ODI', 'name': 'india'}
+
+
+def test_bins_cover_the_observed_range(client):
+    response = client.get('/api/v2/get_stats/distribution', query_string=dict(QUERY, bins=4))
+    assert response.status_code == 200
+    body = response.get_json()
+    assert len(body['bins']) == 4
+    # India's A Sharma (700), B Kumar and C Singh; England's A Sharma (150) is a namesake, not counted
+    assert (body['count'], body['min'], body['max']) == (3, 120.0, 700.0)
+    assert body['bins'][0]['start'] == 120.0 and body['bins'][-1]['end'] == 700.0
+    # The maximum lands in the last bin, as numpy.histogram puts it
+    assert sum(b['count'] for b in body['bins']) == body['count']
+    assert body['bins'][-1]['count'] >= 1
+
+
+def test_fixed_range_leaves_out_values_outside(client):
+    body = client.get('/api/v2/get_stats/distribution',
+                      query_string=dict(QUERY, bins=2, min=100, max=600)).get_json()
+    assert [(b['start'], b['end']) for b in body['bins']] == [(100.0, 350.0), (350.0, 600.0)]
+    assert sum(b['count'] for b in body['bins']) == body['count']
+
+
+@pytest.mark.parametrize('params', [{'bins': 0}, {'bins': 101}, {'bins': 'many'}, {'min': 500, 'max': 100},
+                                    {'min': 300, 'max': 300}, {'min': 'low'}, {'max': 'nan'}])
+def test_rejects_bad_bins_and_ranges(client, params):
+    response = client.get('/api/v2/get_stats/distribution', query_string=dict(QUERY, **params))
+    assert response.status_code == 400
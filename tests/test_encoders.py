@@ -0,0 +1,67 @@
+import json
+
+import msgpack
+import pyarrow.ipc
+
+import encoders
+
+QUERY = {'play_type': 'batting', 'match_type': 'ODI', 'name': 'india', 'limit': 1}
+
+
+def pages(client, accept):
+    query = dict(QUERY)
+    while True:
+        response = client.get('/api/v2/get_stats/countries', query_string=query, headers={'Accept': accept})
+        assert response.status_code == 200
+        yield response
+        cursor = next_cursor(response, accept)
+        if not cursor:
+            return
+        query['after'] = cursor
+
+
+def next_cursor(response, accept):
+    if accept == encoders.ARROW_MIMETYPE:
+        table = pyarrow.ipc.open_stream(response.data).read_all()
+        return json.loads(table.schema.metadata[b'payload'])['next_cursor']
+    return msgpack.unpackb(response.data)['next_cursor']
+
+
+def test_column_types_are_fixed():
+    assert encoders.typed_column('batting_average', ['33.33', '-', 'NA', None]) == [33.33, None, None, None]
+    assert encoders.typed_column('highest_innings_score', ['88*']) == [88.0]
+    assert encoders.typed_column('playing_span', ['2010-2020']) == ['2010-2020']
+    assert encoders.typed_column('best_bowling_in_an_innings', ['3/20']) == ['3/20']
+    assert encoders.typed_column('player_id', [101, None]) == [101, None]
+
+
+def test_whole_columns_take_the_narrowest_type():
+    assert encoders.type_column(['12', '-', None]) == [12, None, None]
+    assert encoders.type_column(['33.33', 'NA', '7']) == [33.33, None, 7.0]
+    assert encoders.type_column(['88*', '12']) == ['88*', '12']
+    assert encoders.type_column([101, None]) == [101, None]
+    assert encoders.infer_type(['-', 'NA']) == 'int'
+
+
+def test_arrow_schema_is_the_same_on_every_page(client):
+    schemas = set()
+    averages = []
+    for response in pages(client, encoders.ARROW_MIMETYPE):
+        table = pyarrow.ipc.open_stream(response.data).read_all()
+        schemas.add(table.schema.remove_metadata())
+        averages += table.column('batting_average').to_pylist()
+    assert len(schemas) == 1
+    schema = schemas.pop()
+    assert str(schema.field('batting_average').type) == 'double'
+    assert str(schema.field('runs_scored').type) == 'double'
+    assert str(schema.field('player').type) == 'string'
+    # C Singh's '-' average is a null, not a reason to turn the column into strings
+    assert None in averages and 70.0 in averages
+
+
+def test_msgpack_values_keep_their_column_type(client):
+    averages = []
+    for response in pages(client, encoders.MSGPACK_MIMETYPE):
+        averages += [row['batting_average'] for row in msgpack.unpackb(response.data)['stats']]
+    assert None in averages
+    assert all(average is None or isinstance(average, float) for average in averages)
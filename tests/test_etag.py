@@ -0,0 +1,38 @@
+def test_api_responses_carry_a_data_version_etag(client):
+    response = client.get('/api/v2/countries/all')
+    assert response.status_code == 200
+    assert response.headers['ETag']
+    assert response.headers['Cache-Control'] == 'public, max-age=0, must-revalidate'
+
+    revalidated = client.get('/api/v2/countries/all', headers={'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
+    assert revalidated.data == b''
+    assert revalidated.headers['ETag'] == response.headers['ETag']
+
+
+def test_etag_differs_by_query_and_format(client):
+    etags = {client.get('/api/v2/countries', query_string={'name': name}).headers['ETag']
+             for name in ('india', 'england')}
+    etags.add(client.get('/api/v2/countries', query_string={'name': 'india'},
+                         headers={'Accept': 'application/x-ndjson'}).headers['ETag'])
+    assert len(etags) == 3
+
+
+def test_new_data_version_changes_the_etag(flask_app, client, monkeypatch):
+    etag = client.get('/api/v2/countries/all').headers['ETag']
+    monkeypatch.setattr(flask_app, 'get_data_version', lambda dbname: 'next')
+    response = client.get('/api/v2/countries/all', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_health_has_no_etag(client):
+    response = client.get('/api/v2/health')
+    assert 'ETag' not in response.headers
+
+
+def test_admin_endpoints_have_no_etag(flask_app, client, monkeypatch):
+    monkeypatch.setattr(flask_app, 'ADMIN_TOKEN', 'secret')
+    response = client.get('/api/v2/admin/jobs', headers={'Authorization': 'Bearer secret'})
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers
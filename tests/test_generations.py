@@ -0,0 +1,66 @@
+import os
+import sqlite3
+
+import pytest
+
+import cricket_parser_v2 as parser
+from conftest import make_legacy_db
+
+
+@pytest.fixture
+def dbname(tmp_path):
+    dbname = str(tmp_path / 'live')
+    make_legacy_db(dbname)
+    with parser.get_db_conn(dbname) as conn:
+        parser.create_tables(conn)
+    parser.bump_data_version(dbname)
+    return dbname
+
+
+def runs(dbname, player):
+    conn = sqlite3.connect(dbname + '.sqlite')
+    try:
+        return conn.execute('SELECT runs_scored FROM Batting_Stats_Odi WHERE player=?', (player,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def stage_with(dbname, *statements):
+    staging = parser.stage_generation(dbname)
+    conn = sqlite3.connect(staging + '.sqlite')
+    for statement in statements:
+        conn.execute(statement)
+    conn.commit()
+    conn.close()
+    return staging
+
+
+def test_publish_swaps_the_staged_generation_in(dbname):
+    staging = stage_with(dbname, "UPDATE Batting_Stats_Odi SET runs_scored='950' WHERE player='D Root'")
+    assert runs(dbname, 'D Root') == '900'
+    assert parser.publish_generation(dbname, staging) == 2
+    assert runs(dbname, 'D Root') == '950'
+    assert parser.get_data_version(dbname) == '2'
+    assert os.path.exists(dbname + parser.PREVIOUS_SUFFIX + '.sqlite')
+    assert not os.path.exists(staging + '.sqlite')
+
+
+def test_invalid_generations_are_not_published(dbname):
+    for statement in ('DELETE FROM Countries', "DELETE FROM Batting_Stats_Odi WHERE player!='D Root'"):
+        staging = stage_with(dbname, statement)
+        with pytest.raises(ValueError):
+            parser.publish_generation(dbname, staging)
+        assert runs(dbname, 'B Kumar') == '500'
+        assert parser.get_data_version(dbname) == '1'
+
+
+def test_rollback_restores_the_previous_generation(dbname):
+    with pytest.raises(FileNotFoundError):
+        parser.rollback_generation(dbname)
+    parser.publish_generation(dbname, stage_with(dbname, "UPDATE Batting_Stats_Odi SET runs_scored='950' "
+                                                         "WHERE player='D Root'"))
+    assert parser.rollback_generation(dbname) == 3
+    assert runs(dbname, 'D Root') == '900'
+    # The rolled-back generation becomes the previous one, so rolling back again re-applies it
+    parser.rollback_generation(dbname)
+    assert runs(dbname, 'D Root') == '950'
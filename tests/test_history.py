@@ -0,0 +1,122 @@
+import sqlite3
+
+import cricket_parser_v2 as parser
+from conftest import make_legacy_db, run_crawl
+from db_pool import ReadOnlyConnectionPool
+
+
+def test_crawls_are_listed(client):
+    response = client.get('/api/v2/crawls')
+    assert response.status_code == 200
+    assert [crawl['crawl_id'] for crawl in response.get_json()['crawls']] == [1]
+
+
+def test_unmigrated_database_is_a_clear_error(flask_app, client, monkeypatch, tmp_path):
+    dbname = str(tmp_path / 'legacy')
+    make_legacy_db(dbname)
+    monkeypatch.setattr(flask_app, 'db_pool', ReadOnlyConnectionPool(dbname))
+    monkeypatch.setattr(flask_app, 'get_data_version', lambda dbname: 'legacy')
+    monkeypatch.setattr(flask_app, 'schema_checks', {})
+    for path, query in (('/api/v2/crawls', {}),
+                        ('/api/v2/get_stats/countries', {'play_type': 'batting', 'match_type': 'ODI',
+                                                         'name': 'india', 'as_of': 1})):
+        response = client.get(path, query_string=query)
+        assert response.status_code == 503
+        assert '--migrate' in response.get_json()['error']
+    # The API never writes the migration itself
+    conn = sqlite3.connect(dbname + '.sqlite')
+    assert not parser.schema_is_current(conn.cursor())
+    conn.close()
+    assert client.get('/api/v2/countries', query_string={'name': 'india'}).status_code == 200
+
+
+def test_migrate_database(tmp_path):
+    dbname = str(tmp_path / 'legacy')
+    make_legacy_db(dbname)
+    assert parser.migrate_database(dbname) == 1
+    conn = sqlite3.connect(dbname + '.sqlite')
+    assert parser.schema_is_current(conn.cursor())
+    assert conn.execute("SELECT player_id FROM Batting_Stats_Odi WHERE player='D Root'").fetchone() == (202,)
+    conn.close()
+    assert parser.migrate_database(dbname) is None
+    assert parser.get_data_version(dbname) == '1'
+
+
+def test_migrate_database_publishes_a_staged_copy(tmp_path):
+    dbname = str(tmp_path / 'legacy')
+    make_legacy_db(dbname)
+    assert parser.migrate_database(dbname, publish=True) == 1
+    conn = sqlite3.connect(dbname + '.sqlite')
+    assert parser.schema_is_current(conn.cursor())
+    conn.close()
+    previous = sqlite3.connect(dbname + parser.PREVIOUS_SUFFIX + '.sqlite')
+    assert not parser.schema_is_current(previous.cursor())
+    previous.close()
+
+
+def test_as_of_rebuilds_rows_per_player(client):
+    response = client.get('/api/v2/get_stats/countries', query_string={
+        'play_type': 'batting', 'match_type': 'ODI', 'name': 'india', 'as_of': 1})
+    assert response.status_code == 200
+    rows = {(row['player'], row['player_id']): row for row in response.get_json()['stats']}
+    # England's 'A Sharma' is a namesake, not one of india's players
+    assert set(rows) == {('A Sharma', 101), ('B Kumar', 102), ('C Singh', 103)}
+    assert rows[('A Sharma', 101)]['runs_scored'] == '700'
+
+
+def test_as_of_pages_through_namesakes(client):
+    query = {'play_type': 'batting', 'match_type': 'ODI', 'name': 'india', 'as_of': 1, 'limit': 1}
+    seen = []
+    while True:
+        body = client.get('/api/v2/get_stats/countries', query_string=query).get_json()
+        seen += [(row['player'], row['player_id']) for row in body['stats']]
+        if not body['next_cursor']:
+            break
+        query['after'] = body['next_cursor']
+    assert seen == [('A Sharma', 101), ('B Kumar', 102), ('C Singh', 103)]
+
+
+def test_live_rows_match_players_by_id(client):
+    response = client.get('/api/v2/get_stats/countries', query_string={
+        'play_type': 'batting', 'match_type': 'ODI', 'name': 'england'})
+    rows = {(row['player'], row['player_id']): row['runs_scored'] for row in response.get_json()['stats']}
+    assert rows == {('A Sharma', 201): '150', ('D Root', 202): '900'}
+
+
+def test_as_of_rejects_bad_cursor(client):
+    response = client.get('/api/v2/get_stats/countries', query_string={
+        'play_type': 'batting', 'match_type': 'ODI', 'name': 'india', 'as_of': 1, 'after': 'A Sharma'})
+    assert response.status_code == 400
+
+
+def test_namesakes_keep_separate_rows_and_history(tmp_path):
+    dbname = str(tmp_path / 'history')
+    make_legacy_db(dbname)
+    first = run_crawl(dbname, [('Batting_Stats_Odi', 101, 'A Sharma', dict(runs_scored='710')),
+                               ('Batting_Stats_Odi', 201, 'A Sharma', dict(runs_scored='150'))])
+    second = run_crawl(dbname, [('Batting_Stats_Odi', 201, 'A Sharma', dict(runs_scored='160'))])
+
+    conn = sqlite3.connect(dbname + '.sqlite')
+    rows = dict(conn.execute("SELECT player_id, runs_scored FROM Batting_Stats_Odi WHERE player='A Sharma'"))
+    assert rows == {101: '710', 201: '160'}
+    # Unique names were keyed when the schema was upgraded
+    assert conn.execute("SELECT player_id FROM Batting_Stats_Odi WHERE player='B Kumar'").fetchone() == (102,)
+    as_of = {(row['player_id'], row['runs_scored'])
+             for row in parser.iter_stats_as_of(conn.cursor(), 'Batting_Stats_Odi', first)
+             if row['player'] == 'A Sharma'}
+    assert as_of == {(101, '710'), (201, '150')}
+    latest = {row['player_id']: row['runs_scored']
+              for row in parser.iter_stats_as_of(conn.cursor(), 'Batting_Stats_Odi', second)
+              if row['player'] == 'A Sharma'}
+    assert latest == {101: '710', 201: '160'}
+
+
+def test_unchanged_row_is_not_rewritten(tmp_path):
+    dbname = str(tmp_path / 'unchanged')
+    make_legacy_db(dbname)
+    run_crawl(dbname, [('Batting_Stats_Odi', 102, 'B Kumar', dict(runs_scored='500', batting_average='50.00'))])
+    conn = sqlite3.connect(dbname + '.sqlite')
+    cur = conn.cursor()
+    values = cur.execute('SELECT {} FROM Batting_Stats_Odi WHERE player_id=102'.format(
+        ','.join(parser.BATTING_COLUMNS))).fetchone()
+    assert parser.store_stats_row(cur, 'Batting_Stats_Odi', 102, 'B Kumar', values, 2) == 'unchanged'
@@ -0,0 +1,45 @@
+import time
+
+import metrics
+
+# Returns no row until it has generated every number, so nearly all work happens in the fetch
+SLOW_SUM = 'WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 300000) SELECT SUM(x) FROM n'
+MANY_ROWS = 'WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 200000) SELECT x FROM n'
+
+
+def recorded(histogram):
+    counts, total = histogram._values.get((), ([0], 0))
+    return sum(counts), total
+
+
+def connect():
+    return metrics.TimedConnection(':memory:')
+
+
+def test_sql_time_includes_fetching_rows():
+    conn = connect()
+    count, total = recorded(metrics.sql_latency)
+    start = time.perf_counter()
+    rows = conn.execute(MANY_ROWS).fetchall()
+    wall = time.perf_counter() - start
+    new_count, new_total = recorded(metrics.sql_latency)
+    assert len(rows) == 200000
+    assert new_count == count + 1
+    assert new_total - total >= 0.8 * wall
+
+
+def test_iterated_statement_is_recorded_once_exhausted():
+    conn = connect()
+    rows_count, rows_total = recorded(metrics.sql_rows)
+    cur = conn.cursor()
+    assert sum(1 for _ in cur.execute(MANY_ROWS)) == 200000
+    assert recorded(metrics.sql_rows) == (rows_count + 1, rows_total + 200000)
+
+
+def test_single_row_statement_is_recorded_on_next_execute():
+    conn = connect()
+    cur = conn.cursor()
+    count, _ = recorded(metrics.sql_latency)
+    cur.execute(SLOW_SUM).fetchone()
+    cur.execute('SELECT 1').fetchall()
+    assert recorded(metrics.sql_latency)[0] == count + 2
@@ -0,0 +1,44 @@
+import json
+
+STATS = {'name': 'india', 'play_type': 'batting', 'match_type': 'ODI'}
+
+
+def lines(response):
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_stream_param_exports_every_row_unpaged(client):
+    response = client.get('/api/v2/get_stats/countries', query_string=dict(STATS, stream=1, limit=1))
+    assert response.is_streamed
+    assert [row['player'] for row in lines(response)] == ['A Sharma', 'B Kumar', 'C Singh']
+
+
+def test_accept_header_negotiates_ndjson(client):
+    response = client.get('/api/v2/get_stats/countries', query_string=STATS,
+                          headers={'Accept': 'application/x-ndjson'})
+    rows = lines(response)
+    assert len(rows) == 3
+    assert rows[0]['runs_scored'] == '700'
+
+
+def test_json_stays_the_default(client):
+    for accept in (None, '*/*', 'application/json, application/x-ndjson;q=0.5'):
+        response = client.get('/api/v2/get_stats/countries', query_string=STATS,
+                              headers={'Accept': accept} if accept else {})
+        assert response.mimetype == 'application/json'
+        assert len(response.get_json()['stats']) == 3
+
+
+def test_as_of_rows_stream(client):
+    rows = lines(client.get('/api/v2/get_stats/countries', query_string=dict(STATS, as_of=1, stream=1)))
+    assert {row['player']: row['runs_scored'] for row in rows} == {'A Sharma': '700', 'B Kumar': '500',
+                                                                    'C Singh': '120'}
+
+
+def test_other_listings_stream(client):
+    players = lines(client.get('/api/v2/countries', query_string={'name': 'england', 'stream': 1}))
+    assert [row['player_id'] for row in players] == [201, 202]
+    crawls = lines(client.get('/api/v2/crawls', query_string={'stream': 1}))
+    assert [crawl['crawl_id'] for crawl in crawls] == [1]
@@ -0,0 +1,87 @@
+import pytest
+
+
+def collect(client, path, query, rows_key, key):
+    query = dict(query)
+    pages = []
+    while True:
+        response = client.get(path, query_string=query)
+        assert response.status_code == 200
+        body = response.get_json()
+        pages.append([key(row) for row in body[rows_key]])
+        if body['next_cursor'] is None:
+            assert body['next'] is None
+            return pages
+        query['after'] = body['next_cursor']
+
+
+def test_players_page_by_player_id(client):
+    pages = collect(client, '/api/v2/countries', {'name': 'india', 'limit': 3}, 'players',
+                    lambda row: row['player_id'])
+    assert pages == [[101, 102, 103], [104]]
+
+
+def test_stats_page_in_storage_order(client):
+    pages = collect(client, '/api/v2/get_stats/countries',
+                    {'name': 'india', 'play_type': 'batting', 'match_type': 'ODI', 'limit': 2}, 'stats',
+                    lambda row: row['player'])
+    assert sum(pages, []) == ['A Sharma', 'B Kumar', 'C Singh']
+    assert [len(page) for page in pages] == [2, 1]
+
+
+def test_sorted_stats_page_by_value_then_row(client):
+    pages = collect(client, '/api/v2/get_stats/countries',
+                    {'name': 'india', 'play_type': 'batting', 'match_type': 'ODI', 'limit': 1, 'sort': '-runs',
+                     'fields': 'player,runs'}, 'stats', lambda row: (row['player'], row['runs_scored']))
+    assert sum(pages, []) == [('A Sharma', '700'), ('B Kumar', '500'), ('C Singh', '120')]
+
+
+def test_sorted_by_text_pages_by_name(client):
+    pages = collect(client, '/api/v2/get_stats/countries',
+                    {'name': 'england', 'play_type': 'batting', 'match_type': 'ODI', 'limit': 1, 'sort': '-player',
+                     'fields': 'player'}, 'stats', lambda row: row['player'])
+    assert sum(pages, []) == ['D Root', 'A Sharma']
+
+
+def test_fields_project_the_rows(client):
+    body = client.get('/api/v2/get_stats/countries', query_string={
+        'name': 'india', 'play_type': 'batting', 'match_type': 'ODI', 'fields': 'player, runs,average'}).get_json()
+    assert [sorted(row) for row in body['stats']] == [['batting_average', 'player', 'runs_scored']] * 3
+    assert client.get('/api/v2/get_stats/countries', query_string={
+        'name': 'india', 'play_type': 'batting', 'match_type': 'ODI', 'fields': 'player,salary'}).status_code == 400
+
+
+@pytest.mark.parametrize('bounds, players', [({'min_runs': 150, 'max_runs': 600}, ['B Kumar']),
+                                             ({'min_runs': 500}, ['A Sharma', 'B Kumar']),
+                                             ({'max_average': 60}, ['B Kumar', 'C Singh'])])
+def test_range_filters(client, bounds, players):
+    body = client.get('/api/v2/get_stats/countries', query_string=dict(
+        {'name': 'india', 'play_type': 'batting', 'match_type': 'ODI'}, **bounds)).get_json()
+    assert [row['player'] for row in body['stats']] == players
+
+
+@pytest.mark.parametrize('bounds', [{'min_runs': 'nan'}, {'max_runs': 'inf'}, {'min_runs': '-Infinity'},
+                                    {'min_runs': 'lots'}, {'min_playing_span': 2010}, {'max_salary': 1}])
+def test_bad_range_filters_are_rejected(client, bounds):
+    response = client.get('/api/v2/get_stats/countries', query_string=dict(
+        {'name': 'india', 'play_type': 'batting', 'match_type': 'ODI'}, **bounds))
+    assert response.status_code == 400
+
+
+def test_next_link_carries_the_cursor(client):
+    body = client.get('/api/v2/countries', query_string={'name': 'india', 'limit': 2}).get_json()
+    assert 'after={}'.format(body['next_cursor']) in body['next']
+    assert client.get(body['next']).get_json()['players'][0]['player_id'] == 103
+
+
+def test_bad_cursors_are_rejected(client):
+    assert client.get('/api/v2/countries', query_string={'name': 'india', 'after': 'x'}).status_code == 400
+    response = client.get('/api/v2/get_stats/countries', query_string={
+        'name': 'india', 'play_type': 'batting', 'match_type': 'ODI', 'after': 'x'})
+    assert response.status_code == 400
+    stats = {'name': 'india', 'play_type': 'batting', 'match_type': 'ODI'}
+    for query in ({'sort': 'runs', 'after': '12'}, {'sort': 'runs', 'after': '["a", 1]'},
+                  {'sort': 'runs', 'after': '[NaN, 1]'}, {'sort': 'runs', 'after': '[500, "x"]'},
+                  {'sort': 'runs', 'after': '[true, 1]'}, {'sort': 'player', 'after': '[1, 1]'},
+                  {'as_of': 1, 'after': '[1, 101]'}, {'as_of': 1, 'after': '["A Sharma", "101"]'}):
+        assert client.get('/api/v2/get_stats/countries', query_string=dict(stats, **query)).status_code == 400
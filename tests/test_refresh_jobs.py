@@ -0,0 +1,65 @@
+import pytest
+
+import cricket_parser_v2 as parser
+from conftest import make_legacy_db
+from refresh_jobs import JobQueue, PRIORITY_ADMIN, PRIORITY_FULL
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / 'jobs.sqlite'))
+
+
+def test_identical_jobs_are_queued_once_at_the_higher_priority(queue):
+    first = queue.enqueue('ODI', 'batting', countries=['india', 'england'])
+    second = queue.enqueue('ODI', 'batting', countries=['england', 'india'], priority=PRIORITY_ADMIN)
+    assert first == second
+    job = queue.get(first)
+    assert job['priority'] == PRIORITY_ADMIN
+    assert job['countries'] == ['england', 'india']
+
+
+def test_jobs_are_claimed_in_priority_order(queue):
+    full = queue.enqueue('T20', 'bowling', priority=PRIORITY_FULL)
+    admin = queue.enqueue('ODI', 'batting', player_ids=[101], priority=PRIORITY_ADMIN)
+    assert [queue.claim()['job_id'], queue.claim()['job_id'], queue.claim()] == [admin, full, None]
+    assert queue.stats()['running'] == 2
+
+
+@pytest.mark.parametrize('countries', ['india', ['india', 7], ['narnia'], {'india': 1}])
+def test_enqueue_rejects_bad_countries(queue, countries):
+    with pytest.raises(ValueError):
+        queue.enqueue('ODI', 'batting', countries=countries)
+    assert queue.stats()['queued'] == 0
+
+
+def test_admin_api_rejects_bad_countries(flask_app, client, monkeypatch):
+    monkeypatch.setattr(flask_app, 'ADMIN_TOKEN', 'secret')
+    headers = {'Authorization': 'Bearer secret'}
+    response = client.post('/api/v2/admin/jobs', json={'match_type': 'ODI', 'action': 'batting',
+                                                       'countries': 'india'}, headers=headers)
+    assert response.status_code == 400
+    response = client.post('/api/v2/admin/jobs', json={'match_type': 'ODI', 'action': 'batting',
+                                                       'countries': ['india']}, headers=headers)
+    assert response.status_code == 202
+    assert response.get_json()['jobs'][0]['countries'] == ['india']
+
+
+def test_in_place_refresh_job_is_one_transaction(tmp_path, queue, monkeypatch):
+    dbname = str(tmp_path / 'refresh')
+    make_legacy_db(dbname)
+    with parser.get_db_conn(dbname) as conn:
+        parser.create_tables(conn)
+    calls = []
+
+    def get_player_statistics(action, play_list, match_type, sqlite_conn, crawl_id, progress=None, commit_every=100):
+        calls.append((action, [play[2] for play in play_list], commit_every))
+        return {'new': 0, 'changed': 0, 'unchanged': len(play_list)}
+
+    monkeypatch.setattr(parser, 'get_player_statistics', get_player_statistics)
+    job_id = queue.enqueue('ODI', 'batting', countries=['england'])
+    parser.run_refresh_job(dbname, queue, queue.claim())
+    # Readers and the result cache must never see a half-refreshed table under the old version
+    assert calls == [('batting', [201, 202], None)]
+    job = queue.get(job_id)
+    assert (job['status'], job['done'], job['unchanged']) == ('done', 2, 2)
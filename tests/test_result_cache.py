@@ -0,0 +1,60 @@
+import time
+
+import pytest
+
+from result_cache import ResultCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(str(tmp_path / 'cache.sqlite'), max_entries=2, max_bytes=100)
+
+
+def test_entries_are_served_for_their_version_only(cache):
+    cache.put('a', '1', 'application/json', b'{}')
+    assert cache.get('a', '1') == ('application/json', b'{}')
+    assert cache.get('a', '2') is None
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_new_version_drops_older_entries(cache):
+    cache.put('a', '1', 'application/json', b'{}')
+    cache.put('b', '2', 'application/json', b'[]')
+    assert cache.stats()['entries'] == 1
+    assert cache.get('b', '2') is not None
+
+
+def test_least_recently_used_entries_are_evicted(cache):
+    cache.put('a', '1', 'text/plain', b'a')
+    time.sleep(0.01)
+    cache.put('b', '1', 'text/plain', b'b')
+    time.sleep(0.01)
+    cache.put('c', '1', 'text/plain', b'c')
+    assert cache.get('a', '1') is None
+    assert cache.get('c', '1') is not None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_size_bounds_the_cache(cache):
+    cache.put('big', '1', 'text/plain', b'x' * 101)
+    assert cache.stats()['entries'] == 0
+    cache.put('a', '1', 'text/plain', b'x' * 60)
+    cache.put('b', '1', 'text/plain', b'x' * 60)
+    assert cache.stats()['bytes'] <= 100
+
+
+def test_repeated_requests_are_served_from_the_cache(flask_app, client):
+    query = {'name': 'england', 'play_type': 'bowling', 'match_type': 'ODI'}
+    first = client.get('/api/v2/get_stats/countries', query_string=query)
+    hits = flask_app.result_cache.stats()['hits']
+    second = client.get('/api/v2/get_stats/countries', query_string=query)
+    assert flask_app.result_cache.stats()['hits'] == hits + 1
+    assert second.data == first.data
+
+
+def test_errors_are_not_cached(flask_app, client):
+    query = {'name': 'india', 'play_type': 'fielding', 'match_type': 'ODI'}
+    assert client.get('/api/v2/get_stats/countries', query_string=query).status_code == 400
+    stores = flask_app.result_cache.stats()['stores']
+    assert client.get('/api/v2/get_stats/countries', query_string=query).status_code == 400
+    assert flask_app.result_cache.stats()['stores'] == stores
@@ -0,0 +1,72 @@
+import sqlite3
+
+import pytest
+
+import cricket_parser_v2 as parser
+from conftest import BATTING_DEFAULTS, make_legacy_db
+
+# Scorecard headers of a batting summary, in BATTING_COLUMNS order
+BATTING_HEADERS = ('Span', 'Mat', 'Inns', 'NO', 'Runs', 'HS', 'Ave', 'BF', 'SR', '100', '50', '0', '4s', '6s')
+
+
+class Page:
+
+    def __init__(self, text):
+        self.text = text
+
+
+def summary_page(**overrides):
+    """A player stats page as the parser reads it: the first and last cells of each row are skipped."""
+    values = [overrides.get(column, BATTING_DEFAULTS[column]) for column in parser.BATTING_COLUMNS]
+    head = ''.join('<th>{}</th>'.format(header) for header in ('',) + BATTING_HEADERS + ('',))
+    data = ''.join('<td>{}</td>'.format(value) for value in ['Career'] + values + [''])
+    return Page('<table><tr class="head">{}</tr><tr class="data1">{}</tr></table>'.format(head, data))
+
+
+@pytest.fixture
+def crawl(tmp_path, monkeypatch):
+    dbname = str(tmp_path / 'hashes')
+    make_legacy_db(dbname)
+    conn = sqlite3.connect(dbname + '.sqlite')
+    parser.create_tables(conn)
+    pages = {}
+    monkeypatch.setattr(parser.requests, 'get', lambda url: pages[int(url.split('/')[-1].split('.')[0])])
+    play_list = [(1, 'india', 102, 'B Kumar'), (1, 'india', 104, 'E Patel')]
+
+    def run(**runs):
+        for pid, runs_scored in runs.items():
+            pages[int(pid[1:])] = summary_page(runs_scored=runs_scored)
+        crawl_id = parser.start_crawl(conn, 'ODI', ['india'])
+        before = conn.total_changes
+        counts = parser.get_player_statistics('batting', play_list, 2, conn, crawl_id)
+        return counts, conn.total_changes - before
+
+    yield conn, run
+    conn.close()
+
+
+def test_counts_new_and_changed_rows(crawl):
+    conn, run = crawl
+    # B Kumar has a stored row with other values; E Patel has no ODI batting row yet
+    counts, _ = run(p102='510', p104='60')
+    assert counts == {'new': 1, 'changed': 1, 'unchanged': 0}
+    assert conn.execute("SELECT runs_scored FROM Batting_Stats_Odi WHERE player='B Kumar'").fetchone() == ('510',)
+
+
+def test_rows_with_a_stored_hash_are_skipped_without_writes(crawl):
+    conn, run = crawl
+    run(p102='510', p104='60')
+    history = conn.execute('SELECT COUNT(*) FROM Stats_History').fetchone()
+    counts, writes = run(p102='510', p104='60')
+    assert counts == {'new': 0, 'changed': 0, 'unchanged': 2}
+    assert writes == 0
+    assert conn.execute('SELECT COUNT(*) FROM Stats_History').fetchone() == history
+
+
+def test_only_the_changed_row_is_rewritten(crawl):
+    conn, run = crawl
+    run(p102='510', p104='60')
+    counts, _ = run(p102='530', p104='60')
+    assert counts == {'new': 0, 'changed': 1, 'unchanged': 1}
+    hashes = parser.load_row_hashes(conn.cursor(), 'Batting_Stats_Odi')
+    assert set(hashes) == {102, 104}
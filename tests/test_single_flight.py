@@ -0,0 +1,101 @@
+import threading
+import time
+
+import pytest
+
+from result_cache import SingleFlight
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def run_concurrently(flight, key, fn, callers):
+    results, errors = [], []
+    started = threading.Barrier(callers)
+
+    def call():
+        started.wait()
+        try:
+            results.append(flight.do(key, fn))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return 'body'
+
+    threads, results, errors = run_concurrently(flight, 'key', slow, 8)
+    # Let every caller join the flight before the leader finishes
+    wait_for(lambda: flight.stats()['executions'] + flight.stats()['coalesced'] == 8)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ['body'] * 8 and not errors
+    assert len(calls) == 1
+    assert flight.stats() == {'executions': 1, 'coalesced': 7, 'in_flight': 0}
+
+
+def test_waiters_receive_the_leaders_error():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def failing():
+        release.wait(5)
+        raise ValueError('boom')
+
+    threads, results, errors = run_concurrently(flight, 'key', failing, 4)
+    wait_for(lambda: flight.stats()['executions'] + flight.stats()['coalesced'] == 4)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert not results and len(errors) == 4
+    assert all(isinstance(e, ValueError) for e in errors)
+
+
+def test_finished_calls_are_not_reused():
+    flight = SingleFlight()
+    assert flight.do('key', lambda: 1) == 1
+    assert flight.do('key', lambda: 2) == 2
+    with pytest.raises(KeyError):
+        flight.do('other', lambda: {}['missing'])
+    assert flight.stats()['in_flight'] == 0
+
+
+def test_concurrent_bootstrap_requests_load_the_bundle_once(flask_app, monkeypatch):
+    loads = []
+    release = threading.Event()
+    bundle = flask_app.load_bootstrap_bundle(flask_app.get_data_version(flask_app.dbname))
+
+    def slow_load(version):
+        loads.append(version)
+        release.wait(5)
+        return bundle
+
+    monkeypatch.setattr(flask_app, 'load_bootstrap_bundle', slow_load)
+    coalesced = flask_app.single_flight.stats()['coalesced']
+    statuses = []
+    threads = [threading.Thread(target=lambda: statuses.append(
+        flask_app.app.test_client().get('/api/v2/bootstrap').status_code)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    wait_for(lambda: flask_app.single_flight.stats()['coalesced'] == coalesced + 3)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert statuses == [200] * 4
+    assert len(loads) == 1